@@ -11,4 +11,4 @@ echo "Postgres is ready. Running migrations..."
 poetry run python mentor/manage.py migrate
 
 echo "Starting Django server..."
-exec poetry run python mentor/manage.py runserver 0.0.0.0:8000
+exec poetry run uvicorn mentor.core.asgi:application --host 0.0.0.0 --port 8000 --reload --reload-dir mentor
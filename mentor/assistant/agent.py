@@ -1,23 +1,86 @@
+import asyncio
+import json
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    Iterator,
+    Sequence,
+)
+from contextlib import asynccontextmanager, contextmanager, suppress
+from contextvars import ContextVar
 from enum import StrEnum
 from functools import cache, cached_property
 from pathlib import Path
+from typing import TypeVar, cast
 from uuid import UUID
 
+import httpx
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    BaseMessageChunk,
+    HumanMessage,
+    message_chunk_to_message,
+)
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import Runnable, RunnableConfig
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_openai import ChatOpenAI
 from langchain_postgres import PostgresChatMessageHistory
 from langchain_together import ChatTogether
-from psycopg_pool import ConnectionPool
+from psycopg import AsyncConnection, Connection
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+from pydantic import SecretStr
+from pydantic_settings import BaseSettings
 
-from mentor.assistant.models import ChatMessage
+from mentor.assistant.cache import ResponseCache, get_hash, get_response_cache
+from mentor.assistant.chunking import (
+    get_merge_input,
+    get_pinned_text,
+    needs_chunking,
+    split_text,
+)
+from mentor.assistant.coalescing import SingleFlight, get_single_flight
+from mentor.assistant.fake_llm import FakeChatModel
+from mentor.assistant.hedging import HedgingChatModel, get_hedging_stats
+from mentor.assistant.history import (
+    BoundedChatMessageHistory,
+    get_last_turns,
+    get_summary_input,
+    split_history,
+)
+from mentor.assistant.metrics import get_run_config
+from mentor.assistant.models import ChatMessage, ChatSession
+from mentor.assistant.rate_limit import (
+    RateLimitUsageHandler,
+    RedisRateLimiter,
+    get_rate_limiter,
+)
+from mentor.assistant.routing import RoutingChatModel
 from mentor.assistant.settings import (
     AiPlatform,
+    ChunkedAnalysisSettings,
+    FakeModelSettings,
+    HedgingSettings,
+    HistorySettings,
+    HttpClientSettings,
+    ModelSettings,
     OpenAiModelSettings,
     PostgreSettings,
+    RateLimitSettings,
+    RoutingSettings,
     Settings,
     TogetherAiModelSettings,
 )
@@ -32,6 +95,9 @@ class PromptName(StrEnum):
     TEXT_ANALYSIS = "text_analysis"
     FOLLOW_UP_QUESTIONS = "follow_up"
     GENERATE_TITLE = "generate_title"
+    SUMMARIZE_HISTORY = "summarize_history"
+    ANALYZE_CHUNK = "analyze_chunk"
+    MERGE_ANALYSES = "merge_analyses"
 
 
 def get_prompt_file_path(prompt_name: PromptName, prompt_type: PromptType) -> Path:
@@ -55,25 +121,236 @@ def get_prompt(prompt_name: PromptName, prompt_type: PromptType) -> str:
     )
 
 
+def get_prompt_contents(prompt_name: PromptName) -> str:
+    """
+    Returns the contents of the system and human prompt files of the given prompt.
+    """
+    return get_prompt(prompt_name, PromptType.SYSTEM) + get_prompt(
+        prompt_name, PromptType.HUMAN
+    )
+
+
+def get_conninfo(settings: PostgreSettings) -> str:
+    return (
+        f"dbname={settings.pg_db_name} user={settings.pg_username} "
+        f"password={settings.pg_password.get_secret_value()} host={settings.pg_host} "
+        f"port={settings.pg_port}"
+    )
+
+
+def get_pool_options(settings: PostgreSettings) -> dict:
+    return {
+        "conninfo": get_conninfo(settings),
+        "min_size": settings.pg_pool_min_size,
+        "max_size": settings.pg_pool_max_size,
+        "timeout": settings.pg_pool_timeout,
+        "max_idle": settings.pg_pool_max_idle,
+    }
+
+
+class PerLoop[LoopValueT]:
+    """
+    Values made by `factory` once per event loop, for the objects that can only be
+    used from the loop that created them (e.g. connection pools). The values of the
+    loops that were closed are dropped when the next loop gets its own.
+    """
+
+    def __init__(self, factory: Callable[[], LoopValueT]):
+        self.factory = factory
+        self.values: dict[asyncio.AbstractEventLoop, LoopValueT] = {}
+        self.lock = threading.Lock()
+
+    def get(self) -> LoopValueT:
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if loop not in self.values:
+                for closed in [other for other in self.values if other.is_closed()]:
+                    del self.values[closed]
+                self.values[loop] = self.factory()
+            return self.values[loop]
+
+    def pop_all(self) -> list[tuple[asyncio.AbstractEventLoop, LoopValueT]]:
+        with self.lock:
+            values = list(self.values.items())
+            self.values.clear()
+        return values
+
+
 @cache
 def get_connection_pool() -> ConnectionPool:
-    settings = PostgreSettings()
     return ConnectionPool(
-        conninfo=f"dbname={settings.pg_db_name} user={settings.pg_username} "
-        f"password={settings.pg_password.get_secret_value()} host={settings.pg_host} "
-        f"port={settings.pg_port}",
-        max_size=10,
+        name="history", open=True, **get_pool_options(PostgreSettings())
     )
 
 
-def get_session_history(session_id):
+@cache
+def get_async_connection_pools() -> PerLoop[AsyncConnectionPool]:
+    return PerLoop(
+        lambda: AsyncConnectionPool(
+            name="async_history", open=False, **get_pool_options(PostgreSettings())
+        )
+    )
+
+
+def get_async_connection_pool() -> AsyncConnectionPool:
+    """
+    Returns the async history connection pool of the running event loop, as its
+    connections can only be used from the loop that opened them. It can only be
+    opened inside the loop, so it is opened by the first coroutine that needs it.
+    """
+    return get_async_connection_pools().get()
+
+
+def open_connection_pool() -> None:
+    """
+    Opens the history connection pool and waits until it holds its minimum
+    number of connections, so that the first requests don't pay for connecting.
+    """
+    get_connection_pool().wait(timeout=PostgreSettings().pg_pool_timeout)
+
+
+def close_connection_pool() -> None:
+    if get_connection_pool.cache_info().currsize:
+        get_connection_pool().close()
+        get_connection_pool.cache_clear()
+
+
+def get_connection_pool_stats() -> dict[str, dict[str, int]]:
+    """
+    Returns the statistics of the history connection pools created by this process
+    (see `psycopg_pool.ConnectionPool.get_stats`), e.g. `pool_size`,
+    `pool_available`, `requests_waiting` and `requests_wait_ms`.
+    """
+    stats = {}
+    if get_connection_pool.cache_info().currsize:
+        stats["sync"] = get_connection_pool().get_stats()
+    async_pools = list(get_async_connection_pools().values.values())
+    if async_pools:
+        # The pools of the event loops of the process, added up
+        stats["async"] = dict(
+            sum((Counter(pool.get_stats()) for pool in async_pools), Counter())
+        )
+    return stats
+
+
+# Connection used by `get_session_history`, held for the whole chain invoke
+history_connection: ContextVar[Connection | None] = ContextVar(
+    "history_connection", default=None
+)
+
+
+@contextmanager
+def hold_history_connection() -> Iterator[Connection]:
+    """
+    Checks out a pooled connection for the session history read and written inside
+    the block (e.g. a whole chain invoke), and returns it to the pool at the end.
+    Nested blocks reuse the connection of the outer one.
+    """
+    conn = history_connection.get()
+    if conn is not None:
+        yield conn
+        return
+
     with get_connection_pool().connection() as conn:
+        token = history_connection.set(conn)
+        try:
+            yield conn
+        finally:
+            history_connection.reset(token)
+
+
+@asynccontextmanager
+async def get_async_connection() -> AsyncIterator[AsyncConnection]:
+    pool = get_async_connection_pool()
+    await pool.open()
+    async with pool.connection() as conn:
+        yield conn
+
+
+def get_session_history(session_id):
+    conn = history_connection.get()
+    if conn is None:
+        raise RuntimeError(
+            "The session history must be used inside hold_history_connection()."
+        )
+    return PostgresChatMessageHistory(
+        ChatMessage._meta.db_table,
+        session_id,
+        sync_connection=conn,
+    )
+
+
+class AsyncPooledChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat message history used by the async (streaming) chains.
+    Every read and write borrows a connection from the async pool, so no
+    connection is held while the model is generating tokens.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+
+    def _get_history(self, conn: AsyncConnection) -> PostgresChatMessageHistory:
         return PostgresChatMessageHistory(
             ChatMessage._meta.db_table,
-            session_id,
-            sync_connection=conn,
+            self.session_id,
+            async_connection=conn,
         )
 
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        raise ValueError("Use the async aget_messages method instead.")
+
+    async def aget_messages(self) -> list[BaseMessage]:
+        async with get_async_connection() as conn:
+            return await self._get_history(conn).aget_messages()
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        # Streamed answers reach the history as an aggregated chunk; store them
+        # as regular messages so they look the same as the non-streamed ones.
+        messages = [
+            message_chunk_to_message(message)
+            if isinstance(message, BaseMessageChunk)
+            else message
+            for message in messages
+        ]
+        async with get_async_connection() as conn:
+            await self._get_history(conn).aadd_messages(messages)
+
+    def clear(self) -> None:
+        raise ValueError("Use the async aclear method instead.")
+
+    async def aclear(self) -> None:
+        async with get_async_connection() as conn:
+            await self._get_history(conn).aclear()
+
+
+def get_async_session_history(session_id):
+    return AsyncPooledChatMessageHistory(session_id)
+
+
+def get_analysis_messages(
+    text: str, analysis: BaseMessage, settings: ChunkedAnalysisSettings
+) -> list[BaseMessage]:
+    """
+    The text analysis request and its response, pinned at the start of the session
+    history. Texts analyzed in chunks are truncated (see `get_pinned_text`).
+    """
+    question = get_prompt(PromptName.TEXT_ANALYSIS, PromptType.HUMAN)
+    return [
+        HumanMessage(content=question + get_pinned_text(text, settings)),
+        analysis,
+    ]
+
+
+def get_title_messages(text: str) -> list[tuple[str, str]]:
+    system_prompt = get_prompt(PromptName.GENERATE_TITLE, PromptType.SYSTEM)
+    human_prompt = get_prompt(PromptName.GENERATE_TITLE, PromptType.HUMAN)
+    return [
+        ("system", system_prompt),
+        ("human", human_prompt + text),
+    ]
+
 
 def get_prompt_template(prompt_name: PromptName) -> ChatPromptTemplate:
     system_prompt = get_prompt(prompt_name, PromptType.SYSTEM)
@@ -86,32 +363,171 @@ def get_prompt_template(prompt_name: PromptName) -> ChatPromptTemplate:
     )
 
 
-def get_chain_with_history(prompt_name: PromptName, model: BaseChatModel):
+def get_chain_with_history(
+    prompt_name: PromptName,
+    model: BaseChatModel,
+    session_history_factory=get_session_history,
+    history_settings: HistorySettings | None = None,
+):
     prompt = get_prompt_template(prompt_name)
     chain = prompt | model
+    history_settings = history_settings or HistorySettings()
+
+    def get_bounded_session_history(session_id: str) -> BoundedChatMessageHistory:
+        return BoundedChatMessageHistory(
+            session_id=session_id,
+            history=session_history_factory(session_id),
+            settings=history_settings,
+        )
+
     return RunnableWithMessageHistory(
         chain,
-        get_session_history,
+        get_bounded_session_history,
         input_messages_key="question",
         history_messages_key="history",
     )
 
 
 def chain_with_history_invoke(
-    chain: RunnableWithMessageHistory, session_id: UUID, question: str
+    chain: RunnableWithMessageHistory,
+    session_id: UUID,
+    question: str,
+    config: RunnableConfig | None = None,
 ):
     return chain.invoke(
         {"question": question},
-        config={"configurable": {"session_id": str(session_id)}},
+        config={**(config or {}), "configurable": {"session_id": str(session_id)}},
     )
 
 
+async def chain_with_history_ainvoke(
+    chain: RunnableWithMessageHistory,
+    session_id: UUID,
+    question: str,
+    config: RunnableConfig | None = None,
+):
+    return await chain.ainvoke(
+        {"question": question},
+        config={**(config or {}), "configurable": {"session_id": str(session_id)}},
+    )
+
+
+def chain_with_history_astream(
+    chain: RunnableWithMessageHistory,
+    session_id: UUID,
+    question: str,
+    config: RunnableConfig | None = None,
+) -> AsyncIterator[BaseMessageChunk]:
+    return chain.astream(
+        {"question": question},
+        config={**(config or {}), "configurable": {"session_id": str(session_id)}},
+    )
+
+
+def get_http_limits(settings: HttpClientSettings) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.model_http_max_connections,
+        max_keepalive_connections=settings.model_http_max_keepalive_connections,
+        keepalive_expiry=settings.model_http_keepalive_expiry,
+    )
+
+
+class PerLoopAsyncClient(httpx.AsyncClient):
+    """
+    Async HTTP client that sends each request through a client of its own event
+    loop, made by `factory`. The connections of a client can only be used from the
+    loop that opened them, and the assistant is shared by every loop of the process
+    (e.g. the ones started by `async_to_sync`).
+    """
+
+    def __init__(self, factory: Callable[[], httpx.AsyncClient]):
+        super().__init__()
+        self.clients = PerLoop(factory)
+
+    def get_client(self) -> httpx.AsyncClient:
+        return self.clients.get()
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self.get_client().send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        self.close_clients()
+        await super().aclose()
+
+    def close_clients(self) -> None:
+        """
+        Closes the clients of the loops that are still running, from any thread.
+        The connections of a closed loop are already unusable.
+        """
+        for loop, client in self.clients.pop_all():
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+
+def get_settings_fingerprint(*settings: BaseSettings) -> str:
+    """
+    Hashes the values of the settings, including the secret ones.
+    """
+
+    def reveal(value):
+        if isinstance(value, SecretStr):
+            return value.get_secret_value()
+        return str(value)
+
+    return get_hash(*[json.dumps(s.model_dump(), default=reveal) for s in settings])
+
+
+ChainT = TypeVar("ChainT", bound=Runnable)
+
+
+class ChainRegistry:
+    """
+    Per-process registry of the chains used by the assistants.
+    Each chain is built once per prompt, assistant settings and history provider,
+    and reused by every call instead of rebuilding the prompt template and the
+    history wrapper. The chains of replaced settings are never used again, so only
+    the last `max_chains` built are kept.
+    """
+
+    def __init__(self, max_chains: int = 64) -> None:
+        self.max_chains = max_chains
+        self.chains: dict[Hashable, Runnable] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], ChainT]) -> ChainT:
+        chain = self.chains.get(key)
+        if chain is None:
+            with self.lock:
+                chain = self.chains.get(key)
+                if chain is None:
+                    chain = self.chains[key] = build()
+                    while len(self.chains) > self.max_chains:
+                        del self.chains[next(iter(self.chains))]
+        return cast(ChainT, chain)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.chains.clear()
+
+
+@cache
+def get_chain_registry() -> ChainRegistry:
+    return ChainRegistry()
+
+
 class Assistant(ABC):
     """
     Base class for the AI assistant.
     It provides methods to analyze text, ask follow-up questions, and generate titles.
     """
 
+    platform: AiPlatform
+
+    def __init__(self, settings_prefix: str = ""):
+        # Prefix of the environment variables of the model settings, used when
+        # several platforms are configured at once (see RoutingAssistant)
+        self.settings_prefix = settings_prefix
+
     @property
     @abstractmethod
     def model(self) -> BaseChatModel:
@@ -121,34 +537,632 @@ class Assistant(ABC):
         """
         raise NotImplementedError
 
-    def analyze_text(self, session_id: UUID, text: str):
-        chain_with_history = get_chain_with_history(
-            prompt_name=PromptName.TEXT_ANALYSIS, model=self.model
+    @property
+    def model_settings(self) -> ModelSettings:
+        """
+        Returns the settings of the model used by the assistant.
+        Should be implemented by subclasses that support the response cache.
+        """
+        raise NotImplementedError
+
+    @property
+    def model_id(self) -> str:
+        """
+        Identifies the provider, model and temperature used by the assistant.
+        """
+        settings = self.model_settings
+        return f"{self.platform.value}:{settings.model}:{settings.temperature}"
+
+    @cached_property
+    def response_cache(self) -> ResponseCache | None:
+        return get_response_cache()
+
+    @cached_property
+    def single_flight(self) -> SingleFlight | None:
+        return get_single_flight()
+
+    @cached_property
+    def http_client_settings(self) -> HttpClientSettings:
+        return HttpClientSettings()
+
+    @cached_property
+    def http_client(self) -> httpx.Client:
+        """
+        HTTP client of the model. It keeps the connections to the provider alive
+        between requests, so they don't pay for a new TLS handshake.
+        """
+        settings = self.http_client_settings
+        return httpx.Client(
+            limits=get_http_limits(settings), http2=settings.model_http2
+        )
+
+    @cached_property
+    def http_async_client(self) -> PerLoopAsyncClient:
+        settings = self.http_client_settings
+        return PerLoopAsyncClient(
+            lambda: httpx.AsyncClient(
+                limits=get_http_limits(settings), http2=settings.model_http2
+            )
+        )
+
+    def close(self) -> None:
+        """
+        Closes the HTTP clients of the assistant, once it was replaced.
+        """
+        if "http_client" in self.__dict__:
+            self.http_client.close()
+        if "http_async_client" in self.__dict__:
+            self.http_async_client.close_clients()
+
+    @cached_property
+    def rate_limit_settings(self) -> RateLimitSettings:
+        return RateLimitSettings()
+
+    @cached_property
+    def rate_limiter(self) -> RedisRateLimiter | None:
+        """
+        Rate limiter of the provider and model, which every call of the model
+        waits on (see RedisRateLimiter).
+        """
+        return get_rate_limiter(
+            self.platform.value, self.model_settings, self.rate_limit_settings
+        )
+
+    @cached_property
+    def chunked_analysis_settings(self) -> ChunkedAnalysisSettings:
+        return ChunkedAnalysisSettings()
+
+    @cached_property
+    def history_settings(self) -> HistorySettings:
+        return HistorySettings()
+
+    @property
+    def model_callbacks(self) -> list[BaseCallbackHandler]:
+        if self.rate_limiter is None:
+            return []
+        return [RateLimitUsageHandler(self.rate_limiter)]
+
+    @cached_property
+    def settings_fingerprint(self) -> str:
+        """
+        Changes when any setting used to build the assistant (and so its model and
+        chains) changes.
+        """
+        settings: list[BaseSettings] = [
+            self.http_client_settings,
+            self.rate_limit_settings,
+            # Captured by the chains with history
+            self.history_settings,
+        ]
+        with suppress(NotImplementedError):
+            settings.append(self.model_settings)
+        return get_settings_fingerprint(*settings)
+
+    def get_chain(self, prompt_name: PromptName) -> Runnable:
+        """
+        Returns the chain of the prompt without session history.
+        """
+        return get_chain_registry().get(
+            (prompt_name, self.platform, self.settings_fingerprint, None),
+            lambda: get_prompt_template(prompt_name) | self.model,
+        )
+
+    def get_chain_with_history(
+        self, prompt_name: PromptName, session_history_factory=get_session_history
+    ) -> RunnableWithMessageHistory:
+        return get_chain_registry().get(
+            (
+                prompt_name,
+                self.platform,
+                self.settings_fingerprint,
+                session_history_factory,
+            ),
+            lambda: get_chain_with_history(
+                prompt_name=prompt_name,
+                model=self.model,
+                session_history_factory=session_history_factory,
+                history_settings=self.history_settings,
+            ),
+        )
+
+    def build_chains(self) -> None:
+        """
+        Builds all the chains used by the assistant ahead of the first request.
+        """
+        for prompt_name in (
+            PromptName.TEXT_ANALYSIS,
+            PromptName.ANALYZE_CHUNK,
+            PromptName.MERGE_ANALYSES,
+        ):
+            self.get_chain(prompt_name)
+        self.get_chain_with_history(
+            PromptName.TEXT_ANALYSIS, session_history_factory=get_async_session_history
+        )
+        for session_history_factory in (get_session_history, get_async_session_history):
+            self.get_chain_with_history(
+                PromptName.FOLLOW_UP_QUESTIONS,
+                session_history_factory=session_history_factory,
+            )
+
+    def get_response_prompt(self, prompt_name: PromptName) -> str:
+        """
+        The prompt part of the cache and in-flight keys of a response. A merged
+        analysis also depends on how the chunks of the text were analyzed, so its
+        key includes the chunk prompt and size.
+        """
+        prompt = get_prompt_contents(prompt_name)
+        if prompt_name == PromptName.MERGE_ANALYSES:
+            prompt = get_hash(
+                prompt,
+                get_prompt_contents(PromptName.ANALYZE_CHUNK),
+                str(self.chunked_analysis_settings.chunked_analysis_chunk_tokens),
+            )
+        return prompt
+
+    def get_cached_response(self, prompt_name: PromptName, text: str):
+        if self.response_cache is None:
+            return None
+        content = self.response_cache.get(
+            model_id=self.model_id,
+            prompt_name=prompt_name.value,
+            prompt=self.get_response_prompt(prompt_name),
+            text=text,
+        )
+        return AIMessage(content=content) if content is not None else None
+
+    def cache_response(self, prompt_name: PromptName, text: str, response) -> None:
+        if self.response_cache is None or not response:
+            return
+        self.response_cache.set(
+            model_id=self.model_id,
+            prompt_name=prompt_name.value,
+            prompt=self.get_response_prompt(prompt_name),
+            text=text,
+            content=response.content,
+        )
+
+    def get_flight_key(self, prompt_name: PromptName, text: str) -> str:
+        return cast(SingleFlight, self.single_flight).get_key(
+            model_id=self.model_id,
+            prompt_name=prompt_name.value,
+            prompt=self.get_response_prompt(prompt_name),
+            text=text,
         )
+
+    def coalesce(
+        self,
+        prompt_name: PromptName,
+        text: str,
+        generate: Callable[[], BaseMessage],
+    ) -> BaseMessage:
+        """
+        Calls `generate`, unless the same call (model, prompt and text) is in flight
+        in any process, in which case its response is awaited instead.
+        See SingleFlight.
+        """
+        if self.single_flight is None:
+            return generate()
+        flight = self.single_flight.join(self.get_flight_key(prompt_name, text))
+        if flight.content is not None:
+            return AIMessage(content=flight.content)
+
+        response = None
+        try:
+            response = generate()
+        finally:
+            self.single_flight.finish(
+                flight, cast(str, response.content) if response else None
+            )
+        return response
+
+    def analyze_text(self, session_id: UUID, text: str):
+        response = self.generate_analysis(text)
+        if response:
+            self.save_analysis(session_id=session_id, text=text, analysis=response)
+        return response
+
+    def generate_analysis(self, text: str):
+        """
+        Analyzes the text without reading or writing the session history.
+        A text analysis always starts a new session, so its history is empty.
+        This allows the analysis to run before the session is created, and must be
+        followed by `save_analysis` to start the session history.
+        Texts too long for a single call are analyzed in chunks (see
+        `generate_chunked_analysis`).
+        """
+        if needs_chunking(text, self.chunked_analysis_settings):
+            return self.generate_chunked_analysis(text)
+
+        cached_response = self.get_cached_response(PromptName.TEXT_ANALYSIS, text)
+        if cached_response:
+            return cached_response
+
         question = get_prompt(PromptName.TEXT_ANALYSIS, PromptType.HUMAN)
-        return chain_with_history_invoke(
-            chain=chain_with_history, session_id=session_id, question=question + text
+        chain = self.get_chain(PromptName.TEXT_ANALYSIS)
+        response = self.coalesce(
+            PromptName.TEXT_ANALYSIS,
+            text,
+            lambda: chain.invoke(
+                {"history": [], "question": question + text},
+                config=get_run_config(PromptName.TEXT_ANALYSIS),
+            ),
+        )
+        self.cache_response(PromptName.TEXT_ANALYSIS, text, response)
+        return response
+
+    def get_chunk_inputs(self, text: str) -> list[dict]:
+        question = get_prompt(PromptName.ANALYZE_CHUNK, PromptType.HUMAN)
+        chunks = split_text(
+            text, self.chunked_analysis_settings.chunked_analysis_chunk_tokens
         )
+        return [{"history": [], "question": question + chunk} for chunk in chunks]
+
+    def get_merge_analyses_input(self, analyses: Sequence[BaseMessage]) -> dict:
+        question = get_prompt(PromptName.MERGE_ANALYSES, PromptType.HUMAN)
+        merge_input = get_merge_input([str(analysis.content) for analysis in analyses])
+        return {"history": [], "question": question + merge_input}
+
+    def generate_chunked_analysis(self, text: str):
+        """
+        Map-reduce analysis of a text longer than the model context window. The
+        text is split into chunks on paragraph boundaries (see `split_text`), the
+        chunks are analyzed concurrently and their analyses are merged by a final
+        call into a single analysis of the whole text.
+        """
+        cached_response = self.get_cached_response(PromptName.MERGE_ANALYSES, text)
+        if cached_response:
+            return cached_response
+
+        def generate() -> BaseMessage:
+            config = get_run_config(PromptName.ANALYZE_CHUNK)
+            config["max_concurrency"] = (
+                self.chunked_analysis_settings.chunked_analysis_max_concurrency
+            )
+            analyses = self.get_chain(PromptName.ANALYZE_CHUNK).batch(
+                self.get_chunk_inputs(text), config=config
+            )
+            return self.get_chain(PromptName.MERGE_ANALYSES).invoke(
+                self.get_merge_analyses_input(analyses),
+                config=get_run_config(PromptName.MERGE_ANALYSES),
+            )
+
+        response = self.coalesce(PromptName.MERGE_ANALYSES, text, generate)
+        self.cache_response(PromptName.MERGE_ANALYSES, text, response)
+        return response
+
+    def save_analysis(self, session_id: UUID, text: str, analysis: BaseMessage):
+        """
+        Starts the session history with the text analysis request and its response.
+        """
+        with hold_history_connection():
+            get_session_history(str(session_id)).add_messages(
+                get_analysis_messages(
+                    text=text,
+                    analysis=analysis,
+                    settings=self.chunked_analysis_settings,
+                )
+            )
 
     def follow_up_question(self, session_id: UUID, question: str):
-        chain_with_history = get_chain_with_history(
-            prompt_name=PromptName.FOLLOW_UP_QUESTIONS, model=self.model
+        chain_with_history = self.get_chain_with_history(PromptName.FOLLOW_UP_QUESTIONS)
+        with hold_history_connection():
+            return chain_with_history_invoke(
+                chain=chain_with_history,
+                session_id=session_id,
+                question=question,
+                config=get_run_config(PromptName.FOLLOW_UP_QUESTIONS, session_id),
+            )
+
+    async def astream_analyze_text(
+        self, session_id: UUID, text: str
+    ) -> AsyncIterator[BaseMessageChunk]:
+        """
+        Streams the analysis of the text token by token. Like `agenerate_analysis`,
+        it doesn't read the session history, and the full analysis is only saved
+        (see `asave_analysis`) once it is complete.
+        The text is analyzed in a single call, so texts that need chunking (see
+        `needs_chunking`) must be analyzed with `agenerate_analysis` instead.
+        """
+        question = get_prompt(PromptName.TEXT_ANALYSIS, PromptType.HUMAN)
+        chain = self.get_chain(PromptName.TEXT_ANALYSIS)
+        analysis: BaseMessageChunk | None = None
+        async for chunk in chain.astream(
+            {"history": [], "question": question + text},
+            config=get_run_config(PromptName.TEXT_ANALYSIS, session_id),
+        ):
+            analysis = chunk if analysis is None else analysis + chunk
+            yield chunk
+        await self.asave_analysis(
+            session_id=session_id,
+            text=text,
+            analysis=message_chunk_to_message(analysis or AIMessageChunk(content="")),
+        )
+
+    def astream_follow_up_question(
+        self, session_id: UUID, question: str
+    ) -> AsyncIterator[BaseMessageChunk]:
+        """
+        Streams the answer to a follow-up question token by token.
+        The full answer is only written to the session history once it is complete.
+        """
+        chain_with_history = self.get_chain_with_history(
+            PromptName.FOLLOW_UP_QUESTIONS,
+            session_history_factory=get_async_session_history,
         )
-        return chain_with_history_invoke(
-            chain=chain_with_history, session_id=session_id, question=question
+        return chain_with_history_astream(
+            chain=chain_with_history,
+            session_id=session_id,
+            question=question,
+            config=get_run_config(PromptName.FOLLOW_UP_QUESTIONS, session_id),
         )
 
     def generate_title(self, text: str):
-        system_prompt = get_prompt(PromptName.GENERATE_TITLE, PromptType.SYSTEM)
-        human_prompt = get_prompt(PromptName.GENERATE_TITLE, PromptType.HUMAN)
-        human_prompt += text
+        cached_response = self.get_cached_response(PromptName.GENERATE_TITLE, text)
+        if cached_response:
+            return cached_response
+
+        response = self.coalesce(
+            PromptName.GENERATE_TITLE,
+            text,
+            lambda: self.model.invoke(
+                get_title_messages(text),
+                config=get_run_config(PromptName.GENERATE_TITLE),
+            ),
+        )
+        self.cache_response(PromptName.GENERATE_TITLE, text, response)
+        return response
+
+    def batch_generate_analysis(
+        self, texts: Sequence[str], max_concurrency: int
+    ) -> Iterator[tuple[int, BaseMessage | Exception]]:
+        """
+        Analyzes the texts with at most `max_concurrency` model calls in flight,
+        yielding the index of each text and its analysis as soon as it is ready
+        (or the exception raised, if it failed). Cached analyses come first and
+        texts that need a chunked analysis come last.
+        Like `generate_analysis`, it doesn't read or write the session history.
+        """
+        question = get_prompt(PromptName.TEXT_ANALYSIS, PromptType.HUMAN)
+        indexes, inputs, chunked_indexes = [], [], []
+        for index, text in enumerate(texts):
+            if needs_chunking(text, self.chunked_analysis_settings):
+                chunked_indexes.append(index)
+                continue
+            cached_response = self.get_cached_response(PromptName.TEXT_ANALYSIS, text)
+            if cached_response:
+                yield index, cached_response
+            else:
+                indexes.append(index)
+                inputs.append({"history": [], "question": question + text})
+
+        if inputs:
+            chain = self.get_chain(PromptName.TEXT_ANALYSIS)
+            config = get_run_config(PromptName.TEXT_ANALYSIS)
+            config["max_concurrency"] = max_concurrency
+            for input_index, response in chain.batch_as_completed(
+                inputs, config=config, return_exceptions=True
+            ):
+                index = indexes[input_index]
+                if not isinstance(response, Exception):
+                    self.cache_response(
+                        PromptName.TEXT_ANALYSIS, texts[index], response
+                    )
+                yield index, response
+
+        # Each chunked analysis already runs its chunks concurrently
+        for index in chunked_indexes:
+            try:
+                yield index, self.generate_chunked_analysis(texts[index])
+            except Exception as exc:
+                yield index, exc
+
+    def batch_generate_titles(
+        self, texts: Sequence[str], max_concurrency: int
+    ) -> list[BaseMessage | Exception]:
+        """
+        Generates a title for each text with at most `max_concurrency` model calls
+        in flight. A failed title is returned as the exception raised.
+        """
+        responses: list[BaseMessage | Exception | None] = [
+            self.get_cached_response(PromptName.GENERATE_TITLE, text) for text in texts
+        ]
+        indexes = [index for index, response in enumerate(responses) if not response]
+        if indexes:
+            config = get_run_config(PromptName.GENERATE_TITLE)
+            config["max_concurrency"] = max_concurrency
+            generated = self.model.batch(
+                [get_title_messages(texts[index]) for index in indexes],
+                config=config,
+                return_exceptions=True,
+            )
+            for index, response in zip(indexes, generated, strict=True):
+                responses[index] = response
+                if not isinstance(response, Exception):
+                    self.cache_response(
+                        PromptName.GENERATE_TITLE, texts[index], response
+                    )
+        return cast(list[BaseMessage | Exception], responses)
+
+    def summarize_history(self, session_id: UUID) -> str | None:
+        """
+        Folds the follow-up turns that no longer fit in the history window into the
+        rolling summary of the session, so each turn is only summarized once.
+        Returns the updated summary, or None if there was nothing new to fold.
+        """
+        chat_session = ChatSession.objects.get(id=session_id)
+        with hold_history_connection():
+            messages = get_session_history(str(session_id)).messages
+        _, turns = split_history(messages)
+        window = get_last_turns(turns, self.history_settings.history_max_turns)
+        summarized_count = chat_session.summarized_message_count
+        fold_count = len(turns) - len(window)
+        if fold_count <= summarized_count:
+            return None
 
-        return self.model.invoke(
+        system_prompt = get_prompt(PromptName.SUMMARIZE_HISTORY, PromptType.SYSTEM)
+        human_prompt = get_prompt(PromptName.SUMMARIZE_HISTORY, PromptType.HUMAN)
+        human_prompt += get_summary_input(
+            chat_session.history_summary, turns[summarized_count:fold_count]
+        )
+        response = self.model.invoke(
             [
                 ("system", system_prompt),
                 ("human", human_prompt),
-            ]
+            ],
+            config=get_run_config(PromptName.SUMMARIZE_HISTORY, session_id),
+        )
+        if not response:
+            return None
+
+        # Only store the summary if no concurrent update folded the same turns
+        summary = response.text()
+        ChatSession.objects.filter(
+            id=session_id, summarized_message_count=summarized_count
+        ).update(history_summary=summary, summarized_message_count=fold_count)
+        return summary
+
+    # Async counterparts of the methods above. They await the model (`ainvoke`) and
+    # use the async session history, so many calls can be in flight on a single
+    # event loop without holding a thread or a database connection each.
+
+    async def aget_cached_response(self, prompt_name: PromptName, text: str):
+        return await sync_to_async(self.get_cached_response, thread_sensitive=False)(
+            prompt_name, text
+        )
+
+    async def acache_response(
+        self, prompt_name: PromptName, text: str, response
+    ) -> None:
+        await sync_to_async(self.cache_response, thread_sensitive=False)(
+            prompt_name, text, response
+        )
+
+    async def acoalesce(
+        self,
+        prompt_name: PromptName,
+        text: str,
+        agenerate: Callable[[], Awaitable[BaseMessage]],
+    ) -> BaseMessage:
+        """
+        Async counterpart of `coalesce`.
+        """
+        if self.single_flight is None:
+            return await agenerate()
+        flight = await self.single_flight.ajoin(self.get_flight_key(prompt_name, text))
+        if flight.content is not None:
+            return AIMessage(content=flight.content)
+
+        response = None
+        try:
+            response = await agenerate()
+        finally:
+            await self.single_flight.afinish(
+                flight, cast(str, response.content) if response else None
+            )
+        return response
+
+    async def aanalyze_text(self, session_id: UUID, text: str):
+        response = await self.agenerate_analysis(text)
+        if response:
+            await self.asave_analysis(
+                session_id=session_id, text=text, analysis=response
+            )
+        return response
+
+    async def agenerate_analysis(self, text: str):
+        """
+        Async counterpart of `generate_analysis`.
+        """
+        if needs_chunking(text, self.chunked_analysis_settings):
+            return await self.agenerate_chunked_analysis(text)
+
+        cached_response = await self.aget_cached_response(
+            PromptName.TEXT_ANALYSIS, text
         )
+        if cached_response:
+            return cached_response
+
+        question = get_prompt(PromptName.TEXT_ANALYSIS, PromptType.HUMAN)
+        chain = self.get_chain(PromptName.TEXT_ANALYSIS)
+        response = await self.acoalesce(
+            PromptName.TEXT_ANALYSIS,
+            text,
+            lambda: chain.ainvoke(
+                {"history": [], "question": question + text},
+                config=get_run_config(PromptName.TEXT_ANALYSIS),
+            ),
+        )
+        await self.acache_response(PromptName.TEXT_ANALYSIS, text, response)
+        return response
+
+    async def agenerate_chunked_analysis(self, text: str):
+        """
+        Async counterpart of `generate_chunked_analysis`.
+        """
+        cached_response = await self.aget_cached_response(
+            PromptName.MERGE_ANALYSES, text
+        )
+        if cached_response:
+            return cached_response
+
+        async def agenerate() -> BaseMessage:
+            config = get_run_config(PromptName.ANALYZE_CHUNK)
+            config["max_concurrency"] = (
+                self.chunked_analysis_settings.chunked_analysis_max_concurrency
+            )
+            analyses = await self.get_chain(PromptName.ANALYZE_CHUNK).abatch(
+                self.get_chunk_inputs(text), config=config
+            )
+            return await self.get_chain(PromptName.MERGE_ANALYSES).ainvoke(
+                self.get_merge_analyses_input(analyses),
+                config=get_run_config(PromptName.MERGE_ANALYSES),
+            )
+
+        response = await self.acoalesce(PromptName.MERGE_ANALYSES, text, agenerate)
+        await self.acache_response(PromptName.MERGE_ANALYSES, text, response)
+        return response
+
+    async def asave_analysis(
+        self, session_id: UUID, text: str, analysis: BaseMessage
+    ) -> None:
+        """
+        Async counterpart of `save_analysis`.
+        """
+        await get_async_session_history(str(session_id)).aadd_messages(
+            get_analysis_messages(
+                text=text, analysis=analysis, settings=self.chunked_analysis_settings
+            )
+        )
+
+    async def afollow_up_question(self, session_id: UUID, question: str):
+        chain_with_history = self.get_chain_with_history(
+            PromptName.FOLLOW_UP_QUESTIONS,
+            session_history_factory=get_async_session_history,
+        )
+        return await chain_with_history_ainvoke(
+            chain=chain_with_history,
+            session_id=session_id,
+            question=question,
+            config=get_run_config(PromptName.FOLLOW_UP_QUESTIONS, session_id),
+        )
+
+    async def agenerate_title(self, text: str):
+        cached_response = await self.aget_cached_response(
+            PromptName.GENERATE_TITLE, text
+        )
+        if cached_response:
+            return cached_response
+
+        response = await self.acoalesce(
+            PromptName.GENERATE_TITLE,
+            text,
+            lambda: self.model.ainvoke(
+                get_title_messages(text),
+                config=get_run_config(PromptName.GENERATE_TITLE),
+            ),
+        )
+        await self.acache_response(PromptName.GENERATE_TITLE, text, response)
+        return response
 
 
 class TogetherAiAssistant(Assistant):
@@ -156,13 +1170,23 @@ class TogetherAiAssistant(Assistant):
     AI assistant that uses Together AI platform for text analysis.
     """
 
+    platform = AiPlatform.TOGETHER_AI
+
+    @cached_property
+    def model_settings(self) -> TogetherAiModelSettings:
+        return TogetherAiModelSettings(_env_prefix=self.settings_prefix)
+
     @cached_property
     def model(self) -> ChatTogether:
-        settings = TogetherAiModelSettings()
+        settings = self.model_settings
         return ChatTogether(
             model=settings.model,
             temperature=settings.temperature,
             api_key=settings.api_key.get_secret_value(),
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            rate_limiter=self.rate_limiter,
+            callbacks=self.model_callbacks,
         )
 
 
@@ -172,15 +1196,25 @@ class OpenAiAssistant(Assistant):
     This is a placeholder for future implementation.
     """
 
+    platform = AiPlatform.OPENAI
+
+    @cached_property
+    def model_settings(self) -> OpenAiModelSettings:
+        return OpenAiModelSettings(_env_prefix=self.settings_prefix)
+
     @cached_property
     def model(
         self,
     ) -> ChatOpenAI:
-        settings = OpenAiModelSettings()
+        settings = self.model_settings
         return ChatOpenAI(
             model=settings.model,
             temperature=settings.temperature,
             api_key=settings.api_key.get_secret_value(),
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            rate_limiter=self.rate_limiter,
+            callbacks=self.model_callbacks,
         )
 
 
@@ -190,6 +1224,8 @@ class AzureOpenAiAssistant(Assistant):
     This is a placeholder for future implementation.
     """
 
+    platform = AiPlatform.AZURE_OPENAI
+
     @cached_property
     def model(
         self,
@@ -204,6 +1240,8 @@ class AwsBedrockAssistant(Assistant):
     This is a placeholder for future implementation.
     """
 
+    platform = AiPlatform.AWS_BEDROCK
+
     @cached_property
     def model(
         self,
@@ -212,19 +1250,230 @@ class AwsBedrockAssistant(Assistant):
         raise NotImplementedError("AWS Bedrock Assistant is not implemented yet.")
 
 
-def get_agent() -> Assistant:
+class FakeAssistant(Assistant):
     """
-    Returns an instance of the AI assistant.
-    This function can be used to get the specific implementation of the assistant.
+    AI assistant that uses an offline fake model, to load test the application
+    without calling (and paying) a provider. See FakeChatModel.
+    """
+
+    platform = AiPlatform.FAKE
+
+    @cached_property
+    def model_settings(self) -> FakeModelSettings:
+        return FakeModelSettings(_env_prefix=self.settings_prefix or "FAKE_")
+
+    @cached_property
+    def model(self) -> FakeChatModel:
+        settings = self.model_settings
+        return FakeChatModel(
+            model=settings.model,
+            latency_ms=settings.latency_ms,
+            latency_jitter_ms=settings.latency_jitter_ms,
+            latency_distribution=settings.latency_distribution,
+            tokens_per_second=settings.tokens_per_second,
+            response_tokens=settings.response_tokens,
+            error_rate=settings.error_rate,
+            seed=settings.seed,
+            rate_limiter=self.rate_limiter,
+            callbacks=self.model_callbacks,
+        )
+
+
+class RoutingAssistant(Assistant):
+    """
+    AI assistant that routes each call to the healthiest of several platforms
+    (lowest recent latency, error rate under a threshold) and falls back to the
+    others if the call fails. See RoutingChatModel.
+    """
+
+    platform = AiPlatform.ROUTING
+
+    # Prefix of the model settings of each platform
+    SETTINGS_PREFIXES = {
+        AiPlatform.TOGETHER_AI: "TOGETHER_",
+        AiPlatform.OPENAI: "OPENAI_",
+        AiPlatform.AZURE_OPENAI: "AZURE_OPENAI_",
+        AiPlatform.AWS_BEDROCK: "AWS_BEDROCK_",
+        AiPlatform.FAKE: "FAKE_",
+    }
+
+    @cached_property
+    def routing_settings(self) -> RoutingSettings:
+        return RoutingSettings()
+
+    @cached_property
+    def assistants(self) -> list[Assistant]:
+        platforms = self.routing_settings.routing_platforms
+        if AiPlatform.ROUTING in platforms:
+            raise ValueError("The routing platform cannot route to itself.")
+        return [
+            create_agent(platform, settings_prefix=self.SETTINGS_PREFIXES[platform])
+            for platform in platforms
+        ]
+
+    @property
+    def model_id(self) -> str:
+        return "|".join(assistant.model_id for assistant in self.assistants)
+
+    @cached_property
+    def settings_fingerprint(self) -> str:
+        return get_hash(
+            get_settings_fingerprint(self.routing_settings, self.history_settings),
+            *[assistant.settings_fingerprint for assistant in self.assistants],
+        )
+
+    @cached_property
+    def model(self) -> RoutingChatModel:
+        settings = self.routing_settings
+        return RoutingChatModel(
+            models={
+                assistant.platform.value: assistant.model
+                for assistant in self.assistants
+            },
+            window_seconds=settings.routing_window_seconds,
+            max_error_rate=settings.routing_max_error_rate,
+        )
+
+    def close(self) -> None:
+        for assistant in self.__dict__.get("assistants", []):
+            assistant.close()
+
+
+class HedgingAssistant(Assistant):
+    """
+    AI assistant that hedges the calls of another assistant: slow calls are also
+    sent to the hedge platform and the first answer wins. See HedgingChatModel.
+    """
+
+    def __init__(self, assistant: Assistant, hedging_settings: HedgingSettings):
+        super().__init__()
+        self.assistant = assistant
+        self.hedging_settings = hedging_settings
+        self.platform = assistant.platform
+
+    @cached_property
+    def hedge_assistant(self) -> Assistant:
+        platform = self.hedging_settings.hedging_platform
+        if platform is None or platform == self.platform:
+            return self.assistant
+        if platform == AiPlatform.ROUTING:
+            raise ValueError("The hedge platform cannot be the routing platform.")
+        return create_agent(
+            platform, settings_prefix=RoutingAssistant.SETTINGS_PREFIXES[platform]
+        )
+
+    @property
+    def model_id(self) -> str:
+        if self.hedge_assistant is self.assistant:
+            return self.assistant.model_id
+        return f"{self.assistant.model_id}|{self.hedge_assistant.model_id}"
+
+    @cached_property
+    def settings_fingerprint(self) -> str:
+        return get_hash(
+            get_settings_fingerprint(self.hedging_settings, self.history_settings),
+            self.assistant.settings_fingerprint,
+            self.hedge_assistant.settings_fingerprint,
+        )
+
+    @cached_property
+    def model(self) -> HedgingChatModel:
+        settings = self.hedging_settings
+        return HedgingChatModel(
+            primary=self.assistant.model,
+            hedge=self.hedge_assistant.model,
+            primary_name=self.assistant.platform.value,
+            hedge_name=self.hedge_assistant.platform.value,
+            percentile=settings.hedging_percentile,
+            window_seconds=settings.hedging_window_seconds,
+            min_samples=settings.hedging_min_samples,
+            default_delay_seconds=settings.hedging_default_delay_seconds,
+            stats=get_hedging_stats(),
+        )
+
+    def close(self) -> None:
+        self.assistant.close()
+        if self.__dict__.get("hedge_assistant", self.assistant) is not self.assistant:
+            self.hedge_assistant.close()
+
+
+def create_agent(ai_platform: AiPlatform, settings_prefix: str = "") -> Assistant:
+    """
+    Returns a new instance of the AI assistant of the given platform.
     """
-    ai_platform = Settings().ai_platform
     match ai_platform:
         case AiPlatform.TOGETHER_AI:
-            return TogetherAiAssistant()
+            return TogetherAiAssistant(settings_prefix)
         case AiPlatform.OPENAI:
-            return OpenAiAssistant()
+            return OpenAiAssistant(settings_prefix)
         case AiPlatform.AZURE_OPENAI:
-            return AzureOpenAiAssistant()
+            return AzureOpenAiAssistant(settings_prefix)
         case AiPlatform.AWS_BEDROCK:
-            return AwsBedrockAssistant()
+            return AwsBedrockAssistant(settings_prefix)
+        case AiPlatform.ROUTING:
+            return RoutingAssistant()
+        case AiPlatform.FAKE:
+            return FakeAssistant(settings_prefix)
     raise ValueError(f"Unsupported AI platform: {ai_platform.value}")
+
+
+class AgentCache:
+    """
+    Keeps the AI assistant of the process, so that its model client, HTTP connection
+    pool and settings are reused by every request. Reading the settings is file I/O
+    (the `.env` file), so they are only checked every `check_interval_seconds`: the
+    assistant is then replaced if any of them changed, and the HTTP clients of the
+    replaced assistant are closed.
+    """
+
+    def __init__(self, check_interval_seconds: float = 60.0) -> None:
+        self.check_interval_seconds = check_interval_seconds
+        self.agent: Assistant | None = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self, build: Callable[[], Assistant]) -> Assistant:
+        """
+        Returns the cached assistant, or the one returned by `build` if the cached
+        one is missing or was built with different settings.
+        """
+        replaced = None
+        with self.lock:
+            now = time.monotonic()
+            if (
+                self.agent is None
+                or now - self.checked_at >= self.check_interval_seconds
+            ):
+                agent = build()
+                if (
+                    self.agent is None
+                    or self.agent.platform != agent.platform
+                    or self.agent.settings_fingerprint != agent.settings_fingerprint
+                ):
+                    replaced, self.agent = self.agent, agent
+                self.checked_at = now
+            agent = self.agent
+        if replaced is not None:
+            replaced.close()
+        return agent
+
+
+@cache
+def get_agent_cache() -> AgentCache:
+    return AgentCache()
+
+
+def get_agent() -> Assistant:
+    """
+    Returns the AI assistant of this process.
+    This function can be used to get the specific implementation of the assistant.
+    """
+    return get_agent_cache().get(build_agent)
+
+
+def build_agent() -> Assistant:
+    agent = create_agent(Settings().ai_platform)
+    hedging_settings = HedgingSettings()
+    if hedging_settings.hedging_enabled:
+        agent = HedgingAssistant(agent, hedging_settings)
+    return agent
@@ -0,0 +1,175 @@
+import logging
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import cache
+
+import tiktoken
+from langchain_core.messages import BaseMessage, messages_from_dict
+from langchain_core.messages.utils import count_tokens_approximately
+
+from mentor.assistant.agent import (
+    PromptName,
+    PromptType,
+    get_prompt,
+    get_prompt_template,
+)
+from mentor.assistant.chunking import needs_chunking, split_text
+from mentor.assistant.history import select_history
+from mentor.assistant.models import ChatMessage, ChatSession
+from mentor.assistant.settings import (
+    ChunkedAnalysisSettings,
+    ContextBudgetSettings,
+    HistorySettings,
+    TokenCounter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tokens added by the chat format to each message and to the whole prompt, as
+# counted by OpenAI for its chat models
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_PROMPT = 3
+
+
+@dataclass
+class PromptEstimate:
+    """
+    Estimated prompt size of the model calls needed to answer a request.
+    """
+
+    # Tokens of the prompts of all the calls, the expected cost of the request
+    tokens: int
+    # Tokens of the largest prompt, which must fit the context window
+    max_call_tokens: int
+
+
+class ContextBudgetExceeded(ValueError):
+    def __init__(self, estimate: PromptEstimate, budget: int):
+        super().__init__(
+            f"The request needs a prompt of about {estimate.max_call_tokens} tokens, "
+            + f"but the model accepts at most {budget}. Shorten the text or "
+            + "start a new session."
+        )
+        self.estimate = estimate
+        self.budget = budget
+
+
+@cache
+def get_encoding(name: str) -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.get_encoding(name)
+    except (OSError, ValueError):
+        logger.warning(
+            "Could not load the %s encoding, using the approximate token count.",
+            name,
+            exc_info=True,
+        )
+        return None
+
+
+def count_tokens(
+    messages: Sequence[BaseMessage], settings: ContextBudgetSettings
+) -> int:
+    encoding = None
+    if settings.token_counter == TokenCounter.TIKTOKEN:
+        encoding = get_encoding(settings.token_counter_encoding)
+    if encoding is None:
+        return count_tokens_approximately(messages)
+    return TOKENS_PER_PROMPT + sum(
+        TOKENS_PER_MESSAGE + len(encoding.encode(message.text(), disallowed_special=()))
+        for message in messages
+    )
+
+
+def estimate_prompt_tokens(
+    prompt_name: PromptName,
+    question: str,
+    settings: ContextBudgetSettings,
+    history: Sequence[BaseMessage] = (),
+) -> int:
+    """
+    Tokens of the prompt sent to the model for the question: the system prompt of
+    `prompt_name`, the history and the question.
+    """
+    messages = get_prompt_template(prompt_name).format_messages(
+        history=list(history), question=question
+    )
+    return count_tokens(messages, settings)
+
+
+def estimate_analysis(
+    text: str,
+    settings: ContextBudgetSettings,
+    generate_title: bool = False,
+) -> PromptEstimate:
+    """
+    Estimates the calls of a text analysis and, if `generate_title`, of its title.
+    Long texts are analyzed in chunks, so only the chunks must fit the context
+    window. The call merging their analyses is not counted, as its input is only
+    known once the chunks are analyzed.
+    """
+    chunked_settings = ChunkedAnalysisSettings()
+    if needs_chunking(text, chunked_settings):
+        prompt_name = PromptName.ANALYZE_CHUNK
+        chunks = split_text(text, chunked_settings.chunked_analysis_chunk_tokens)
+    else:
+        prompt_name = PromptName.TEXT_ANALYSIS
+        chunks = [text]
+    question = get_prompt(prompt_name, PromptType.HUMAN)
+    calls = [
+        estimate_prompt_tokens(prompt_name, question + chunk, settings)
+        for chunk in chunks
+    ]
+    if generate_title:
+        title_question = get_prompt(PromptName.GENERATE_TITLE, PromptType.HUMAN)
+        calls.append(
+            estimate_prompt_tokens(
+                PromptName.GENERATE_TITLE, title_question + text, settings
+            )
+        )
+    return PromptEstimate(tokens=sum(calls), max_call_tokens=max(calls))
+
+
+def get_bounded_history(session: ChatSession) -> list[BaseMessage]:
+    """
+    The part of the session history sent to the model with the next question.
+    """
+    messages = messages_from_dict(
+        list(
+            ChatMessage.objects.filter(session=session)
+            .order_by("id")
+            .values_list("message", flat=True)
+        )
+    )
+    return select_history(
+        messages,
+        HistorySettings(),
+        session.history_summary,
+        session.summarized_message_count,
+    )
+
+
+def estimate_follow_up_question(
+    session: ChatSession, question: str, settings: ContextBudgetSettings
+) -> PromptEstimate:
+    tokens = estimate_prompt_tokens(
+        PromptName.FOLLOW_UP_QUESTIONS,
+        question,
+        settings,
+        history=get_bounded_history(session),
+    )
+    return PromptEstimate(tokens=tokens, max_call_tokens=tokens)
+
+
+def check_context_budget(
+    estimate: PromptEstimate, settings: ContextBudgetSettings
+) -> None:
+    """
+    Raises ContextBudgetExceeded if the largest call of the estimate doesn't leave
+    room for the answer in the context window of the model.
+    """
+    if settings.context_window_tokens <= 0:
+        return
+    budget = settings.context_window_tokens - settings.context_reserved_output_tokens
+    if estimate.max_call_tokens > budget:
+        raise ContextBudgetExceeded(estimate, budget)
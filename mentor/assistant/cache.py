@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import time
+import unicodedata
+from functools import cache
+from typing import cast
+
+from redis import Redis, RedisError
+
+from mentor.assistant.settings import ResponseCacheSettings, Settings
+
+logger = logging.getLogger(__name__)
+
+
+@cache
+def get_redis_client() -> Redis:
+    return Redis.from_url(Settings().redis_url, decode_responses=True)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes the unicode representation and the whitespace of the text, so that
+    submissions of the same text that only differ in formatting share a cache entry.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def get_hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Redis cache of model responses, keyed by the model (provider, model name and
+    temperature), the contents of the prompt and the normalized input text.
+    The model is identified by `Assistant.model_id`.
+
+    Entries expire a TTL after they were last used. The cache also tracks when each
+    entry was last used and evicts the least recently used entries once it grows
+    past its maximum size.
+    Hits and misses are counted per prompt.
+
+    The cache is an optimization only: Redis errors are logged and treated as misses.
+    """
+
+    KEY_PREFIX = "mentor:response_cache"
+    LRU_KEY = f"{KEY_PREFIX}:lru"
+    STATS_KEY = f"{KEY_PREFIX}:stats"
+
+    def __init__(self, client: Redis, ttl_seconds: int, max_entries: int):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def get_key(self, model_id: str, prompt_name: str, prompt: str, text: str) -> str:
+        entry_hash = get_hash(
+            model_id, get_hash(prompt), get_hash(normalize_text(text))
+        )
+        return f"{self.KEY_PREFIX}:{prompt_name}:{entry_hash}"
+
+    def get(
+        self, model_id: str, prompt_name: str, prompt: str, text: str
+    ) -> str | None:
+        key = self.get_key(model_id, prompt_name, prompt, text)
+        try:
+            content = cast(str | None, self.client.get(key))
+            pipeline = self.client.pipeline()
+            if content is None:
+                pipeline.hincrby(self.STATS_KEY, f"{prompt_name}:misses")
+                pipeline.zrem(self.LRU_KEY, key)
+            else:
+                pipeline.hincrby(self.STATS_KEY, f"{prompt_name}:hits")
+                # A used entry is kept for another TTL, like its LRU score
+                pipeline.zadd(self.LRU_KEY, {key: time.time()})
+                pipeline.expire(key, self.ttl_seconds)
+            pipeline.execute()
+        except RedisError:
+            logger.warning("Response cache lookup failed.", exc_info=True)
+            return None
+        return content
+
+    def set(
+        self, model_id: str, prompt_name: str, prompt: str, text: str, content: str
+    ) -> None:
+        key = self.get_key(model_id, prompt_name, prompt, text)
+        now = time.time()
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.set(key, content, ex=self.ttl_seconds)
+            pipeline.zadd(self.LRU_KEY, {key: now})
+            # Entries that were not used within the TTL have already expired
+            pipeline.zremrangebyscore(self.LRU_KEY, "-inf", now - self.ttl_seconds)
+            pipeline.zcard(self.LRU_KEY)
+            *_, size = pipeline.execute()
+            if size > self.max_entries:
+                self.evict(size - self.max_entries)
+        except RedisError:
+            logger.warning("Response cache update failed.", exc_info=True)
+
+    def evict(self, count: int) -> None:
+        """
+        Evicts the `count` least recently used entries.
+        """
+        evicted = cast(
+            list[tuple[str, float]], self.client.zpopmin(self.LRU_KEY, count)
+        )
+        if evicted:
+            self.client.delete(*[key for key, _ in evicted])
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Returns the hit and miss counters of each prompt (e.g. `text_analysis:hits`)
+        and the current number of entries.
+        """
+        pipeline = self.client.pipeline()
+        pipeline.hgetall(self.STATS_KEY)
+        pipeline.zcard(self.LRU_KEY)
+        counters, entries = pipeline.execute()
+
+        stats = {name: int(value) for name, value in counters.items()}
+        stats["entries"] = entries
+        return stats
+
+
+def get_response_cache() -> ResponseCache | None:
+    """
+    Returns the response cache, or None if caching is disabled.
+    """
+    settings = ResponseCacheSettings()
+    if not settings.response_cache_enabled:
+        return None
+    return ResponseCache(
+        client=get_redis_client(),
+        ttl_seconds=settings.response_cache_ttl_seconds,
+        max_entries=settings.response_cache_max_entries,
+    )
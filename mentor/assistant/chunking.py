@@ -0,0 +1,65 @@
+import math
+from collections.abc import Sequence
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from mentor.assistant.settings import ChunkedAnalysisSettings
+
+# Same ratio as langchain_core's count_tokens_approximately
+CHARS_PER_TOKEN = 4.0
+
+# Paragraphs first, then lines, sentences and words
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+
+def count_text_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def needs_chunking(text: str, settings: ChunkedAnalysisSettings) -> bool:
+    """
+    Whether the text is too long to be analyzed in a single model call.
+    """
+    threshold = settings.chunked_analysis_threshold_tokens
+    return threshold > 0 and count_text_tokens(text) > threshold
+
+
+def split_text(text: str, chunk_tokens: int) -> list[str]:
+    """
+    Splits the text into chunks of about `chunk_tokens` tokens, preferably on
+    paragraph boundaries.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=int(chunk_tokens * CHARS_PER_TOKEN),
+        chunk_overlap=0,
+        separators=SEPARATORS,
+        keep_separator="end",
+    )
+    return splitter.split_text(text)
+
+
+# Ends the first chunk of a text that is kept in the session history in its place
+TRUNCATED_TEXT_NOTE = (
+    "\n\n[Texto truncado: apenas o primeiro de {count} trechos foi mantido. "
+    + "A análise a seguir abrange o texto completo.]"
+)
+
+
+def get_pinned_text(text: str, settings: ChunkedAnalysisSettings) -> str:
+    """
+    The text kept at the start of the session history, which is sent with every
+    follow-up question. A text analyzed in chunks doesn't fit in a single call, so
+    only its first chunk is kept, and the questions rely on the merged analysis for
+    the rest.
+    """
+    if not needs_chunking(text, settings):
+        return text
+    chunks = split_text(text, settings.chunked_analysis_chunk_tokens)
+    return chunks[0] + TRUNCATED_TEXT_NOTE.format(count=len(chunks))
+
+
+def get_merge_input(analyses: Sequence[str]) -> str:
+    return "\n\n".join(
+        f"TRECHO {number}:\n{analysis}"
+        for number, analysis in enumerate(analyses, start=1)
+    )
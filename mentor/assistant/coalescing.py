@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import cast
+
+from asgiref.sync import sync_to_async
+from redis import Redis, RedisError
+
+from mentor.assistant.cache import get_hash, get_redis_client, normalize_text
+from mentor.assistant.settings import CoalescingSettings
+
+logger = logging.getLogger(__name__)
+
+# Returns the result of the call if it already finished, or takes the lock of the
+# call (KEYS[1]) with the token ARGV[1] for ARGV[2] milliseconds if nobody holds it.
+JOIN_SCRIPT = """
+local content = redis.call("GET", KEYS[2])
+if content then
+    return {"done", content}
+end
+if redis.call("SET", KEYS[1], ARGV[1], "PX", ARGV[2], "NX") then
+    return {"lead", ""}
+end
+return {"wait", ""}
+"""
+
+# Stores the result of the call (if ARGV[2] is 1) for ARGV[4] seconds, and releases
+# its lock if it is still held with the token ARGV[1].
+FINISH_SCRIPT = """
+if ARGV[2] == "1" then
+    redis.call("SET", KEYS[2], ARGV[3], "EX", ARGV[4])
+end
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("DEL", KEYS[1])
+end
+return 1
+"""
+
+
+@dataclass
+class Flight:
+    """
+    A process's place in a coalesced call. It either leads the call, gets the
+    content of the call made by another process, or neither if the wait failed.
+    """
+
+    key: str
+    token: str
+    leader: bool = False
+    content: str | None = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical model calls (same model, prompt and input) that are in
+    flight at the same time in any API or Celery worker process, through Redis.
+
+    The first process to join a call takes its lock and makes the call, and the
+    others poll for its result. The result is kept for `result_ttl_seconds` after
+    the call, so late joiners get it too. If the leader fails, it releases the lock
+    and one of the waiting processes takes over. If the leader dies, waiting
+    processes take over once the lock expires after `lock_ttl_seconds`.
+
+    Coalescing only saves calls: Redis errors are logged and the call is made.
+    """
+
+    KEY_PREFIX = "mentor:single_flight"
+
+    def __init__(
+        self,
+        client: Redis,
+        lock_ttl_seconds: float,
+        result_ttl_seconds: int,
+        poll_interval_seconds: float = 0.1,
+    ):
+        self.client = client
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.join_script = client.register_script(JOIN_SCRIPT)
+        self.finish_script = client.register_script(FINISH_SCRIPT)
+
+    def get_key(self, model_id: str, prompt_name: str, prompt: str, text: str) -> str:
+        call_hash = get_hash(model_id, get_hash(prompt), get_hash(normalize_text(text)))
+        return f"{self.KEY_PREFIX}:{prompt_name}:{call_hash}"
+
+    def try_join(self, flight: Flight) -> bool:
+        """
+        Makes the flight the leader of the call, or gives it the content of the
+        call if it finished. Returns False if the call is in flight elsewhere.
+        """
+        state, content = cast(
+            list[str],
+            self.join_script(
+                keys=[f"{flight.key}:lock", f"{flight.key}:result"],
+                args=[flight.token, int(self.lock_ttl_seconds * 1000)],
+            ),
+        )
+        if state == "done":
+            flight.content = content
+        flight.leader = state == "lead"
+        return state != "wait"
+
+    def join(self, key: str) -> Flight:
+        """
+        Waits until the call can be made by this process or another process made it.
+        """
+        flight = Flight(key=key, token=uuid.uuid4().hex)
+        try:
+            while not self.try_join(flight):
+                time.sleep(self.poll_interval_seconds)
+        except RedisError:
+            logger.warning("Joining the model call failed.", exc_info=True)
+        return flight
+
+    async def ajoin(self, key: str) -> Flight:
+        """
+        Async counterpart of `join`, which waits on the event loop.
+        """
+        flight = Flight(key=key, token=uuid.uuid4().hex)
+        try_join = sync_to_async(self.try_join, thread_sensitive=False)
+        try:
+            while not await try_join(flight):
+                await asyncio.sleep(self.poll_interval_seconds)
+        except RedisError:
+            logger.warning("Joining the model call failed.", exc_info=True)
+        return flight
+
+    def finish(self, flight: Flight, content: str | None) -> None:
+        """
+        Shares the content of a call led by the flight (None if it failed) with the
+        waiting processes, and releases its lock.
+        """
+        if not flight.leader:
+            return
+        try:
+            self.finish_script(
+                keys=[f"{flight.key}:lock", f"{flight.key}:result"],
+                args=[
+                    flight.token,
+                    int(content is not None),
+                    content or "",
+                    self.result_ttl_seconds,
+                ],
+            )
+        except RedisError:
+            logger.warning("Sharing the model call result failed.", exc_info=True)
+
+    async def afinish(self, flight: Flight, content: str | None) -> None:
+        await sync_to_async(self.finish, thread_sensitive=False)(flight, content)
+
+
+def get_single_flight() -> SingleFlight | None:
+    """
+    Returns the call coalescing, or None if it is disabled.
+    """
+    settings = CoalescingSettings()
+    if not settings.coalescing_enabled:
+        return None
+    return SingleFlight(
+        client=get_redis_client(),
+        lock_ttl_seconds=settings.coalescing_lock_ttl_seconds,
+        result_ttl_seconds=settings.coalescing_result_ttl_seconds,
+    )
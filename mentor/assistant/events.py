@@ -0,0 +1,106 @@
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from typing import Any
+
+from celery.states import READY_STATES
+from django.core.serializers.json import DjangoJSONEncoder
+from redis import Redis, RedisError
+from redis.asyncio import Redis as AsyncRedis
+
+from mentor.assistant.settings import Settings
+from mentor.assistant.streaming import StreamEvent, format_event
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "mentor:task_events"
+
+# Sent when no event was published for a while, so proxies and clients don't close
+# an idle stream
+KEEPALIVE_COMMENT = b": keepalive\n\n"
+
+
+def get_user_channel(user_id: int) -> str:
+    return f"{CHANNEL_PREFIX}:user:{user_id}"
+
+
+def get_async_redis_client() -> AsyncRedis:
+    """
+    Returns a new async Redis client. Each event stream has its own client (and
+    connection), as a subscribed connection can't be shared.
+    """
+    return AsyncRedis.from_url(Settings().redis_url, decode_responses=True)
+
+
+def publish_task_event(client: Redis, user_id: int, event: dict[str, Any]) -> None:
+    """
+    Publishes the completion of a task of the user to its event streams. Clients
+    can still poll the task status, so Redis errors are logged.
+    """
+    try:
+        client.publish(
+            get_user_channel(user_id), json.dumps(event, cls=DjangoJSONEncoder)
+        )
+    except RedisError:
+        logger.warning("Publishing the task event failed.", exc_info=True)
+
+
+async def stream_task_events(
+    client: AsyncRedis,
+    user_id: int,
+    get_initial_events: Callable[[], Awaitable[Iterable[dict[str, Any]]]] | None = None,
+    keepalive_seconds: float = 15.0,
+) -> AsyncIterator[bytes]:
+    """
+    Streams the task completions of the user as Server-Sent Events, one `task`
+    event per completed task, until the client disconnects. The events returned by
+    `get_initial_events` are sent first, so that tasks that finished before the
+    client connected are not missed. It is called once subscribed, so a task that
+    finishes in between is either among them or published to the stream.
+    """
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(get_user_channel(user_id))
+        for event in await get_initial_events() if get_initial_events else ():
+            yield format_event(StreamEvent.TASK, event)
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=keepalive_seconds
+            )
+            if message is None:
+                yield KEEPALIVE_COMMENT
+                continue
+            yield format_event(StreamEvent.TASK, json.loads(message["data"]))
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def wait_for_task(
+    client: AsyncRedis,
+    channel: str,
+    timeout: float,
+    is_ready: Callable[[], Awaitable[bool]],
+) -> None:
+    """
+    Waits until the task finishes or the timeout expires, without polling: the
+    Redis result backend publishes each state of the task on its `channel`.
+    `is_ready` is checked once subscribed, in case the task finished before.
+    """
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(channel)
+        if await is_ready():
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=remaining
+            )
+            if message and json.loads(message["data"])["status"] in READY_STATES:
+                return
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
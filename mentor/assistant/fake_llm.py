@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import math
+import random
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.base import LangSmithParams
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field
+
+from mentor.assistant.settings import LatencyDistribution
+
+WORDS = [
+    "lorem",
+    "ipsum",
+    "dolor",
+    "sit",
+    "amet",
+    "consectetur",
+    "adipiscing",
+    "elit",
+    "sed",
+    "do",
+    "eiusmod",
+    "tempor",
+    "incididunt",
+    "ut",
+    "labore",
+    "et",
+    "dolore",
+    "magna",
+    "aliqua",
+    "enim",
+    "ad",
+    "minim",
+    "veniam",
+    "quis",
+    "nostrud",
+    "exercitation",
+    "ullamco",
+    "laboris",
+    "nisi",
+    "aliquip",
+    "ex",
+    "ea",
+    "commodo",
+    "consequat",
+]
+
+
+class FakeProviderError(RuntimeError):
+    """
+    Error injected by FakeChatModel, standing for a failed call to a provider.
+    """
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model for load tests. It waits like a provider would (a latency
+    sampled from the configured distribution before the first token, then
+    `tokens_per_second`) and answers `response_tokens` words that only depend on
+    the prompt, so the same request always gets the same answer. A fraction
+    `error_rate` of the calls fail with FakeProviderError.
+
+    Latencies and errors are drawn from a generator seeded with `seed`, so a load
+    test replays the same sequence every time. The async calls sleep on the event
+    loop, like the async clients of the real providers.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model_name: str = Field(default="fake-model", alias="model")
+    latency_ms: float = 500.0
+    latency_jitter_ms: float = 100.0
+    latency_distribution: LatencyDistribution = LatencyDistribution.LOGNORMAL
+    tokens_per_second: float = 50.0
+    response_tokens: int = 200
+    error_rate: float = 0.0
+    seed: int = 0
+
+    generator: random.Random = Field(default_factory=random.Random, exclude=True)
+    lock: threading.Lock = Field(default_factory=threading.Lock, exclude=True)
+
+    def model_post_init(self, context: Any) -> None:
+        self.generator.seed(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _get_ls_params(
+        self, stop: list[str] | None = None, **kwargs: Any
+    ) -> LangSmithParams:
+        params = super()._get_ls_params(stop=stop, **kwargs)
+        params["ls_provider"] = "fake"
+        return params
+
+    def sample_call(self) -> tuple[float, bool]:
+        """
+        Returns the seconds to wait before the first token and whether the call
+        fails.
+        """
+        mean = self.latency_ms / 1000
+        jitter = self.latency_jitter_ms / 1000
+        with self.lock:
+            match self.latency_distribution:
+                case LatencyDistribution.CONSTANT:
+                    latency = mean
+                case LatencyDistribution.UNIFORM:
+                    latency = self.generator.uniform(mean - jitter, mean + jitter)
+                case LatencyDistribution.NORMAL:
+                    latency = self.generator.gauss(mean, jitter)
+                case LatencyDistribution.LOGNORMAL:
+                    sigma = jitter / mean if mean > 0 else 0.0
+                    latency = mean and self.generator.lognormvariate(
+                        math.log(mean), sigma
+                    )
+            failed = self.generator.random() < self.error_rate
+        return max(latency, 0.0), failed
+
+    def get_tokens(self, messages: list[BaseMessage]) -> list[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        digest = hashlib.sha256(prompt.encode()).digest()
+        words = random.Random(digest).choices(WORDS, k=self.response_tokens)
+        return [word if index == 0 else f" {word}" for index, word in enumerate(words)]
+
+    def get_usage(self, messages: list[BaseMessage]) -> dict[str, int]:
+        input_tokens = count_tokens_approximately(messages)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": self.response_tokens,
+            "total_tokens": input_tokens + self.response_tokens,
+        }
+
+    def get_token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def start_call(self) -> float:
+        latency, failed = self.sample_call()
+        if failed:
+            time.sleep(latency)
+            raise FakeProviderError("Injected fake model error.")
+        return latency
+
+    async def astart_call(self) -> float:
+        latency, failed = self.sample_call()
+        if failed:
+            await asyncio.sleep(latency)
+            raise FakeProviderError("Injected fake model error.")
+        return latency
+
+    def get_chat_result(self, messages: list[BaseMessage]) -> ChatResult:
+        message = AIMessage(
+            content="".join(self.get_tokens(messages)),
+            usage_metadata=self.get_usage(messages),  # type: ignore[arg-type]
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        latency = self.start_call()
+        time.sleep(latency + self.response_tokens * self.get_token_delay())
+        return self.get_chat_result(messages)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        latency = await self.astart_call()
+        await asyncio.sleep(latency + self.response_tokens * self.get_token_delay())
+        return self.get_chat_result(messages)
+
+    def get_chunk(
+        self, messages: list[BaseMessage], token: str, last: bool
+    ) -> ChatGenerationChunk:
+        # The usage and model name are sent with the last chunk, like OpenAI does
+        if not last:
+            return ChatGenerationChunk(message=AIMessageChunk(content=token))
+        return ChatGenerationChunk(
+            message=AIMessageChunk(
+                content=token,
+                usage_metadata=self.get_usage(messages),  # type: ignore[arg-type]
+                response_metadata={"model_name": self.model_name},
+            )
+        )
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.start_call())
+        tokens = self.get_tokens(messages)
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(self.get_token_delay())
+            chunk = self.get_chunk(messages, token, last=index == len(tokens) - 1)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(await self.astart_call())
+        tokens = self.get_tokens(messages)
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(self.get_token_delay())
+            chunk = self.get_chunk(messages, token, last=index == len(tokens) - 1)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
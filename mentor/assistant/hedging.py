@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from functools import cache
+from typing import Any, cast
+
+from asgiref.sync import sync_to_async
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field
+from redis import Redis, RedisError
+
+from mentor.assistant.cache import get_redis_client
+from mentor.assistant.routing import (
+    ProviderHealth,
+    get_chat_generation_chunk,
+    get_chat_result,
+    get_inner_config,
+)
+from mentor.assistant.settings import HedgingSettings
+
+logger = logging.getLogger(__name__)
+
+
+class HedgingStats:
+    """
+    Counters of the hedged model calls of all the processes, in a Redis hash:
+    `calls`, `hedges` (a hedge request was sent) and `hedge_wins` (the hedge
+    answered first). Counters are best effort: Redis errors are logged.
+    """
+
+    KEY = "mentor:hedging:stats"
+
+    def __init__(self, client: Redis):
+        self.client = client
+
+    def record(self, hedged: bool, hedge_won: bool) -> None:
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.hincrby(self.KEY, "calls")
+            if hedged:
+                pipeline.hincrby(self.KEY, "hedges")
+            if hedge_won:
+                pipeline.hincrby(self.KEY, "hedge_wins")
+            pipeline.execute()
+        except RedisError:
+            logger.warning("Hedging stats update failed.", exc_info=True)
+
+    async def arecord(self, hedged: bool, hedge_won: bool) -> None:
+        await sync_to_async(self.record, thread_sensitive=False)(hedged, hedge_won)
+
+    def get_stats(self) -> dict[str, int]:
+        counters = cast(dict[str, str], self.client.hgetall(self.KEY))
+        stats = {name: 0 for name in ("calls", "hedges", "hedge_wins")}
+        stats.update({name: int(value) for name, value in counters.items()})
+        return stats
+
+
+@cache
+def get_hedging_stats() -> HedgingStats:
+    return HedgingStats(get_redis_client())
+
+
+@cache
+def get_hedging_executor() -> ThreadPoolExecutor:
+    # Runs the sync calls of the hedged models, so the caller can wait on them
+    # with a timeout
+    return ThreadPoolExecutor(
+        max_workers=HedgingSettings().hedging_max_workers,
+        thread_name_prefix="hedging",
+    )
+
+
+def get_prompt_name(
+    run_manager: CallbackManagerForLLMRun | AsyncCallbackManagerForLLMRun | None,
+) -> str:
+    if run_manager is None:
+        return ""
+    return str(run_manager.metadata.get("prompt_name", ""))
+
+
+class HedgingChatModel(BaseChatModel):
+    """
+    Chat model that cuts the tail latency of the `primary` model: if a call hasn't
+    answered after the `percentile` of the recent latencies of the primary model,
+    the same call is also sent to the `hedge` model (which can be the primary model
+    itself) and the first answer wins. Until `min_samples` calls finished within
+    the window, the hedge is sent after `default_delay_seconds`. Prompts ask for
+    answers of very different lengths, so the latencies are kept per prompt (the
+    `prompt_name` of the run metadata, see `get_run_config`).
+
+    The losing async call is cancelled. A sync call can't be interrupted, so the
+    losing call finishes in the background and its answer is dropped. If the first
+    answer is an error, the other call is awaited instead.
+
+    Streamed calls are not hedged: they go to the primary model, and the time to
+    the first token is what matters for them.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    primary: BaseChatModel
+    hedge: BaseChatModel
+    primary_name: str
+    hedge_name: str
+    percentile: float = 95.0
+    window_seconds: float = 300.0
+    min_samples: int = 20
+    default_delay_seconds: float = 10.0
+    stats: HedgingStats | None = Field(default=None, exclude=True)
+    # Latencies of the primary model per prompt name
+    health: dict[str, ProviderHealth] = Field(default_factory=dict, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedging"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"primary": self.primary_name, "hedge": self.hedge_name}
+
+    def get_health(self, prompt_name: str) -> ProviderHealth:
+        if prompt_name not in self.health:
+            self.health.setdefault(prompt_name, ProviderHealth(self.window_seconds))
+        return self.health[prompt_name]
+
+    def get_hedge_delay(self, prompt_name: str = "") -> float:
+        """
+        Seconds to wait for the primary model before sending the hedge.
+        """
+        samples = self.get_health(prompt_name).get_recent_samples()
+        latencies = sorted(latency for _, latency, failed in samples if not failed)
+        if len(latencies) < self.min_samples:
+            return self.default_delay_seconds
+        index = round((len(latencies) - 1) * self.percentile / 100)
+        return latencies[index]
+
+    def record_latency(
+        self, prompt_name: str, started_at: float, future: Future | asyncio.Future
+    ) -> None:
+        """
+        Records the latency of a primary call once it is done. A cancelled call
+        didn't complete, so its latency is unknown and it isn't recorded.
+        """
+        if future.cancelled():
+            return
+        self.get_health(prompt_name).record(
+            time.monotonic() - started_at, failed=future.exception() is not None
+        )
+
+    def record_stats(self, hedged: bool, hedge_won: bool) -> None:
+        if self.stats is not None:
+            self.stats.record(hedged, hedge_won)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        def submit(model: BaseChatModel) -> Future[BaseMessage]:
+            return get_hedging_executor().submit(
+                copy_context().run,
+                lambda: model.invoke(messages, get_inner_config(), stop=stop, **kwargs),
+            )
+
+        prompt_name = get_prompt_name(run_manager)
+        started_at = time.monotonic()
+        primary = submit(self.primary)
+        # The latencies of the primary model include the calls that lost, which
+        # finish in the background
+        primary.add_done_callback(
+            lambda future: self.record_latency(prompt_name, started_at, future)
+        )
+        done, _ = wait([primary], timeout=self.get_hedge_delay(prompt_name))
+        if done:
+            self.record_stats(hedged=False, hedge_won=False)
+            return get_chat_result(self.primary_name, primary.result())
+
+        hedge = submit(self.hedge)
+        names = {primary: self.primary_name, hedge: self.hedge_name}
+        pending: set[Future] = {primary, hedge}
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                self.record_stats(hedged=True, hedge_won=future is hedge)
+                return get_chat_result(names[future], future.result())
+        self.record_stats(hedged=True, hedge_won=False)
+        raise cast(BaseException, error)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt_name = get_prompt_name(run_manager)
+        started_at = time.monotonic()
+        primary = asyncio.ensure_future(
+            self.primary.ainvoke(messages, get_inner_config(), stop=stop, **kwargs)
+        )
+        # A primary call that lost is cancelled, so it isn't recorded
+        primary.add_done_callback(
+            lambda task: self.record_latency(prompt_name, started_at, task)
+        )
+        tasks: set[asyncio.Future] = {primary}
+        try:
+            done, _ = await asyncio.wait(
+                tasks, timeout=self.get_hedge_delay(prompt_name)
+            )
+            if done:
+                await self.arecord_stats(hedged=False, hedge_won=False)
+                return get_chat_result(self.primary_name, primary.result())
+
+            hedge = asyncio.ensure_future(
+                self.hedge.ainvoke(messages, get_inner_config(), stop=stop, **kwargs)
+            )
+            tasks.add(hedge)
+            names: dict[asyncio.Future, str] = {
+                primary: self.primary_name,
+                hedge: self.hedge_name,
+            }
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    await self.arecord_stats(hedged=True, hedge_won=task is hedge)
+                    return get_chat_result(names[task], task.result())
+            await self.arecord_stats(hedged=True, hedge_won=False)
+            raise cast(BaseException, error)
+        finally:
+            # Cancels the loser, or both calls if this call was cancelled
+            for task in tasks:
+                task.cancel()
+
+    async def arecord_stats(self, hedged: bool, hedge_won: bool) -> None:
+        if self.stats is not None:
+            await self.stats.arecord(hedged, hedge_won)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        first = True
+        for chunk in self.primary.stream(
+            messages, get_inner_config(), stop=stop, **kwargs
+        ):
+            yield get_chat_generation_chunk(self.primary_name, chunk, first=first)
+            first = False
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        first = True
+        async for chunk in self.primary.astream(
+            messages, get_inner_config(), stop=stop, **kwargs
+        ):
+            yield get_chat_generation_chunk(self.primary_name, chunk, first=first)
+            first = False
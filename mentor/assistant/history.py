@@ -0,0 +1,138 @@
+from collections.abc import Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import (
+    BaseMessage,
+    SystemMessage,
+    get_buffer_string,
+    trim_messages,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+
+from mentor.assistant.models import ChatSession
+from mentor.assistant.settings import HistorySettings, HistoryStrategy
+
+# Every session starts with the text analysis request (which contains the analyzed
+# text) and its analysis. These messages are always sent to the model.
+PINNED_MESSAGE_COUNT = 2
+
+SUMMARY_MESSAGE_PREFIX = "Resumo da conversa até aqui:\n\n"
+
+
+def split_history(
+    messages: Sequence[BaseMessage],
+) -> tuple[list[BaseMessage], list[BaseMessage]]:
+    """
+    Splits the history of a session into the pinned messages and the follow-up turns.
+    """
+    return list(messages[:PINNED_MESSAGE_COUNT]), list(messages[PINNED_MESSAGE_COUNT:])
+
+
+def get_last_turns(turns: Sequence[BaseMessage], max_turns: int) -> list[BaseMessage]:
+    """
+    Returns the last `max_turns` question/answer pairs.
+    """
+    if max_turns <= 0:
+        return []
+    return trim_messages(
+        turns,
+        max_tokens=2 * max_turns,
+        token_counter=len,
+        strategy="last",
+        start_on="human",
+    )
+
+
+def select_history(
+    messages: Sequence[BaseMessage],
+    settings: HistorySettings,
+    summary: str = "",
+    summarized_message_count: int = 0,
+) -> list[BaseMessage]:
+    """
+    Selects the part of the session history that is sent to the model, according
+    to the configured strategy. The pinned messages are always kept.
+    """
+    pinned, turns = split_history(messages)
+    match settings.history_strategy:
+        case HistoryStrategy.FULL:
+            return pinned + turns
+        case HistoryStrategy.LAST_TURNS:
+            return pinned + get_last_turns(turns, settings.history_max_turns)
+        case HistoryStrategy.TOKEN_BUDGET:
+            return pinned + trim_messages(
+                turns,
+                max_tokens=settings.history_max_tokens,
+                token_counter=count_tokens_approximately,
+                strategy="last",
+                start_on="human",
+            )
+        case HistoryStrategy.SUMMARY:
+            if summary:
+                pinned.append(SystemMessage(content=SUMMARY_MESSAGE_PREFIX + summary))
+            return pinned + get_last_turns(
+                turns[summarized_message_count:], settings.history_max_turns
+            )
+
+
+def get_summary_input(summary: str, messages: Sequence[BaseMessage]) -> str:
+    return (
+        f"RESUMO ATUAL:\n{summary or '-'}\n\n"
+        + f"NOVAS MENSAGENS:\n{get_buffer_string(messages, 'Aluno', 'Assistente')}"
+    )
+
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """
+    Wraps the history of a session so that the model only receives a bounded
+    window of it (see `select_history`), keeping the prompt size flat as the
+    session grows. New messages are stored in the wrapped history as usual.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        history: BaseChatMessageHistory,
+        settings: HistorySettings,
+    ):
+        self.session_id = session_id
+        self.history = history
+        self.settings = settings
+
+    @property
+    def uses_summary(self) -> bool:
+        return self.settings.history_strategy == HistoryStrategy.SUMMARY
+
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        summary = ("", 0)
+        if self.uses_summary:
+            summary = (
+                ChatSession.objects.filter(id=self.session_id)
+                .values_list("history_summary", "summarized_message_count")
+                .first()
+            ) or summary
+        return select_history(self.history.messages, self.settings, *summary)
+
+    async def aget_messages(self) -> list[BaseMessage]:
+        summary = ("", 0)
+        if self.uses_summary:
+            summary = (
+                await ChatSession.objects.filter(id=self.session_id)
+                .values_list("history_summary", "summarized_message_count")
+                .afirst()
+            ) or summary
+        messages = await self.history.aget_messages()
+        return select_history(messages, self.settings, *summary)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.history.add_messages(messages)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        await self.history.aadd_messages(messages)
+
+    def clear(self) -> None:
+        self.history.clear()
+
+    async def aclear(self) -> None:
+        await self.history.aclear()
@@ -0,0 +1,67 @@
+import timeit
+from functools import cached_property
+
+from django.core.management.base import BaseCommand
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from mentor.assistant.agent import (
+    Assistant,
+    PromptName,
+    get_chain_with_history,
+    get_prompt_template,
+)
+from mentor.assistant.settings import AiPlatform, TogetherAiModelSettings
+
+
+class BenchmarkAssistant(Assistant):
+    """
+    Assistant backed by a fake model, so no provider is called.
+    """
+
+    platform = AiPlatform.TOGETHER_AI
+
+    @cached_property
+    def model_settings(self) -> TogetherAiModelSettings:
+        return TogetherAiModelSettings(api_key="benchmark")
+
+    @cached_property
+    def model(self) -> FakeListChatModel:
+        return FakeListChatModel(responses=["Benchmark response"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the per-call overhead of setting up the text analysis and "
+        + "follow-up chains, building them on every call versus reusing them from "
+        + "the chain registry."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        assistant = BenchmarkAssistant()
+        model = assistant.model
+
+        def build_chains():
+            get_prompt_template(PromptName.TEXT_ANALYSIS) | model
+            get_chain_with_history(
+                prompt_name=PromptName.FOLLOW_UP_QUESTIONS, model=model
+            )
+
+        def reuse_chains():
+            assistant.get_chain(PromptName.TEXT_ANALYSIS)
+            assistant.get_chain_with_history(PromptName.FOLLOW_UP_QUESTIONS)
+
+        # Warm up the prompt file cache and the registry
+        build_chains()
+        assistant.build_chains()
+
+        built = timeit.timeit(build_chains, number=iterations) / iterations
+        reused = timeit.timeit(reuse_chains, number=iterations) / iterations
+
+        self.stdout.write(f"Iterations: {iterations}")
+        self.stdout.write(f"Built per call:     {built * 1e6:10.2f} µs")
+        self.stdout.write(f"Reused per call:    {reused * 1e6:10.2f} µs")
+        self.stdout.write(f"Overhead removed:   {(built - reused) * 1e6:10.2f} µs")
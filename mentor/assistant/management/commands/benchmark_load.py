@@ -0,0 +1,366 @@
+import asyncio
+import json
+import math
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from enum import StrEnum
+from pathlib import Path
+from typing import Any
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+METRICS = ["submit_ms", "queue_wait_ms", "first_token_ms", "completion_ms"]
+PERCENTILES = [50, 95, 99]
+
+
+class BenchmarkMode(StrEnum):
+    # Submit a task and poll its status
+    POLL = "poll"
+    # Read the answer from the streaming endpoint
+    STREAM = "stream"
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+@dataclass
+class RequestTiming:
+    """
+    Timings of a text analysis or follow-up question, in milliseconds since it was
+    submitted.
+    """
+
+    kind: str
+    # Until the response of the submission (poll mode) or its headers (stream mode)
+    submit_ms: float | None = None
+    # Until the task was seen started by a worker (poll mode)
+    queue_wait_ms: float | None = None
+    # Until the first token was received (stream mode)
+    first_token_ms: float | None = None
+    completion_ms: float | None = None
+    error: str = ""
+
+
+def get_elapsed_ms(started_at: float) -> float:
+    return (time.monotonic() - started_at) * 1000
+
+
+def get_percentile(values: list[float], percent: float) -> float | None:
+    """
+    Percentile of the values, interpolated between the closest ranks.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * percent / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def get_summary(values: list[float]) -> dict[str, float | None]:
+    summary = {
+        f"p{percent}": get_percentile(values, percent) for percent in PERCENTILES
+    }
+    summary["mean"] = sum(values) / len(values) if values else None
+    return summary
+
+
+class LoadBenchmark:
+    """
+    Replays conversations (a text and its follow-up questions) against a running
+    API, with at most `concurrency` conversations at a time. Each conversation
+    registers its own user, gets a token, requests the text analysis and then asks
+    the questions one after the other, like a real user would.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        conversations: list[dict[str, Any]],
+        concurrency: int,
+        mode: BenchmarkMode,
+        poll_interval: float,
+        timeout: float,
+    ):
+        self.client = client
+        self.conversations = conversations
+        self.concurrency = concurrency
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:8]
+        self.timings: list[RequestTiming] = []
+        self.failed_conversations = 0
+
+    async def run(self) -> dict[str, Any]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_conversation(index: int, conversation: dict[str, Any]):
+            async with semaphore:
+                await self.run_conversation(index, conversation)
+
+        started_at = time.monotonic()
+        await asyncio.gather(
+            *(
+                run_conversation(index, conversation)
+                for index, conversation in enumerate(self.conversations)
+            )
+        )
+        return self.get_report(duration=time.monotonic() - started_at)
+
+    async def run_conversation(self, index: int, conversation: dict[str, Any]):
+        try:
+            headers = await self.authenticate(index)
+        except (httpx.HTTPError, KeyError):
+            self.failed_conversations += 1
+            return
+
+        analysis = {"text": conversation["text"]}
+        if conversation.get("titulo"):
+            analysis["title"] = conversation["titulo"]
+        session_id = await self.request("analysis", "/api/analysis/", analysis, headers)
+        if session_id is None:
+            self.failed_conversations += 1
+            return
+
+        for question in conversation.get("questions", []):
+            await self.request(
+                "question",
+                "/api/question/",
+                {"session_id": session_id, "question": question},
+                headers,
+            )
+
+    async def authenticate(self, index: int) -> dict[str, str]:
+        credentials = {
+            "username": f"benchmark-{self.run_id}-{index}",
+            "password": uuid.uuid4().hex,
+        }
+        response = await self.client.post(
+            "/api/register/",
+            json={**credentials, "email": f"{credentials['username']}@example.com"},
+        )
+        response.raise_for_status()
+        response = await self.client.post("/api/token/", json=credentials)
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access']}"}
+
+    async def request(
+        self, kind: str, path: str, body: dict[str, Any], headers: dict[str, str]
+    ) -> str | None:
+        """
+        Sends the request and waits for its answer. Returns the session ID, or None
+        if it failed.
+        """
+        timing = RequestTiming(kind=kind)
+        self.timings.append(timing)
+        try:
+            if self.mode == BenchmarkMode.STREAM:
+                return await self.stream(timing, f"{path}stream/", body, headers)
+            return await self.submit_and_poll(timing, path, body, headers)
+        except (httpx.HTTPError, BenchmarkError, KeyError, ValueError) as e:
+            timing.error = str(e) or type(e).__name__
+            return None
+
+    async def submit_and_poll(
+        self,
+        timing: RequestTiming,
+        path: str,
+        body: dict[str, Any],
+        headers: dict[str, str],
+    ) -> str:
+        started_at = time.monotonic()
+        response = await self.client.post(path, json=body, headers=headers)
+        response.raise_for_status()
+        timing.submit_ms = get_elapsed_ms(started_at)
+        created = response.json()
+
+        while get_elapsed_ms(started_at) < self.timeout * 1000:
+            await asyncio.sleep(self.poll_interval)
+            response = await self.client.get(
+                f"/api/task/{created['task_id']}/", headers=headers
+            )
+            task = response.json()
+            # Only seen if the task was still running when polled
+            if task["status"] == "STARTED" and timing.queue_wait_ms is None:
+                timing.queue_wait_ms = get_elapsed_ms(started_at)
+            elif task["status"] == "SUCCESS":
+                timing.completion_ms = get_elapsed_ms(started_at)
+                if task["result"] is None:
+                    raise BenchmarkError("The task returned no answer.")
+                return created["session_id"]
+            elif task["status"] == "FAILURE":
+                raise BenchmarkError(task["error"])
+        raise BenchmarkError("Timed out waiting for the task.")
+
+    async def stream(
+        self,
+        timing: RequestTiming,
+        path: str,
+        body: dict[str, Any],
+        headers: dict[str, str],
+    ) -> str:
+        started_at = time.monotonic()
+        event = None
+        async with self.client.stream(
+            "POST", path, json=body, headers=headers, timeout=self.timeout
+        ) as response:
+            response.raise_for_status()
+            timing.submit_ms = get_elapsed_ms(started_at)
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line.removeprefix("event: ")
+                    continue
+                if not line.startswith("data: "):
+                    continue
+                data = json.loads(line.removeprefix("data: "))
+                if event == "token" and timing.first_token_ms is None:
+                    timing.first_token_ms = get_elapsed_ms(started_at)
+                elif event == "done":
+                    timing.completion_ms = get_elapsed_ms(started_at)
+                    return data["session_id"]
+                elif event == "error":
+                    raise BenchmarkError(data.get("error") or str(data))
+        raise BenchmarkError("The stream ended without an answer.")
+
+    def get_report(self, duration: float) -> dict[str, Any]:
+        requests = {}
+        for kind in ("analysis", "question"):
+            timings = [timing for timing in self.timings if timing.kind == kind]
+            succeeded = [timing for timing in timings if not timing.error]
+            requests[kind] = {
+                "count": len(timings),
+                "errors": len(timings) - len(succeeded),
+                **{
+                    metric: get_summary(
+                        [
+                            value
+                            for timing in succeeded
+                            if (value := getattr(timing, metric)) is not None
+                        ]
+                    )
+                    for metric in METRICS
+                },
+            }
+        completed = sum(1 for timing in self.timings if not timing.error)
+        return {
+            "mode": self.mode.value,
+            "concurrency": self.concurrency,
+            "conversations": len(self.conversations),
+            "failed_conversations": self.failed_conversations,
+            "duration_seconds": duration,
+            "throughput_per_second": completed / duration if duration else 0.0,
+            "requests": requests,
+            "errors": sorted({timing.error for timing in self.timings if timing.error}),
+            "timings": [asdict(timing) for timing in self.timings],
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays the conversations of test_data.json (texts and follow-up questions) "
+        + "against a running stack at the given concurrency, and reports the "
+        + "p50/p95/p99 submit latency, queue wait, completion latency and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument(
+            "--data", default=str(settings.BASE_DIR.parent / "test_data.json")
+        )
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--conversations",
+            type=int,
+            default=None,
+            help="Number of conversations to replay, cycling through the data. "
+            + "Defaults to one per entry of the data.",
+        )
+        parser.add_argument(
+            "--mode", choices=[mode.value for mode in BenchmarkMode], default="poll"
+        )
+        parser.add_argument("--poll-interval", type=float, default=0.1)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=300.0,
+            help="Seconds to wait for each answer.",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="JSON file to save the results to. Defaults to "
+            + "benchmark-<timestamp>.json in the current directory.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            data = json.loads(Path(options["data"]).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read the data file: {e}") from e
+        if not data:
+            raise CommandError("The data file has no conversations.")
+        count = options["conversations"] or len(data)
+        conversations = [data[index % len(data)] for index in range(count)]
+
+        started_at = datetime.now(UTC)
+        report = asyncio.run(self.run_benchmark(conversations, options))
+        report = {
+            "started_at": started_at.isoformat(),
+            "base_url": options["base_url"],
+            **report,
+        }
+
+        output = Path(
+            options["output"]
+            or f"benchmark-{started_at.strftime('%Y%m%dT%H%M%S')}.json"
+        )
+        output.write_text(json.dumps(report, indent=2))
+        self.write_report(report)
+        self.stdout.write(f"Results saved to {output}")
+
+    async def run_benchmark(
+        self, conversations: list[dict[str, Any]], options: dict[str, Any]
+    ) -> dict[str, Any]:
+        limits = httpx.Limits(max_connections=options["concurrency"] * 2)
+        async with httpx.AsyncClient(
+            base_url=options["base_url"], limits=limits, timeout=options["timeout"]
+        ) as client:
+            benchmark = LoadBenchmark(
+                client=client,
+                conversations=conversations,
+                concurrency=options["concurrency"],
+                mode=BenchmarkMode(options["mode"]),
+                poll_interval=options["poll_interval"],
+                timeout=options["timeout"],
+            )
+            return await benchmark.run()
+
+    def write_report(self, report: dict[str, Any]) -> None:
+        self.stdout.write(
+            f"Conversations: {report['conversations']} "
+            + f"({report['failed_conversations']} failed), "
+            + f"concurrency: {report['concurrency']}, mode: {report['mode']}"
+        )
+        self.stdout.write(f"Duration:      {report['duration_seconds']:10.2f} s")
+        self.stdout.write(
+            f"Throughput:    {report['throughput_per_second']:10.2f} req/s"
+        )
+        for kind, stats in report["requests"].items():
+            self.stdout.write(f"{kind}: {stats['count']} ({stats['errors']} errors)")
+            for metric in METRICS:
+                summary = stats[metric]
+                if summary["p50"] is None:
+                    continue
+                percentiles = " ".join(
+                    f"p{percent}={summary[f'p{percent}']:.1f}"
+                    for percent in PERCENTILES
+                )
+                self.stdout.write(f"  {metric:<16}{percentiles}")
+        for error in report["errors"]:
+            self.stdout.write(self.style.ERROR(f"Error: {error}"))
@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from celery.concurrency import get_implementation
+from django.core.management.base import BaseCommand, CommandError
+
+from mentor.assistant.agent import get_agent, get_title_messages
+from mentor.assistant.settings import AiPlatform, Settings
+from mentor.assistant.tasks import prepare_worker_process, shutdown_worker_process
+from mentor.core.celery import app
+
+POOLS = ["prefork", "threads"]
+
+BENCHMARK_TEXT = "The quick brown fox jumps over the lazy dog."
+
+
+def run_model_call() -> None:
+    """
+    The work of a task bound by the model latency: a title generation.
+    """
+    get_agent().model.invoke(get_title_messages(BENCHMARK_TEXT))
+
+
+def get_child_pids(pid: int) -> list[int]:
+    """
+    PIDs of the children of the process and of their own children.
+    """
+    children: list[int] = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            children.extend(
+                int(child) for child in (task / "children").read_text().split()
+            )
+        except OSError:
+            continue
+    return children + [
+        descendant for child in children for descendant in get_child_pids(child)
+    ]
+
+
+def get_pss_kb(pid: int) -> int:
+    """
+    Proportional set size of the process: the pages shared with other processes
+    (e.g. copied on write by the prefork children) are split between them, so the
+    sizes of a process tree add up to its actual memory use.
+    """
+    try:
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def get_memory_mb(pid: int) -> float:
+    return sum(get_pss_kb(p) for p in [pid, *get_child_pids(pid)]) / 1024
+
+
+class MemorySampler:
+    """
+    Samples the memory of the process tree in a thread and keeps its peak.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb = 0.0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            self.peak_mb = max(self.peak_mb, get_memory_mb(self.pid))
+            self.stopped.wait(self.interval)
+
+    def __enter__(self) -> "MemorySampler":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stopped.set()
+        self.thread.join()
+        self.peak_mb = max(self.peak_mb, get_memory_mb(self.pid))
+
+
+def run_calls(pool, work: Callable[[], Any], count: int) -> int:
+    """
+    Runs the work `count` times in the pool and waits for all of them. Returns the
+    number of calls that failed.
+    """
+    done = threading.Semaphore(0)
+    errors = []
+
+    def on_error(*args, **kwargs):
+        errors.append(args)
+        done.release()
+
+    for _ in range(count):
+        pool.apply_async(
+            work, callback=lambda result: done.release(), error_callback=on_error
+        )
+    for _ in range(count):
+        done.acquire()
+    return len(errors)
+
+
+def benchmark_pool(
+    pool_name: str, concurrency: int, tasks: int, work: Callable[[], Any]
+) -> dict[str, Any]:
+    """
+    Runs the work in the Celery pool like a worker would, after one warm-up call
+    per process or thread, and measures its throughput and peak memory.
+    """
+    options: dict[str, Any] = {}
+    if pool_name == "prefork":
+        # The children prepare themselves on `worker_process_init`
+        options["initargs"] = (app, "benchmark")
+    else:
+        prepare_worker_process()
+    pool = get_implementation(pool_name)(limit=concurrency, app=app, **options)
+    pool.start()
+    try:
+        run_calls(pool, work, concurrency)
+        with MemorySampler(os.getpid()) as sampler:
+            started_at = time.monotonic()
+            errors = run_calls(pool, work, tasks)
+            duration = time.monotonic() - started_at
+    finally:
+        pool.stop()
+        if pool_name != "prefork":
+            shutdown_worker_process()
+
+    throughput = (tasks - errors) / duration if duration else 0.0
+    return {
+        "pool": pool_name,
+        "concurrency": concurrency,
+        "tasks": tasks,
+        "errors": errors,
+        "duration_seconds": duration,
+        "tasks_per_second": throughput,
+        "peak_memory_mb": sampler.peak_mb,
+        "tasks_per_second_per_gb": (
+            throughput / (sampler.peak_mb / 1024) if sampler.peak_mb else 0.0
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs model-bound tasks through the prefork and threads pools of Celery "
+        + "at the given concurrencies, and reports the throughput, peak memory "
+        + "(PSS of the worker processes) and tasks per second per GB of each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pools", nargs="+", choices=POOLS, default=POOLS)
+        parser.add_argument("--concurrency", nargs="+", type=int, default=[4, 16])
+        parser.add_argument(
+            "--tasks", type=int, default=200, help="Tasks to run per pool."
+        )
+        parser.add_argument(
+            "--output", default=None, help="JSON file to save the results to."
+        )
+
+    def handle(self, *args, **options):
+        if Settings().ai_platform != AiPlatform.FAKE:
+            raise CommandError(
+                "Set AI_PLATFORM=fake to benchmark the workers without calling "
+                + "a provider."
+            )
+
+        results = []
+        for pool_name in options["pools"]:
+            for concurrency in options["concurrency"]:
+                result = benchmark_pool(
+                    pool_name, concurrency, options["tasks"], run_model_call
+                )
+                results.append(result)
+                self.write_result(result)
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Results saved to {options['output']}")
+
+    def write_result(self, result: dict[str, Any]) -> None:
+        self.stdout.write(
+            f"{result['pool']:<8} concurrency {result['concurrency']:>4}: "
+            + f"{result['tasks_per_second']:8.1f} tasks/s "
+            + f"{result['peak_memory_mb']:8.1f} MB "
+            + f"{result['tasks_per_second_per_gb']:8.1f} tasks/s/GB"
+            + (f" ({result['errors']} errors)" if result["errors"] else "")
+        )
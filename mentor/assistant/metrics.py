@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import socket
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from contextvars import ContextVar
+from datetime import datetime
+from functools import cache
+from typing import Any
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Avg, Count, Q, Sum
+from django.forms.models import model_to_dict
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import RunnableConfig
+
+from mentor.assistant.models import LlmCall
+from mentor.assistant.settings import LlmMetricsSettings, MetricsSink
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds the current Celery task waited in the queue (see tasks.py)
+queue_wait_ms: ContextVar[float | None] = ContextVar("queue_wait_ms", default=None)
+
+
+class LlmCallSink(ABC):
+    @abstractmethod
+    def record(self, call: LlmCall) -> None:
+        raise NotImplementedError
+
+
+class DatabaseSink(LlmCallSink):
+    """
+    Stores each call in the `llm_call` table.
+
+    Calls are also recorded from threads that no request or task cleans up after
+    (e.g. the threads of a chain batch), so a connection opened by the write is
+    closed after it instead of being left open with the thread.
+    """
+
+    def record(self, call: LlmCall) -> None:
+        opened = connection.connection is None
+        try:
+            call.save()
+        finally:
+            if opened:
+                connection.close()
+
+
+class LogSink(LlmCallSink):
+    """
+    Logs each call as a JSON object, to be collected by the log pipeline.
+    """
+
+    def record(self, call: LlmCall) -> None:
+        data = model_to_dict(call, exclude=["id"])
+        logger.info("LLM call: %s", json.dumps(data, default=str))
+
+
+class StatsdSink(LlmCallSink):
+    """
+    Sends the timings and token counts of each call to a StatsD server over UDP,
+    tagged with the prompt, provider and model (DogStatsD tag format).
+    """
+
+    def __init__(self, host: str, port: int, prefix: str):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def get_lines(self, call: LlmCall) -> list[str]:
+        tags = f"prompt:{call.prompt_name},provider:{call.provider},model:{call.model}"
+        values = [
+            ("calls", 1, "c"),
+            ("errors", 1 if call.error else 0, "c"),
+            ("latency_ms", call.latency_ms, "ms"),
+            ("time_to_first_token_ms", call.time_to_first_token_ms, "ms"),
+            ("queue_wait_ms", call.queue_wait_ms, "ms"),
+            ("prompt_tokens", call.prompt_tokens, "h"),
+            ("completion_tokens", call.completion_tokens, "h"),
+        ]
+        return [
+            f"{self.prefix}.{name}:{value}|{metric_type}|#{tags}"
+            for name, value, metric_type in values
+            if value is not None
+        ]
+
+    def record(self, call: LlmCall) -> None:
+        self.socket.sendto("\n".join(self.get_lines(call)).encode(), self.address)
+
+
+def create_sink(sink: MetricsSink, settings: LlmMetricsSettings) -> LlmCallSink:
+    match sink:
+        case MetricsSink.DATABASE:
+            return DatabaseSink()
+        case MetricsSink.LOG:
+            return LogSink()
+        case MetricsSink.STATSD:
+            return StatsdSink(
+                host=settings.statsd_host,
+                port=settings.statsd_port,
+                prefix=settings.statsd_prefix,
+            )
+    raise ValueError(f"Unsupported metrics sink: {sink.value}")
+
+
+class LlmCallMetricsHandler(BaseCallbackHandler):
+    """
+    LangChain callback that measures each chat model call (latency, time to first
+    token and token usage) and records it, along with the prompt name, session and
+    queue wait passed in the run metadata (see `get_run_config`), in the sinks.
+
+    The handler runs inline so the timings are taken when the events happen.
+    Calls made inside an event loop are recorded in the background through
+    `sync_to_async`, like the other Django code of the loop, so that the sinks
+    (e.g. the database) never block the loop.
+    """
+
+    run_inline = True
+
+    def __init__(self, sinks: Sequence[LlmCallSink]):
+        self.sinks = sinks
+        # Start time and pending record of each call in progress
+        self.runs: dict[UUID, tuple[float, LlmCall]] = {}
+        # Records in progress of the calls made inside an event loop
+        self.writes: set[asyncio.Task] = set()
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        invocation_params = kwargs.get("invocation_params") or {}
+        call = LlmCall(
+            prompt_name=metadata.get("prompt_name", ""),
+            provider=metadata.get("ls_provider", ""),
+            model=metadata.get("ls_model_name")
+            or invocation_params.get("model")
+            or invocation_params.get("model_name")
+            or "",
+            session_id=metadata.get("session_id"),
+            queue_wait_ms=metadata.get("queue_wait_ms"),
+        )
+        self.runs[run_id] = (time.monotonic(), call)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self.runs.get(run_id)
+        if run is None:
+            return
+        started_at, call = run
+        if call.time_to_first_token_ms is None:
+            call.time_to_first_token_ms = (time.monotonic() - started_at) * 1000
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+        started_at, call = run
+        call.latency_ms = (time.monotonic() - started_at) * 1000
+
+        generation = response.generations[0][0] if response.generations else None
+        if isinstance(generation, ChatGeneration):
+            # Routed calls tell which provider answered (see RoutingChatModel)
+            generation_info = generation.generation_info or {}
+            call.provider = generation_info.get("provider", call.provider)
+            message = generation.message
+            call.model = message.response_metadata.get("model_name", call.model)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                call.prompt_tokens = usage["input_tokens"]
+                call.completion_tokens = usage["output_tokens"]
+        self.record(call)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+        started_at, call = run
+        call.latency_ms = (time.monotonic() - started_at) * 1000
+        call.error = repr(error)
+        self.record(call)
+
+    def record(self, call: LlmCall) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.write(call)
+        else:
+            task = loop.create_task(sync_to_async(self.write)(call))
+            # The loop only keeps a weak reference to its tasks
+            self.writes.add(task)
+            task.add_done_callback(self.writes.discard)
+
+    def write(self, call: LlmCall) -> None:
+        for sink in self.sinks:
+            try:
+                sink.record(call)
+            except Exception:
+                logger.warning("Failed to record the LLM call metrics.", exc_info=True)
+
+
+@cache
+def get_llm_metrics_handler() -> LlmCallMetricsHandler | None:
+    """
+    Returns the metrics handler of this process, or None if no sink is configured.
+    """
+    settings = LlmMetricsSettings()
+    if not settings.llm_metrics_sinks:
+        return None
+    return LlmCallMetricsHandler(
+        [create_sink(sink, settings) for sink in settings.llm_metrics_sinks]
+    )
+
+
+def get_run_config(
+    prompt_name: str, session_id: UUID | str | None = None
+) -> RunnableConfig:
+    """
+    Returns the config of a model call, which attaches the metrics handler and
+    tells it the prompt, session and queue wait of the call.
+    """
+    metadata: dict[str, Any] = {"prompt_name": str(prompt_name)}
+    if session_id is not None:
+        metadata["session_id"] = str(session_id)
+    if (wait := queue_wait_ms.get()) is not None:
+        metadata["queue_wait_ms"] = wait
+    handler = get_llm_metrics_handler()
+    return RunnableConfig(metadata=metadata, callbacks=[handler] if handler else [])
+
+
+def get_llm_call_stats(since: datetime) -> list[dict[str, Any]]:
+    """
+    Aggregates the calls recorded in the `llm_call` table since the given time,
+    per prompt, provider and model.
+    """
+    return list(
+        LlmCall.objects.filter(created_at__gte=since)
+        .values("prompt_name", "provider", "model")
+        .annotate(
+            calls=Count("id"),
+            errors=Count("id", filter=~Q(error="")),
+            avg_queue_wait_ms=Avg("queue_wait_ms"),
+            avg_time_to_first_token_ms=Avg("time_to_first_token_ms"),
+            avg_latency_ms=Avg("latency_ms"),
+            avg_prompt_tokens=Avg("prompt_tokens"),
+            avg_completion_tokens=Avg("completion_tokens"),
+            total_prompt_tokens=Sum("prompt_tokens"),
+            total_completion_tokens=Sum("completion_tokens"),
+        )
+        .order_by("prompt_name", "provider", "model")
+    )
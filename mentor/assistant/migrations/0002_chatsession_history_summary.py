@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("assistant", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatsession",
+            name="history_summary",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="Rolling summary of the older follow-up questions and "
+                "answers, used by the summary history strategy.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="summarized_message_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Number of follow-up messages already folded into the "
+                "summary.",
+            ),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("assistant", "0002_chatsession_history_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LlmCall",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        db_index=True,
+                        help_text="Timestamp when the model call finished.",
+                    ),
+                ),
+                (
+                    "prompt_name",
+                    models.CharField(
+                        blank=True,
+                        help_text="Name of the prompt sent to the model (e.g. 'text_analysis').",
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "provider",
+                    models.CharField(
+                        blank=True,
+                        help_text="Provider of the model (e.g. 'together', 'openai').",
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "model",
+                    models.CharField(
+                        blank=True,
+                        help_text="Name of the model that answered the call.",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "session_id",
+                    models.UUIDField(
+                        blank=True,
+                        db_index=True,
+                        help_text="The UUID of the chat session of the call, if any.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "queue_wait_ms",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Milliseconds the task of the call waited in the queue, for calls made by a task.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "time_to_first_token_ms",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Milliseconds until the first token, for streamed calls.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "latency_ms",
+                    models.FloatField(help_text="Total duration of the call."),
+                ),
+                (
+                    "prompt_tokens",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Number of tokens of the prompt, if reported by the provider.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "completion_tokens",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="Number of tokens of the answer, if reported by the provider.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "error",
+                    models.TextField(
+                        blank=True,
+                        help_text="Error raised by the call, empty if it succeeded.",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "llm_call",
+            },
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:37
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("assistant", "0003_llmcall"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalysisBatch",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        help_text="The UUID of the bulk text analysis.",
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Timestamp when the texts were submitted.",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="ID of the user who submitted the texts.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analysis_batches",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "analysis_batch",
+            },
+        ),
+        migrations.CreateModel(
+            name="AnalysisBatchItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "position",
+                    models.PositiveIntegerField(
+                        help_text="Position of the text in the submitted list."
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        help_text="Whether the text is waiting for its analysis, was analyzed, or its analysis failed.",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "error",
+                    models.TextField(
+                        blank=True,
+                        help_text="Error raised by the analysis, empty if it did not fail.",
+                    ),
+                ),
+                (
+                    "batch",
+                    models.ForeignKey(
+                        help_text="The bulk text analysis to which this text belongs.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="assistant.analysisbatch",
+                    ),
+                ),
+                (
+                    "session",
+                    models.OneToOneField(
+                        help_text="The text analysis session created for this text.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="batch_item",
+                        to="assistant.chatsession",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "analysis_batch_item",
+                "ordering": ["position"],
+            },
+        ),
+    ]
@@ -5,6 +5,20 @@ from django.db import models
 from django.db.models.functions import Now
 
 
+class ChatSessionQuerySet(models.QuerySet):
+    def analyzed(self) -> "ChatSessionQuerySet":
+        """
+        Leaves out the sessions of a bulk analysis whose text wasn't analyzed
+        (pending or failed), as they have no analysis to ask about yet.
+        """
+        return self.exclude(
+            batch_item__status__in=[
+                AnalysisBatchItem.Status.PENDING,
+                AnalysisBatchItem.Status.FAILED,
+            ]
+        )
+
+
 class ChatSession(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -27,6 +41,18 @@ class ChatSession(models.Model):
         blank=True,
         help_text="Title of the text analysed, also used as a title for the session.",
     )
+    history_summary = models.TextField(
+        blank=True,
+        default="",
+        help_text="Rolling summary of the older follow-up questions and answers, "
+        + "used by the summary history strategy.",
+    )
+    summarized_message_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of follow-up messages already folded into the summary.",
+    )
+
+    objects = ChatSessionQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.title} (User: {self.user.username})"
@@ -56,3 +82,127 @@ class ChatMessage(models.Model):
 
     class Meta:
         db_table = "chat_message"
+
+
+class AnalysisBatch(models.Model):
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+        help_text="The UUID of the bulk text analysis.",
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="analysis_batches",
+        help_text="ID of the user who submitted the texts.",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the texts were submitted.",
+    )
+
+    def __str__(self):
+        return f"{self.id} (User: {self.user.username})"
+
+    class Meta:
+        db_table = "analysis_batch"
+
+
+class AnalysisBatchItem(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        COMPLETED = "completed"
+        FAILED = "failed"
+
+    batch = models.ForeignKey(
+        AnalysisBatch,
+        on_delete=models.CASCADE,
+        related_name="items",
+        help_text="The bulk text analysis to which this text belongs.",
+    )
+    session = models.OneToOneField(
+        ChatSession,
+        on_delete=models.CASCADE,
+        related_name="batch_item",
+        help_text="The text analysis session created for this text.",
+    )
+    position = models.PositiveIntegerField(
+        help_text="Position of the text in the submitted list.",
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        help_text="Whether the text is waiting for its analysis, was analyzed, "
+        + "or its analysis failed.",
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="Error raised by the analysis, empty if it did not fail.",
+    )
+
+    class Meta:
+        db_table = "analysis_batch_item"
+        ordering = ["position"]
+
+
+class LlmCall(models.Model):
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Timestamp when the model call finished.",
+    )
+    prompt_name = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="Name of the prompt sent to the model (e.g. 'text_analysis').",
+    )
+    provider = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="Provider of the model (e.g. 'together', 'openai').",
+    )
+    model = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Name of the model that answered the call.",
+    )
+    session_id = models.UUIDField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="The UUID of the chat session of the call, if any.",
+    )
+    queue_wait_ms = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Milliseconds the task of the call waited in the queue, "
+        + "for calls made by a task.",
+    )
+    time_to_first_token_ms = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Milliseconds until the first token, for streamed calls.",
+    )
+    latency_ms = models.FloatField(help_text="Total duration of the call.")
+    prompt_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Number of tokens of the prompt, if reported by the provider.",
+    )
+    completion_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Number of tokens of the answer, if reported by the provider.",
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="Error raised by the call, empty if it succeeded.",
+    )
+
+    def __str__(self):
+        return f"{self.prompt_name} ({self.model}, {self.latency_ms:.0f} ms)"
+
+    class Meta:
+        db_table = "llm_call"
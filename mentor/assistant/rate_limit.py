@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from typing import Any, cast
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+from redis import Redis, RedisError
+
+from mentor.assistant.cache import get_redis_client
+from mentor.assistant.settings import ModelSettings, RateLimitSettings
+
+logger = logging.getLogger(__name__)
+
+# Refills the request and token buckets of a model and, if TAKE is 1, takes one
+# request from them. The token bucket is charged with the tokens of the finished
+# calls (CHARGE), so it can go below zero: new requests then wait until it refills.
+# Returns 0 if the request was taken, or the seconds to wait before trying again.
+# The clock of Redis is used, so all the processes share the same time.
+TOKEN_BUCKET_SCRIPT = """
+local requests_per_second = tonumber(ARGV[1])
+local tokens_per_second = tonumber(ARGV[2])
+local burst_seconds = tonumber(ARGV[3])
+local take = tonumber(ARGV[4])
+local charge = tonumber(ARGV[5])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local function refill(key, rate)
+    local capacity = math.max(rate * burst_seconds, 1)
+    local bucket = redis.call("HMGET", key, "level", "updated_at")
+    local level = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    return math.min(capacity, level + math.max(now - updated_at, 0) * rate)
+end
+
+local requests = math.huge
+if requests_per_second > 0 then
+    requests = refill(KEYS[1], requests_per_second)
+end
+local tokens = math.huge
+if tokens_per_second > 0 then
+    tokens = refill(KEYS[2], tokens_per_second) - charge
+end
+
+local wait = 0
+if take == 1 then
+    if requests < 1 then
+        wait = (1 - requests) / requests_per_second
+    end
+    if tokens <= 0 then
+        wait = math.max(wait, (1 - tokens) / tokens_per_second)
+    end
+    if wait == 0 then
+        requests = requests - 1
+    end
+end
+
+if requests_per_second > 0 then
+    redis.call("HSET", KEYS[1], "level", requests, "updated_at", now)
+    redis.call("EXPIRE", KEYS[1], math.ceil(burst_seconds) + 60)
+end
+if tokens_per_second > 0 then
+    redis.call("HSET", KEYS[2], "level", tokens, "updated_at", now)
+    redis.call("EXPIRE", KEYS[2], math.ceil(burst_seconds) + 60)
+end
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter(BaseRateLimiter):
+    """
+    Token bucket rate limiter shared by all the API and Celery worker processes
+    through Redis, so that together they stay under the requests per minute and
+    tokens per minute limits of a provider and model.
+
+    Each call takes one request from the request bucket. The token bucket is
+    charged with the tokens used by each call once it finishes (see
+    `RateLimitUsageHandler`), since they are only known then. Both buckets hold up
+    to `burst_seconds` worth of their rate, so bursts queue up instead of all
+    reaching the provider at once.
+
+    The limiter only protects the provider: Redis errors are logged and the call
+    is let through.
+    """
+
+    KEY_PREFIX = "mentor:rate_limit"
+
+    def __init__(
+        self,
+        client: Redis,
+        name: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        burst_seconds: float,
+        max_sleep_seconds: float = 1.0,
+    ):
+        self.client = client
+        self.keys = [
+            f"{self.KEY_PREFIX}:{name}:requests",
+            f"{self.KEY_PREFIX}:{name}:tokens",
+        ]
+        self.requests_per_second = requests_per_minute / 60
+        self.tokens_per_second = tokens_per_minute / 60
+        self.burst_seconds = burst_seconds
+        # Waits are capped, so the bucket is checked again in case the estimate
+        # changed (e.g. other processes charged the token bucket)
+        self.max_sleep_seconds = max_sleep_seconds
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def run_script(self, take: bool, charge: int = 0) -> float:
+        try:
+            wait = self.script(
+                keys=self.keys,
+                args=[
+                    self.requests_per_second,
+                    self.tokens_per_second,
+                    self.burst_seconds,
+                    int(take),
+                    charge,
+                ],
+            )
+        except RedisError:
+            logger.warning("Rate limiter check failed.", exc_info=True)
+            return 0.0
+        return float(cast(str, wait))
+
+    def try_acquire(self) -> float:
+        """
+        Takes a request from the bucket. Returns 0 if it was taken, or the seconds
+        to wait before trying again.
+        """
+        return self.run_script(take=True)
+
+    def charge(self, tokens: int) -> None:
+        """
+        Charges the token bucket with the tokens used by a finished call.
+        """
+        if self.tokens_per_second > 0 and tokens > 0:
+            self.run_script(take=False, charge=tokens)
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        while wait := self.try_acquire():
+            if not blocking:
+                return False
+            time.sleep(min(wait, self.max_sleep_seconds))
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        try_acquire = sync_to_async(self.try_acquire, thread_sensitive=False)
+        while wait := await try_acquire():
+            if not blocking:
+                return False
+            await asyncio.sleep(min(wait, self.max_sleep_seconds))
+        return True
+
+
+class RateLimitUsageHandler(BaseCallbackHandler):
+    """
+    Charges the token bucket of the rate limiter with the tokens used by each call
+    of the model, as reported by the provider.
+    """
+
+    def __init__(self, rate_limiter: RedisRateLimiter):
+        self.rate_limiter = rate_limiter
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        generation = response.generations[0][0] if response.generations else None
+        if not isinstance(generation, ChatGeneration):
+            return
+        usage = getattr(generation.message, "usage_metadata", None)
+        if usage:
+            self.rate_limiter.charge(usage["input_tokens"] + usage["output_tokens"])
+
+
+def get_rate_limiter(
+    provider: str, model_settings: ModelSettings, settings: RateLimitSettings
+) -> RedisRateLimiter | None:
+    """
+    Returns the rate limiter of the provider and model, or None if no limit is set.
+    """
+    if not (model_settings.requests_per_minute or model_settings.tokens_per_minute):
+        return None
+    return RedisRateLimiter(
+        client=get_redis_client(),
+        name=f"{provider}:{model_settings.model}",
+        requests_per_minute=model_settings.requests_per_minute,
+        tokens_per_minute=model_settings.tokens_per_minute,
+        burst_seconds=settings.rate_limit_burst_seconds,
+    )
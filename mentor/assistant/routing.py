@@ -0,0 +1,225 @@
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig
+from pydantic import ConfigDict, Field
+
+logger = logging.getLogger(__name__)
+
+
+def get_inner_config() -> RunnableConfig:
+    """
+    Config of the calls to the wrapped models. They don't inherit the callbacks of
+    the outer call, so that its handlers (e.g. the LLM call metrics) see it once.
+    The wrapped models keep their own callbacks (e.g. the rate limit usage).
+    """
+    return RunnableConfig(callbacks=[])
+
+
+def get_chat_result(name: str, message: BaseMessage) -> ChatResult:
+    # The name of the model that answered is reported to the callbacks
+    # (e.g. the LLM call metrics) in the generation info
+    generation = ChatGeneration(message=message, generation_info={"provider": name})
+    return ChatResult(generations=[generation])
+
+
+def get_chat_generation_chunk(
+    name: str, chunk: BaseMessageChunk, first: bool
+) -> ChatGenerationChunk:
+    # The generation info of the chunks is merged by concatenating the strings,
+    # so the model name is only sent with the first chunk
+    return ChatGenerationChunk(
+        message=chunk, generation_info={"provider": name} if first else None
+    )
+
+
+class ProviderHealth:
+    """
+    Rolling latency and error rate of the calls made to a provider within the last
+    `window_seconds`. Once a provider has no recent calls it is rated as new again,
+    so a provider that failed gets retried after the window.
+    """
+
+    def __init__(self, window_seconds: float, max_samples: int = 1000):
+        self.window_seconds = window_seconds
+        # (finished at, latency in seconds, failed)
+        self.samples: deque[tuple[float, float, bool]] = deque(maxlen=max_samples)
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, failed: bool = False) -> None:
+        with self.lock:
+            self.samples.append((time.monotonic(), latency, failed))
+
+    def get_recent_samples(self) -> list[tuple[float, float, bool]]:
+        threshold = time.monotonic() - self.window_seconds
+        with self.lock:
+            while self.samples and self.samples[0][0] < threshold:
+                self.samples.popleft()
+            return list(self.samples)
+
+    def get_stats(self) -> dict[str, float]:
+        samples = self.get_recent_samples()
+        latencies = [latency for _, latency, failed in samples if not failed]
+        failures = sum(1 for *_, failed in samples if failed)
+        return {
+            "calls": len(samples),
+            "error_rate": failures / len(samples) if samples else 0.0,
+            "latency": sum(latencies) / len(latencies) if latencies else 0.0,
+        }
+
+
+class RoutingChatModel(BaseChatModel):
+    """
+    Chat model that sends each call to the healthiest of several models, and falls
+    back to the next one if the call fails. Models whose recent error rate is above
+    `max_error_rate` are only used as a fallback, and the others are tried in order
+    of their recent average latency.
+
+    A streamed call only falls back if the model fails before the first chunk.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    models: dict[str, BaseChatModel]
+    window_seconds: float = 60.0
+    max_error_rate: float = 0.5
+    health: dict[str, ProviderHealth] = Field(default_factory=dict, exclude=True)
+
+    def model_post_init(self, context: Any) -> None:
+        for name in self.models:
+            self.health.setdefault(name, ProviderHealth(self.window_seconds))
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"models": list(self.models)}
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        return {name: health.get_stats() for name, health in self.health.items()}
+
+    def get_ordered_models(self) -> list[tuple[str, BaseChatModel]]:
+        stats = self.get_stats()
+        names = sorted(
+            self.models,
+            key=lambda name: (
+                stats[name]["error_rate"] > self.max_error_rate,
+                stats[name]["latency"],
+            ),
+        )
+        return [(name, self.models[name]) for name in names]
+
+    def record_failure(self, name: str, started_at: float) -> None:
+        self.health[name].record(time.monotonic() - started_at, failed=True)
+        logger.warning("Model %s failed, falling back.", name, exc_info=True)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        error: Exception | None = None
+        for name, model in self.get_ordered_models():
+            started_at = time.monotonic()
+            try:
+                message = model.invoke(
+                    messages, get_inner_config(), stop=stop, **kwargs
+                )
+            except Exception as e:
+                self.record_failure(name, started_at)
+                error = e
+                continue
+            self.health[name].record(time.monotonic() - started_at)
+            return get_chat_result(name, message)
+        raise error or ValueError("No models to route to.")
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        error: Exception | None = None
+        for name, model in self.get_ordered_models():
+            started_at = time.monotonic()
+            try:
+                message = await model.ainvoke(
+                    messages, get_inner_config(), stop=stop, **kwargs
+                )
+            except Exception as e:
+                self.record_failure(name, started_at)
+                error = e
+                continue
+            self.health[name].record(time.monotonic() - started_at)
+            return get_chat_result(name, message)
+        raise error or ValueError("No models to route to.")
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        error: Exception | None = None
+        for name, model in self.get_ordered_models():
+            started_at = time.monotonic()
+            streamed = False
+            try:
+                for chunk in model.stream(
+                    messages, get_inner_config(), stop=stop, **kwargs
+                ):
+                    yield get_chat_generation_chunk(name, chunk, first=not streamed)
+                    streamed = True
+            except Exception as e:
+                self.record_failure(name, started_at)
+                if streamed:
+                    raise
+                error = e
+                continue
+            self.health[name].record(time.monotonic() - started_at)
+            return
+        raise error or ValueError("No models to route to.")
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        error: Exception | None = None
+        for name, model in self.get_ordered_models():
+            started_at = time.monotonic()
+            streamed = False
+            try:
+                async for chunk in model.astream(
+                    messages, get_inner_config(), stop=stop, **kwargs
+                ):
+                    yield get_chat_generation_chunk(name, chunk, first=not streamed)
+                    streamed = True
+            except Exception as e:
+                self.record_failure(name, started_at)
+                if streamed:
+                    raise
+                error = e
+                continue
+            self.health[name].record(time.monotonic() - started_at)
+            return
+        raise error or ValueError("No models to route to.")
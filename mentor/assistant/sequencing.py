@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import cast
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from redis import Redis, RedisError
+
+from mentor.assistant.cache import get_redis_client
+from mentor.assistant.settings import SessionOrderingSettings
+
+logger = logging.getLogger(__name__)
+
+# Marks the ticket ARGV[1] of the session (KEYS[1]) as done, and keeps the session
+# for ARGV[2] seconds. A ticket whose question ran moves `done` up to it, unless a
+# later ticket already is done. A ticket released without running (ARGV[3] is 1)
+# is only skipped once the tickets before it are done. `done_at` is the time
+# (ARGV[4]) `done` last moved.
+FINISH_SCRIPT = """
+local done = tonumber(redis.call("HGET", KEYS[1], "done") or "0")
+local last_done = done
+local ticket = tonumber(ARGV[1])
+if ARGV[3] == "1" then
+    if ticket > done then
+        redis.call("HSET", KEYS[1], "released:" .. ticket, 1)
+    end
+elseif ticket > done then
+    done = ticket
+end
+while redis.call("HDEL", KEYS[1], "released:" .. (done + 1)) == 1 do
+    done = done + 1
+end
+if done > last_done then
+    redis.call("HSET", KEYS[1], "done", done, "done_at", ARGV[4])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[2])
+return done
+"""
+
+
+class SessionSequencer:
+    """
+    Runs the follow-up questions of a session one at a time, in the order they were
+    asked, in any Celery worker process, through Redis. Questions of different
+    sessions don't wait for each other.
+
+    Each question takes the next ticket of its session when it is queued. Its task
+    checks whether the task of the previous ticket is done, so that it reads the
+    history with the previous answer, and is retried after `retry_seconds` if not.
+    It marks its own ticket as done at the end. If the previous tasks make no
+    progress for `turn_timeout_seconds` (e.g. a task was lost or its worker died),
+    the waiting task goes ahead anyway.
+
+    Ordering only prevents races: Redis errors are logged and the question runs.
+    """
+
+    KEY_PREFIX = "mentor:session_sequence"
+
+    def __init__(
+        self,
+        client: Redis,
+        turn_timeout_seconds: float,
+        ttl_seconds: int,
+        retry_seconds: float = 1.0,
+    ):
+        self.client = client
+        self.turn_timeout_seconds = turn_timeout_seconds
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.finish_script = client.register_script(FINISH_SCRIPT)
+
+    def get_key(self, session_id: UUID | str) -> str:
+        return f"{self.KEY_PREFIX}:{session_id}"
+
+    def take_ticket(self, session_id: UUID | str) -> int | None:
+        """
+        Returns the place of a new question in the session, or None if it can't be
+        ordered.
+        """
+        key = self.get_key(session_id)
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.hincrby(key, "next")
+            pipeline.expire(key, self.ttl_seconds)
+            ticket, _ = pipeline.execute()
+        except RedisError:
+            logger.warning("Taking a session ticket failed.", exc_info=True)
+            return None
+        return int(ticket)
+
+    def get_done(self, session_id: UUID | str) -> int:
+        """
+        The last ticket of the session whose task is done.
+        """
+        done = cast(str | None, self.client.hget(self.get_key(session_id), "done"))
+        return int(done or 0)
+
+    def is_turn(
+        self, session_id: UUID | str, ticket: int, waiting_since: float
+    ) -> bool:
+        """
+        Whether the tasks of the previous tickets of the session are done, or made
+        no progress since the ticket started waiting (a `time.time()`) or since
+        the last of them was done, whichever is later.
+        """
+        try:
+            done, done_at = cast(
+                list[str | None],
+                self.client.hmget(self.get_key(session_id), ["done", "done_at"]),
+            )
+        except RedisError:
+            logger.warning("Checking the session turn failed.", exc_info=True)
+            return True
+        if int(done or 0) >= ticket - 1:
+            return True
+        progressed_at = max(float(done_at or 0), waiting_since)
+        if time.time() - progressed_at <= self.turn_timeout_seconds:
+            return False
+        logger.warning(
+            "Ticket %s of session %s stopped waiting for ticket %s.",
+            ticket,
+            session_id,
+            int(done or 0) + 1,
+        )
+        return True
+
+    def finish(
+        self, session_id: UUID | str, ticket: int, released: bool = False
+    ) -> None:
+        """
+        Marks the ticket as done once its question ran, or as skipped if it was
+        `released` without running (e.g. its task couldn't be queued).
+        """
+        try:
+            self.finish_script(
+                keys=[self.get_key(session_id)],
+                args=[ticket, self.ttl_seconds, int(released), time.time()],
+            )
+        except RedisError:
+            logger.warning("Finishing the session turn failed.", exc_info=True)
+
+    def release(self, session_id: UUID | str, ticket: int) -> None:
+        self.finish(session_id, ticket, released=True)
+
+
+def get_session_sequencer() -> SessionSequencer | None:
+    """
+    Returns the ordering of the follow-up questions, or None if it is disabled.
+    """
+    settings = SessionOrderingSettings()
+    if not settings.session_ordering_enabled:
+        return None
+    return SessionSequencer(
+        client=get_redis_client(),
+        turn_timeout_seconds=settings.session_ordering_timeout_seconds,
+        ttl_seconds=settings.session_ordering_ttl_seconds,
+        retry_seconds=settings.session_ordering_retry_seconds,
+    )
+
+
+@asynccontextmanager
+async def session_turn(session_id: UUID | str) -> AsyncIterator[None]:
+    """
+    Takes the next ticket of the session and waits for its turn, like the follow-up
+    question tasks do, for the questions answered in the request itself. The ticket
+    is finished on exit, or released if the wait is interrupted (e.g. the client
+    disconnected).
+    """
+    sequencer = get_session_sequencer()
+    if sequencer is None:
+        yield
+        return
+    ticket = await sync_to_async(sequencer.take_ticket, thread_sensitive=False)(
+        session_id
+    )
+    if ticket is None:
+        yield
+        return
+
+    is_turn = sync_to_async(sequencer.is_turn, thread_sensitive=False)
+    finish = sync_to_async(sequencer.finish, thread_sensitive=False)
+    started = False
+    try:
+        waiting_since = time.time()
+        while not await is_turn(session_id, ticket, waiting_since):
+            await asyncio.sleep(sequencer.retry_seconds)
+        started = True
+        yield
+    finally:
+        await finish(session_id, ticket, released=not started)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
-from mentor.assistant.models import ChatMessage, ChatSession
+from mentor.assistant.models import AnalysisBatchItem, ChatMessage, ChatSession
+from mentor.assistant.settings import BulkAnalysisSettings
 
 
 class TextAnalysisRequestSerializer(serializers.Serializer):
@@ -17,6 +18,22 @@ class TextAnalysisRequestSerializer(serializers.Serializer):
     )
 
 
+class BulkTextAnalysisRequestSerializer(serializers.Serializer):
+    items = TextAnalysisRequestSerializer(
+        many=True,
+        allow_empty=False,
+        help_text="The texts to be analyzed, each with an optional title.",
+    )
+
+    def validate_items(self, items):
+        max_items = BulkAnalysisSettings().bulk_analysis_max_items
+        if len(items) > max_items:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {max_items} elements."
+            )
+        return items
+
+
 class SessionResponseSerializer(serializers.ModelSerializer):
     session_id = serializers.UUIDField(
         source="id", help_text="The UUID of the session."
@@ -62,3 +79,51 @@ class QuestionRequestSerializer(serializers.Serializer):
         allow_blank=False,
         help_text="The follow-up question based on the session history.",
     )
+
+
+class AnswerResponseSerializer(serializers.Serializer):
+    session_id = serializers.UUIDField(
+        help_text="The UUID of the text analysis session.",
+    )
+    content = serializers.CharField(
+        help_text="The response generated by the language model.",
+    )
+
+
+class AnalysisResponseSerializer(AnswerResponseSerializer):
+    title = serializers.CharField(
+        help_text="The title of the text analysis session.",
+    )
+
+
+class AnalysisBatchItemResponseSerializer(serializers.ModelSerializer):
+    session_id = serializers.UUIDField(
+        help_text="The UUID of the text analysis session of the text."
+    )
+    title = serializers.CharField(
+        source="session.title",
+        help_text="The title of the session, empty until it is generated.",
+    )
+
+    class Meta:
+        model = AnalysisBatchItem
+        fields = ["position", "session_id", "title", "status", "error"]
+
+
+class AnalysisBatchResponseSerializer(serializers.Serializer):
+    batch_id = serializers.UUIDField(
+        help_text="The UUID of the bulk text analysis.",
+    )
+    created_at = serializers.DateTimeField(
+        help_text="Timestamp when the texts were submitted.",
+    )
+    total = serializers.IntegerField(help_text="Number of texts.")
+    pending = serializers.IntegerField(help_text="Number of texts being analyzed.")
+    completed = serializers.IntegerField(help_text="Number of texts analyzed.")
+    failed = serializers.IntegerField(
+        help_text="Number of texts whose analysis failed."
+    )
+    items = AnalysisBatchItemResponseSerializer(
+        many=True,
+        help_text="Progress of each text, in the submitted order.",
+    )
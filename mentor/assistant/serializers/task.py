@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from mentor.assistant.settings import TaskStatusSettings
+
 
 class TaskCreatedResponseSerializer(serializers.Serializer):
     session_id = serializers.UUIDField(
@@ -8,6 +10,12 @@ class TaskCreatedResponseSerializer(serializers.Serializer):
     task_id = serializers.UUIDField(
         help_text="The UUID of the async task created to process the request.",
     )
+    estimated_tokens = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        default=None,
+        help_text="Estimated prompt tokens of the model calls of the task.",
+    )
 
 
 class TaskStatusResponseSerializer(serializers.Serializer):
@@ -30,3 +38,42 @@ class TaskStatusResponseSerializer(serializers.Serializer):
         default=None,
         help_text="Error message if the task failed.",
     )
+
+
+class TaskStatusBatchRequestSerializer(serializers.Serializer):
+    task_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        help_text="The UUIDs of the async tasks to check.",
+    )
+
+    def validate_task_ids(self, task_ids):
+        max_ids = TaskStatusSettings().task_status_batch_max_ids
+        if len(task_ids) > max_ids:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {max_ids} elements."
+            )
+        return task_ids
+
+
+class TaskEventSerializer(TaskStatusResponseSerializer):
+    session_id = serializers.UUIDField(
+        required=False,
+        allow_null=True,
+        default=None,
+        help_text="The UUID of the session of the task.",
+    )
+
+
+class BatchTaskCreatedResponseSerializer(serializers.Serializer):
+    batch_id = serializers.UUIDField(
+        help_text="The UUID of the bulk text analysis, used to check its progress.",
+    )
+    task_id = serializers.UUIDField(
+        help_text="The UUID of the async task created to process the texts.",
+    )
+    session_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        help_text="The UUID of the text analysis session of each text, in the "
+        + "submitted order.",
+    )
@@ -9,6 +9,10 @@ class AiPlatform(StrEnum):
     OPENAI = "openai"
     AWS_BEDROCK = "aws_bedrock"
     AZURE_OPENAI = "azure_openai"
+    # Routes each call to the healthiest of the ROUTING_PLATFORMS
+    ROUTING = "routing"
+    # Offline model for load tests (see FakeModelSettings)
+    FAKE = "fake"
 
 
 class MentorBaseSettings(BaseSettings):
@@ -28,6 +32,9 @@ class ModelSettings(MentorBaseSettings):
     model: str
     api_key: SecretStr
     temperature: float = 0.0
+    # Limits of the provider, shared by all the worker processes (0: no limit)
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
     # ...
     # Any other global model configs
 
@@ -54,9 +61,199 @@ class AwsBedrockModelSettings(ModelSettings):
     # any other configs that are specific to AWS Bedrock
 
 
+class LatencyDistribution(StrEnum):
+    CONSTANT = "constant"
+    UNIFORM = "uniform"
+    NORMAL = "normal"
+    LOGNORMAL = "lognormal"
+
+
+class FakeModelSettings(ModelSettings):
+    # Read with the FAKE_ prefix, e.g. FAKE_LATENCY_MS, FAKE_ERROR_RATE
+    model: str = "fake-model"
+    api_key: SecretStr = SecretStr("")
+    # Time to the first token: the mean of the normal distribution, the median of
+    # the lognormal one, or the middle of the uniform one
+    latency_ms: float = 500.0
+    # Standard deviation of the normal distribution (also of the lognormal one, as
+    # a fraction of the median), or half the width of the uniform one
+    latency_jitter_ms: float = 100.0
+    latency_distribution: LatencyDistribution = LatencyDistribution.LOGNORMAL
+    # Generation speed after the first token (0: all at once)
+    tokens_per_second: float = 50.0
+    response_tokens: int = 200
+    # Fraction of the calls that fail after the latency
+    error_rate: float = 0.0
+    # Seed of the latencies and errors, so load tests are repeatable
+    seed: int = 0
+
+
+class HttpClientSettings(MentorBaseSettings):
+    # Connection pool of the HTTP client used to call the model provider,
+    # shared by all the requests handled by a worker process
+    model_http_max_connections: int = 100
+    model_http_max_keepalive_connections: int = 20
+    # Seconds an idle connection is kept open for reuse
+    model_http_keepalive_expiry: float = 60.0
+    model_http2: bool = False
+
+
+class RateLimitSettings(MentorBaseSettings):
+    # Calls can burst up to this many seconds worth of the rate limits
+    rate_limit_burst_seconds: float = 10.0
+
+
+class RoutingSettings(MentorBaseSettings):
+    # Model settings of each platform are read with the platform prefix,
+    # e.g. TOGETHER_API_KEY, TOGETHER_MODEL, OPENAI_API_KEY, OPENAI_MODEL
+    routing_platforms: list[AiPlatform] = [AiPlatform.TOGETHER_AI, AiPlatform.OPENAI]
+    # Calls within this many seconds are used to rate each platform
+    routing_window_seconds: float = 60.0
+    # Platforms failing more than this fraction of calls are only used as fallback
+    routing_max_error_rate: float = 0.5
+
+
+class HedgingSettings(MentorBaseSettings):
+    # If a call takes longer than the HEDGING_PERCENTILE of the recent latencies,
+    # the same call is also sent to the HEDGING_PLATFORM and the first answer wins
+    hedging_enabled: bool = False
+    # Platform of the hedge requests, with its model settings read with the platform
+    # prefix (see RoutingSettings). Defaults to the AI_PLATFORM itself.
+    hedging_platform: AiPlatform | None = None
+    hedging_percentile: float = 95.0
+    hedging_window_seconds: float = 300.0
+    # Until this many calls finished in the window, hedges are sent after the
+    # default delay
+    hedging_min_samples: int = 20
+    hedging_default_delay_seconds: float = 10.0
+    # Threads of each worker process that run the sync hedged calls. A call holds
+    # up to two of them (its primary and hedge requests), so with the threads pool
+    # it should be at least twice the worker concurrency.
+    hedging_max_workers: int = 64
+
+
+class ResponseCacheSettings(MentorBaseSettings):
+    response_cache_enabled: bool = False
+    response_cache_ttl_seconds: int = 7 * 24 * 60 * 60
+    response_cache_max_entries: int = 10_000
+
+
+class CoalescingSettings(MentorBaseSettings):
+    # Identical analysis and title calls in flight at the same time are made once
+    coalescing_enabled: bool = False
+    # Processes waiting on a call make it themselves if it takes longer than this
+    coalescing_lock_ttl_seconds: float = 120.0
+    # Time the result of a call is kept for the processes that were waiting on it
+    coalescing_result_ttl_seconds: int = 60
+
+
+class TaskStatusSettings(MentorBaseSettings):
+    # An idle task event stream gets a keepalive comment this often
+    task_events_keepalive_seconds: float = 15.0
+    # Longest `wait` accepted by the task status route
+    task_status_max_wait_seconds: float = 30.0
+    # Most tasks that can be checked in a single request
+    task_status_batch_max_ids: int = 100
+
+
+class SessionOrderingSettings(MentorBaseSettings):
+    # The follow-up questions of a session are answered one at a time, in order
+    session_ordering_enabled: bool = True
+    # A question stops waiting if the previous ones make no progress for this long
+    session_ordering_timeout_seconds: float = 120.0
+    # A question that isn't next is retried after this long, without holding a worker
+    session_ordering_retry_seconds: float = 1.0
+    # Time the order of an idle session is kept
+    session_ordering_ttl_seconds: int = 86_400
+
+
+class TaskRetrySettings(MentorBaseSettings):
+    # Retries of a text analysis after a transient provider error, before it fails
+    task_retry_max_retries: int = 5
+    # The n-th retry waits a random time up to backoff * 2^n seconds, capped at max
+    task_retry_backoff_seconds: float = 2.0
+    task_retry_backoff_max_seconds: float = 60.0
+
+
+class MetricsSink(StrEnum):
+    # The llm_call table
+    DATABASE = "database"
+    LOG = "log"
+    STATSD = "statsd"
+
+
+class LlmMetricsSettings(MentorBaseSettings):
+    # Where the latency and token usage of each model call are recorded.
+    # An empty list disables the instrumentation.
+    llm_metrics_sinks: list[MetricsSink] = [MetricsSink.DATABASE]
+    statsd_host: str = "localhost"
+    statsd_port: int = 8125
+    statsd_prefix: str = "mentor.llm"
+
+
+class BulkAnalysisSettings(MentorBaseSettings):
+    bulk_analysis_max_items: int = 200
+    # Model calls of a bulk analysis in flight at the same time, for the analyses
+    # and for the titles
+    bulk_analysis_max_concurrency: int = 8
+    # The texts of a bulk analysis still pending after this long are marked as
+    # failed, in case its task was lost
+    bulk_analysis_timeout_seconds: int = 3600
+
+
+class ChunkedAnalysisSettings(MentorBaseSettings):
+    # Texts longer than this (in approximate tokens) are split into chunks that are
+    # analyzed concurrently and then merged. 0 disables the chunked analysis.
+    chunked_analysis_threshold_tokens: int = 12_000
+    chunked_analysis_chunk_tokens: int = 4_000
+    chunked_analysis_max_concurrency: int = 4
+
+
+class TokenCounter(StrEnum):
+    # About 4 characters per token, like langchain_core's count_tokens_approximately
+    APPROXIMATE = "approximate"
+    # The tiktoken encoding TOKEN_COUNTER_ENCODING
+    TIKTOKEN = "tiktoken"
+
+
+class ContextBudgetSettings(MentorBaseSettings):
+    # Texts and questions are measured before they are queued, and rejected if a
+    # model call they need doesn't fit the context window of the model with room
+    # for the answer. 0 disables the check.
+    context_window_tokens: int = 128_000
+    context_reserved_output_tokens: int = 4_000
+    token_counter: TokenCounter = TokenCounter.APPROXIMATE
+    # tiktoken downloads the encoding on first use (or reads it from the
+    # TIKTOKEN_CACHE_DIR). If it can't be loaded, the approximate count is used.
+    token_counter_encoding: str = "o200k_base"
+
+
+class HistoryStrategy(StrEnum):
+    FULL = "full"
+    LAST_TURNS = "last_turns"
+    TOKEN_BUDGET = "token_budget"
+    SUMMARY = "summary"
+
+
+class HistorySettings(MentorBaseSettings):
+    history_strategy: HistoryStrategy = HistoryStrategy.FULL
+    # Number of question/answer turns kept by the last_turns and summary strategies
+    history_max_turns: int = 10
+    # Approximate number of tokens of conversation kept by the token_budget strategy
+    history_max_tokens: int = 4000
+
+
 class PostgreSettings(MentorBaseSettings):
     pg_host: str = "localhost"
     pg_port: int = 5432
     pg_username: str = "mentor"
     pg_password: SecretStr = SecretStr("mentor")
     pg_db_name: str = "mentor"
+    # Pools of the connections used to read and write the chat session history.
+    # Each worker process has its own pools.
+    pg_pool_min_size: int = 1
+    pg_pool_max_size: int = 10
+    # Seconds to wait for a free connection before failing
+    pg_pool_timeout: float = 30.0
+    # Seconds before closing an idle connection above the minimum size
+    pg_pool_max_idle: float = 600.0
@@ -0,0 +1,88 @@
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from enum import StrEnum
+from typing import Any
+from uuid import UUID
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from langchain_core.messages import BaseMessageChunk
+from rest_framework.renderers import BaseRenderer
+
+
+class StreamEvent(StrEnum):
+    SESSION = "session"
+    TOKEN = "token"
+    DONE = "done"
+    ERROR = "error"
+    # Completion of a task (see mentor.assistant.events)
+    TASK = "task"
+
+
+def format_event(event: StreamEvent, data: Any) -> bytes:
+    """
+    Formats a single Server-Sent Event with a JSON payload.
+    """
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    return f"event: {event.value}\ndata: {payload}\n\n".encode()
+
+
+class ServerSentEventRenderer(BaseRenderer):
+    """
+    Lets the streaming views accept `text/event-stream` requests.
+    Streamed answers bypass the renderer, so it only renders the error responses
+    returned before the stream starts (e.g. validation errors).
+    """
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event(StreamEvent.ERROR, data)
+
+
+async def stream_answer_events(
+    session_id: UUID,
+    chunks: AsyncIterator[BaseMessageChunk],
+    on_incomplete: Callable[[], Awaitable[None]] | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Converts the chunks produced by the model into Server-Sent Events:
+    a `session` event, one `token` event per chunk, and a final `done` event
+    carrying the full answer (or an `error` event if generation fails).
+    `on_incomplete` is awaited if the answer isn't complete, because generation
+    failed or the client disconnected.
+    """
+    completed = False
+    try:
+        yield format_event(StreamEvent.SESSION, {"session_id": session_id})
+
+        content = ""
+        try:
+            async for chunk in chunks:
+                token = chunk.text()
+                if not token:
+                    continue
+                content += token
+                yield format_event(StreamEvent.TOKEN, {"content": token})
+        except Exception as e:
+            yield format_event(StreamEvent.ERROR, {"error": str(e)})
+            return
+
+        # The answer was saved to the history at the end of the chunks
+        completed = True
+        yield format_event(
+            StreamEvent.DONE, {"session_id": session_id, "content": content}
+        )
+    finally:
+        if not completed and on_incomplete is not None:
+            await on_incomplete()
+
+
+def get_event_stream_response(events: AsyncIterator[bytes]) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Prevent reverse proxies (e.g. nginx) from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
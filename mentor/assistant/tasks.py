@@ -1,42 +1,405 @@
+import logging
+import random
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import cast
 from uuid import UUID
 
+import httpx
+import openai
+from celery import Task
+from celery.backends.redis import RedisBackend
+from celery.concurrency import get_implementation
+from celery.concurrency.thread import TaskPool as ThreadTaskPool
 from celery.result import AsyncResult
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown,
+)
 from django.contrib.auth.models import User
+from langchain_core.messages import AIMessage, BaseMessage, messages_from_dict
+from psycopg_pool import PoolTimeout
 
-from mentor.assistant.agent import get_agent
-from mentor.assistant.models import ChatSession
+from mentor.assistant.agent import (
+    close_connection_pool,
+    get_agent,
+    get_connection_pool_stats,
+    open_connection_pool,
+)
+from mentor.assistant.cache import get_redis_client
+from mentor.assistant.events import publish_task_event
+from mentor.assistant.fake_llm import FakeProviderError
+from mentor.assistant.metrics import queue_wait_ms
+from mentor.assistant.models import AnalysisBatchItem, ChatMessage, ChatSession
+from mentor.assistant.sequencing import get_session_sequencer
+from mentor.assistant.serializers.task import TaskEventSerializer
+from mentor.assistant.settings import (
+    BulkAnalysisSettings,
+    HedgingSettings,
+    HistorySettings,
+    HistoryStrategy,
+    PostgreSettings,
+    TaskRetrySettings,
+)
 from mentor.core.celery import app
 
+logger = logging.getLogger(__name__)
 
-@app.task
+# Provider errors that a later call may not hit: connection errors and timeouts,
+# rate limits and server errors
+TRANSIENT_PROVIDER_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TransportError,
+    FakeProviderError,
+)
+
+
+@worker_process_init.connect
+def prepare_worker_process(**kwargs) -> None:
+    """
+    Builds the assistant chains and opens the history connection pool when a worker
+    process starts, so that the tasks don't pay for it.
+    """
+    try:
+        get_agent().build_chains()
+    except NotImplementedError:
+        logger.warning("The configured AI platform is not supported yet.")
+
+    try:
+        open_connection_pool()
+    except PoolTimeout:
+        # The pool keeps trying to connect in the background
+        logger.warning("Timed out opening the history connection pool.")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs) -> None:
+    logger.info("History connection pool stats: %s", get_connection_pool_stats())
+    close_connection_pool()
+
+
+def uses_thread_pool(worker) -> bool:
+    """
+    Whether the worker runs its tasks in threads (`--pool=threads`). Its pool is
+    not resolved yet when the worker starts, so it can still be a name.
+    """
+    pool_cls = getattr(worker, "pool_cls", None)
+    if isinstance(pool_cls, str):
+        pool_cls = get_implementation(pool_cls)
+    return isinstance(pool_cls, type) and issubclass(pool_cls, ThreadTaskPool)
+
+
+@worker_init.connect
+def prepare_thread_pool_worker(sender=None, **kwargs) -> None:
+    """
+    A threads pool runs all the tasks in the worker process, which doesn't send
+    `worker_process_init`, so it is prepared here instead. Its threads share the
+    assistant and the history connection pool, and each task holds a pooled
+    connection while its chain runs, so the pool should have a connection per
+    thread. Django connections are per thread and closed after each task.
+    """
+    if sender is None or not uses_thread_pool(sender):
+        return
+    max_size = PostgreSettings().pg_pool_max_size
+    if max_size < sender.concurrency:
+        logger.warning(
+            "PG_POOL_MAX_SIZE (%s) is lower than the worker concurrency (%s), "
+            + "tasks will wait for a history connection.",
+            max_size,
+            sender.concurrency,
+        )
+    hedging_settings = HedgingSettings()
+    if (
+        hedging_settings.hedging_enabled
+        and hedging_settings.hedging_max_workers < 2 * sender.concurrency
+    ):
+        logger.warning(
+            "HEDGING_MAX_WORKERS (%s) is lower than twice the worker concurrency "
+            + "(%s), hedged calls will queue for a thread.",
+            hedging_settings.hedging_max_workers,
+            sender.concurrency,
+        )
+    prepare_worker_process()
+
+
+@worker_shutdown.connect
+def shutdown_thread_pool_worker(sender=None, **kwargs) -> None:
+    if sender is not None and uses_thread_pool(sender):
+        shutdown_worker_process()
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs) -> None:
+    """
+    Stamps each task message with the time it was sent, to measure its queue wait.
+    """
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
+@task_prerun.connect
+def start_task_metrics(task=None, **kwargs) -> None:
+    """
+    Makes the queue wait of the task available to the LLM call metrics.
+    The wait is measured across hosts, so it assumes their clocks are in sync.
+    """
+    enqueued_at = getattr(task.request, "enqueued_at", None) if task else None
+    if enqueued_at is not None:
+        queue_wait_ms.set(max(time.time() - enqueued_at, 0.0) * 1000)
+
+
+@task_postrun.connect
+def finish_task_metrics(**kwargs) -> None:
+    queue_wait_ms.set(None)
+
+
+@task_postrun.connect
+def publish_task_completion(
+    task=None, task_id=None, kwargs=None, retval=None, state=None, **extra
+) -> None:
+    """
+    Publishes the completion of the text analyses and follow-up questions to the
+    task event streams of their user, so clients don't need to poll for it.
+    """
+    if task is None or task.name not in (analyze_text.name, follow_up_question.name):
+        return
+    if state not in ("SUCCESS", "FAILURE"):
+        return
+    kwargs = kwargs or {}
+    user_id = kwargs.get("user_id")
+    if user_id is None:
+        user_id = (
+            ChatSession.objects.filter(id=kwargs.get("session_id"))
+            .values_list("user_id", flat=True)
+            .first()
+        )
+    if user_id is None:
+        return
+
+    event = TaskEventSerializer().to_representation(
+        {
+            "task_id": task_id,
+            "status": state,
+            "result": retval if state == "SUCCESS" else None,
+            "error": str(retval) if state == "FAILURE" else None,
+            "session_id": kwargs.get("session_id"),
+        }
+    )
+    publish_task_event(get_redis_client(), user_id, event)
+
+
+def get_retry_countdown(retries: int, settings: TaskRetrySettings) -> float:
+    """
+    Seconds to wait before the next retry: exponential backoff with full jitter,
+    so the tasks that failed together don't retry together.
+    """
+    backoff = settings.task_retry_backoff_seconds * 2**retries
+    return random.uniform(0, min(backoff, settings.task_retry_backoff_max_seconds))
+
+
+def get_saved_analysis(session_id: UUID) -> str | None:
+    """
+    The analysis that starts the session history, if it was already saved.
+    """
+    messages = messages_from_dict(
+        list(
+            ChatMessage.objects.filter(session_id=session_id)
+            .order_by("id")
+            .values_list("message", flat=True)[:2]
+        )
+    )
+    for message in messages:
+        if isinstance(message, AIMessage):
+            return cast(str, message.content)
+    return None
+
+
+@app.task(bind=True)
 def analyze_text(
-    user_id: int, session_id: UUID, text: str, title: str | None = None
+    self: Task,
+    user_id: int,
+    session_id: UUID,
+    text: str,
+    title: str | None = None,
+    analysis: str | None = None,
 ) -> str | None:
     """
-    Generate a title for the text if not provided, then analyze the text.
+    Analyze the text and, if no title is provided, generate one for it.
+    Both model calls run concurrently, and the session is created as soon as the
+    title is available.
+
+    Transient provider errors are retried with a jittered exponential backoff. A
+    retry resumes from the last completed step: the title and the analysis that
+    were generated are sent with it, the session is only created once, and a
+    session whose history was already saved is answered from it.
     """
     agent = get_agent()
-    if not title:
-        response = agent.generate_title(text)
-        if not response:
-            return None
-        final_title = response.content
-    else:
-        final_title = title
-
     try:
         user = User.objects.get(id=user_id)
     except User.DoesNotExist:
         return None
 
-    ChatSession.objects.create(
-        id=session_id,
-        user=user,
-        title=final_title,
-    )
+    session = ChatSession.objects.filter(id=session_id, user=user).first()
+    if session is not None:
+        saved_analysis = get_saved_analysis(session_id)
+        if saved_analysis is not None:
+            return saved_analysis
+        title = title or session.title
+
+    # The analysis doesn't depend on the title, so it runs in a separate thread
+    # while the title is generated. Database access stays in the task's thread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        response: BaseMessage | None = None
+        pending_analysis = None
+        if analysis is None:
+            pending_analysis = executor.submit(
+                copy_context().run, agent.generate_analysis, text
+            )
+
+        try:
+            if not title:
+                title_response = agent.generate_title(text)
+                if not title_response:
+                    return None
+                title = cast(str, title_response.content)
 
-    response = agent.analyze_text(session_id=session_id, text=text)
-    return response.content if response else None
+            if session is None:
+                ChatSession.objects.create(id=session_id, user=user, title=title)
+
+            if pending_analysis is not None:
+                response = pending_analysis.result()
+            elif analysis is not None:
+                response = AIMessage(content=analysis)
+        except TRANSIENT_PROVIDER_ERRORS as e:
+            # Keeps the analysis if only the title failed
+            if pending_analysis is not None and pending_analysis.exception() is None:
+                response = pending_analysis.result()
+                analysis = cast(str, response.content) if response else None
+            settings = TaskRetrySettings()
+            raise self.retry(
+                exc=e,
+                kwargs={
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "text": text,
+                    "title": title,
+                    "analysis": analysis,
+                },
+                countdown=get_retry_countdown(self.request.retries, settings),
+                max_retries=settings.task_retry_max_retries,
+            ) from e
+
+    if not response:
+        return None
+
+    agent.save_analysis(session_id=session_id, text=text, analysis=response)
+    return cast(str, response.content)
+
+
+@app.task
+def analyze_batch(batch_id: UUID, texts: list[str]) -> dict[str, int]:
+    """
+    Analyze the texts of a bulk analysis, whose sessions were already created.
+    The analyses and the missing titles are generated in two concurrent batches
+    of model calls, and each item is updated as soon as its analysis is ready.
+    """
+    agent = get_agent()
+    max_concurrency = BulkAnalysisSettings().bulk_analysis_max_concurrency
+    items = {
+        item.position: item
+        for item in AnalysisBatchItem.objects.filter(batch_id=batch_id).select_related(
+            "session"
+        )
+    }
+    untitled = [item for item in items.values() if not item.session.title]
+
+    # The titles are generated in a separate thread while the analyses are saved.
+    # Database access stays in the task's thread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        titles = executor.submit(
+            copy_context().run,
+            agent.batch_generate_titles,
+            [texts[item.position] for item in untitled],
+            max_concurrency,
+        )
+
+        for position, response in agent.batch_generate_analysis(texts, max_concurrency):
+            item = items[position]
+            if isinstance(response, Exception) or not response:
+                item.status = AnalysisBatchItem.Status.FAILED
+                item.error = repr(response) if response else "Empty analysis."
+            else:
+                agent.save_analysis(
+                    session_id=item.session_id,
+                    text=texts[position],
+                    analysis=response,
+                )
+                item.status = AnalysisBatchItem.Status.COMPLETED
+            item.save(update_fields=["status", "error"])
+
+        for item, response in zip(untitled, titles.result(), strict=True):
+            if isinstance(response, Exception) or not response:
+                logger.warning("Failed to generate the title of %s.", item.session_id)
+                continue
+            ChatSession.objects.filter(id=item.session_id).update(
+                title=response.content
+            )
+
+    statuses = [item.status for item in items.values()]
+    return {status.value: statuses.count(status) for status in AnalysisBatchItem.Status}
+
+
+def fail_pending_batch_items(batch_id: UUID, error: str) -> None:
+    """
+    Marks the texts of a bulk analysis that are still pending as failed, so they
+    don't wait forever for a batch task that stopped.
+    """
+    AnalysisBatchItem.objects.filter(
+        batch_id=batch_id, status=AnalysisBatchItem.Status.PENDING
+    ).update(status=AnalysisBatchItem.Status.FAILED, error=error)
+
+
+@task_failure.connect
+def fail_batch_items_of_failed_task(
+    sender=None, exception=None, kwargs=None, **extra
+) -> None:
+    if sender is None or sender.name != analyze_batch.name or not kwargs:
+        return
+    fail_pending_batch_items(kwargs["batch_id"], repr(exception))
+
+
+@app.task
+def generate_session_title(session_id: UUID, text: str) -> str | None:
+    """
+    Generate a title for a session that was created without one.
+    """
+    response = get_agent().generate_title(text)
+    if not response:
+        return None
+
+    ChatSession.objects.filter(id=session_id).update(title=response.content)
+    return response.content
+
+
+def get_result_backend() -> RedisBackend:
+    return cast(RedisBackend, app.backend)
+
+
+def get_task_channel(task_id: str) -> str:
+    """
+    Channel where the result backend publishes the states of the task.
+    """
+    return get_result_backend().get_key_for_task(task_id).decode()
 
 
 def get_task_status(task_id):
@@ -49,10 +412,80 @@ def get_task_status(task_id):
     }
 
 
-@app.task
-def follow_up_question(session_id: UUID, question: str):
+def get_task_statuses(task_ids: Sequence[str]) -> list[dict]:
+    """
+    Statuses of many tasks (see `get_task_status`), read from the result backend
+    in a single round trip. Unknown tasks are pending.
+    """
+    backend = get_result_backend()
+    values = backend.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    statuses = []
+    for task_id, value in zip(task_ids, values, strict=True):
+        meta = backend.decode_result(value) if value else {"status": "PENDING"}
+        statuses.append(
+            {
+                "task_id": task_id,
+                "status": meta["status"],
+                "result": meta["result"] if meta["status"] == "SUCCESS" else None,
+                "error": str(meta["result"]) if meta["status"] == "FAILURE" else None,
+            }
+        )
+    return statuses
+
+
+@app.task(bind=True)
+def follow_up_question(
+    self: Task,
+    session_id: UUID,
+    question: str,
+    ticket: int | None = None,
+    waiting_since: float | None = None,
+):
     """
     Ask a follow-up question based on the session history.
+    Questions with a `ticket` are answered after the previous questions of the
+    session: until then, the task is retried (see SessionSequencer).
     """
+    sequencer = get_session_sequencer()
+    if sequencer is None or ticket is None:
+        return answer_follow_up_question(session_id, question)
+
+    waiting_since = waiting_since or time.time()
+    if not sequencer.is_turn(session_id, ticket, waiting_since):
+        raise self.retry(
+            kwargs={
+                "session_id": session_id,
+                "question": question,
+                "ticket": ticket,
+                "waiting_since": waiting_since,
+            },
+            countdown=sequencer.retry_seconds,
+            max_retries=None,
+        )
+    try:
+        return answer_follow_up_question(session_id, question)
+    finally:
+        sequencer.finish(session_id, ticket)
+
+
+def answer_follow_up_question(session_id: UUID, question: str) -> str | None:
     response = get_agent().follow_up_question(session_id=session_id, question=question)
-    return response.content if response else None
+    schedule_history_summary(session_id)
+    return cast(str, response.content) if response else None
+
+
+@app.task
+def summarize_session_history(session_id: UUID) -> str | None:
+    """
+    Update the rolling summary of the session history.
+    """
+    return get_agent().summarize_history(session_id=session_id)
+
+
+def schedule_history_summary(session_id: UUID) -> None:
+    """
+    Updates the rolling summary in the background after a follow-up question,
+    if the summary history strategy is enabled.
+    """
+    if HistorySettings().history_strategy == HistoryStrategy.SUMMARY:
+        summarize_session_history.delay(session_id=session_id)
@@ -1,8 +1,17 @@
+import threading
 import uuid
 
+import fakeredis
+import httpx
 import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
 
 from mentor.assistant import agent
+from mentor.assistant.agent import hold_history_connection
+from mentor.assistant.coalescing import SingleFlight
+from mentor.assistant.models import ChatSession
 
 
 class FakePrompt:
@@ -17,21 +26,44 @@ def fake_model(mocker):
     return mock_model
 
 
+@pytest.fixture(autouse=True)
+def clear_chain_registry():
+    agent.get_chain_registry().clear()
+    yield
+    agent.get_chain_registry().clear()
+
+
+@pytest.fixture(autouse=True)
+def held_connection(mocker):
+    """
+    Replaces the pooled history connection, so no database connection is opened.
+    """
+    return mocker.patch("mentor.assistant.agent.hold_history_connection")
+
+
 @pytest.fixture
 def fake_assistant(fake_model, mocker):
     class FakeAssistant(agent.Assistant):
+        platform = agent.AiPlatform.TOGETHER_AI
+
         @property
         def model(self):
             return fake_model
 
+        @property
+        def model_settings(self):
+            return agent.TogetherAiModelSettings(api_key="key")
+
     return FakeAssistant()
 
 
 def test_get_prompt_reads_file(mocker):
     mock_read = mocker.patch("mentor.assistant.agent.read_text_file")
     mock_read.return_value = "Fake prompt text"
+    agent.get_prompt.cache_clear()
 
     result = agent.get_prompt(agent.PromptName.TEXT_ANALYSIS, agent.PromptType.SYSTEM)
+    agent.get_prompt.cache_clear()
 
     mock_read.assert_called_once()
     assert result == "Fake prompt text"
@@ -81,22 +113,58 @@ def test_chain_with_history_invoke(mocker):
     assert result.content == "Chain Result"
 
 
-def test_analyze_text_calls_chain_invoke(fake_assistant, mocker):
+def test_analyze_text_generates_and_saves_analysis(fake_assistant, mocker):
+    mock_generate = mocker.patch.object(fake_assistant, "generate_analysis")
+    mock_save = mocker.patch.object(fake_assistant, "save_analysis")
+
+    session_id = uuid.uuid4()
+    text = "This is my text"
+
+    result = fake_assistant.analyze_text(session_id=session_id, text=text)
+
+    mock_generate.assert_called_once_with(text)
+    mock_save.assert_called_once_with(
+        session_id=session_id, text=text, analysis=mock_generate.return_value
+    )
+    assert result == mock_generate.return_value
+
+
+def test_generate_analysis_calls_chain_invoke(fake_assistant, mocker):
     fake_chain = mocker.Mock()
     fake_chain.invoke.return_value = mocker.Mock(content="Analysis Result")
 
-    mocker.patch(
-        "mentor.assistant.agent.get_chain_with_history", return_value=fake_chain
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_prompt.return_value.__or__ = mocker.Mock(return_value=fake_chain)
+    mocker.patch("mentor.assistant.agent.get_prompt", return_value="Human prompt ")
+
+    result = fake_assistant.generate_analysis("This is my text")
+
+    mock_prompt.assert_called_once_with(agent.PromptName.TEXT_ANALYSIS)
+    fake_chain.invoke.assert_called_once_with(
+        {"history": [], "question": "Human prompt This is my text"},
+        config=mocker.ANY,
     )
+    assert result.content == "Analysis Result"
+
+
+def test_save_analysis_starts_session_history(fake_assistant, mocker):
     mocker.patch("mentor.assistant.agent.get_prompt", return_value="Human prompt ")
+    mock_get_history = mocker.patch("mentor.assistant.agent.get_session_history")
 
     session_id = uuid.uuid4()
-    text = "This is my text"
-
-    result = fake_assistant.analyze_text(session_id=session_id, text=text)
+    fake_assistant.save_analysis(
+        session_id=session_id,
+        text="This is my text",
+        analysis=AIMessage(content="Analysis Result"),
+    )
 
-    fake_chain.invoke.assert_called_once()
-    assert result.content == "Analysis Result"
+    mock_get_history.assert_called_once_with(str(session_id))
+    mock_get_history.return_value.add_messages.assert_called_once_with(
+        [
+            HumanMessage(content="Human prompt This is my text"),
+            AIMessage(content="Analysis Result"),
+        ]
+    )
 
 
 def test_follow_up_question_calls_chain_invoke(fake_assistant, mocker):
@@ -114,3 +182,760 @@ def test_follow_up_question_calls_chain_invoke(fake_assistant, mocker):
 
     fake_chain.invoke.assert_called_once()
     assert result.content == "Follow-up result"
+
+
+def test_chain_with_history_astream(mocker):
+    fake_chain = mocker.Mock()
+    fake_chain.astream.return_value = "FAKE_STREAM"
+
+    session_id = uuid.uuid4()
+    question = "Tell me something"
+
+    result = agent.chain_with_history_astream(
+        chain=fake_chain,
+        session_id=session_id,
+        question=question,
+    )
+
+    fake_chain.astream.assert_called_once()
+    args, kwargs = fake_chain.astream.call_args
+
+    assert args[0]["question"] == question
+    assert kwargs["config"]["configurable"]["session_id"] == str(session_id)
+    assert result == "FAKE_STREAM"
+
+
+def test_astream_analyze_text_saves_the_complete_analysis(fake_assistant, mocker):
+    async def fake_stream(*args, **kwargs):
+        for content in ("An ", "analysis"):
+            yield AIMessageChunk(content=content)
+
+    fake_chain = mocker.Mock()
+    fake_chain.astream.side_effect = fake_stream
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_prompt.return_value.__or__ = mocker.Mock(return_value=fake_chain)
+    mocker.patch("mentor.assistant.agent.get_prompt", return_value="Human prompt ")
+    mock_get_history = mocker.patch("mentor.assistant.agent.get_async_session_history")
+    mock_get_history.return_value.aadd_messages = mocker.AsyncMock()
+
+    async def collect():
+        return [
+            chunk.content
+            async for chunk in fake_assistant.astream_analyze_text(
+                session_id=uuid.uuid4(), text="This is my text"
+            )
+        ]
+
+    assert async_to_sync(collect)() == ["An ", "analysis"]
+    # The history isn't read, and only the complete analysis is saved
+    assert fake_chain.astream.call_args[0][0] == {
+        "history": [],
+        "question": "Human prompt This is my text",
+    }
+    mock_get_history.return_value.aadd_messages.assert_awaited_once_with(
+        [
+            HumanMessage(content="Human prompt This is my text"),
+            AIMessage(content="An analysis"),
+        ]
+    )
+
+
+def test_astream_follow_up_question_uses_async_history(fake_assistant, mocker):
+    fake_chain = mocker.Mock()
+    fake_chain.astream.return_value = "FAKE_STREAM"
+
+    mock_get_chain = mocker.patch(
+        "mentor.assistant.agent.get_chain_with_history", return_value=fake_chain
+    )
+
+    result = fake_assistant.astream_follow_up_question(
+        session_id=uuid.uuid4(), question="My follow-up question"
+    )
+
+    assert (
+        mock_get_chain.call_args.kwargs["session_history_factory"]
+        == agent.get_async_session_history
+    )
+    assert fake_chain.astream.call_args[0][0]["question"] == "My follow-up question"
+    assert result == "FAKE_STREAM"
+
+
+def test_async_history_stores_streamed_chunks_as_messages(mocker):
+    mocker.patch("mentor.assistant.agent.get_async_connection")
+    mock_history = mocker.patch("mentor.assistant.agent.PostgresChatMessageHistory")
+    mock_history.return_value.aadd_messages = mocker.AsyncMock()
+
+    history = agent.get_async_session_history(str(uuid.uuid4()))
+    async_to_sync(history.aadd_messages)(
+        [HumanMessage(content="Question"), AIMessageChunk(content="Answer")]
+    )
+
+    stored = mock_history.return_value.aadd_messages.call_args[0][0]
+    assert stored == [HumanMessage(content="Question"), AIMessage(content="Answer")]
+    assert type(stored[1]) is AIMessage
+
+
+def test_agenerate_title_awaits_model(fake_assistant, mocker):
+    mocker.patch("mentor.assistant.agent.get_prompt", return_value="Prompt ")
+    fake_assistant.model.ainvoke = mocker.AsyncMock(
+        return_value=AIMessage(content="A Title")
+    )
+
+    result = async_to_sync(fake_assistant.agenerate_title)("some text")
+
+    fake_assistant.model.ainvoke.assert_awaited_once()
+    fake_assistant.model.invoke.assert_not_called()
+    assert result.content == "A Title"
+
+
+def test_aanalyze_text_generates_and_saves_analysis(fake_assistant, mocker):
+    fake_chain = mocker.Mock()
+    fake_chain.ainvoke = mocker.AsyncMock(return_value=AIMessage(content="Analysis"))
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_prompt.return_value.__or__ = mocker.Mock(return_value=fake_chain)
+    mocker.patch("mentor.assistant.agent.get_prompt", return_value="Human prompt ")
+    mock_get_history = mocker.patch("mentor.assistant.agent.get_async_session_history")
+    mock_get_history.return_value.aadd_messages = mocker.AsyncMock()
+
+    session_id = uuid.uuid4()
+    result = async_to_sync(fake_assistant.aanalyze_text)(
+        session_id=session_id, text="This is my text"
+    )
+
+    fake_chain.ainvoke.assert_awaited_once_with(
+        {"history": [], "question": "Human prompt This is my text"},
+        config=mocker.ANY,
+    )
+    mock_get_history.assert_called_once_with(str(session_id))
+    mock_get_history.return_value.aadd_messages.assert_awaited_once_with(
+        [
+            HumanMessage(content="Human prompt This is my text"),
+            AIMessage(content="Analysis"),
+        ]
+    )
+    assert result.content == "Analysis"
+
+
+def test_afollow_up_question_uses_async_history(fake_assistant, mocker):
+    fake_chain = mocker.Mock()
+    fake_chain.ainvoke = mocker.AsyncMock(return_value=AIMessage(content="Answer"))
+    mock_get_chain = mocker.patch(
+        "mentor.assistant.agent.get_chain_with_history", return_value=fake_chain
+    )
+
+    session_id = uuid.uuid4()
+    result = async_to_sync(fake_assistant.afollow_up_question)(
+        session_id=session_id, question="My follow-up question"
+    )
+
+    assert (
+        mock_get_chain.call_args.kwargs["session_history_factory"]
+        == agent.get_async_session_history
+    )
+    args, kwargs = fake_chain.ainvoke.call_args
+    assert args[0]["question"] == "My follow-up question"
+    assert kwargs["config"]["configurable"]["session_id"] == str(session_id)
+    assert result.content == "Answer"
+
+
+@pytest.fixture
+def cached_assistant(fake_assistant, mocker):
+    fake_assistant.platform = agent.AiPlatform.TOGETHER_AI
+    mocker.patch.object(
+        type(fake_assistant),
+        "model_settings",
+        mocker.Mock(model="some-model", temperature=0.0),
+    )
+    fake_assistant.response_cache = mocker.Mock()
+    mocker.patch("mentor.assistant.agent.get_prompt", return_value="Prompt ")
+    return fake_assistant
+
+
+def test_model_id(cached_assistant):
+    assert cached_assistant.model_id == "together.ai:some-model:0.0"
+
+
+def test_generate_title_cache_hit_skips_model(cached_assistant):
+    cached_assistant.response_cache.get.return_value = "Cached title"
+
+    result = cached_assistant.generate_title("some text")
+
+    cached_assistant.model.invoke.assert_not_called()
+    cached_assistant.response_cache.get.assert_called_once_with(
+        model_id="together.ai:some-model:0.0",
+        prompt_name="generate_title",
+        prompt="Prompt Prompt ",
+        text="some text",
+    )
+    assert result.content == "Cached title"
+
+
+def test_generate_title_cache_miss_stores_response(cached_assistant):
+    cached_assistant.response_cache.get.return_value = None
+
+    result = cached_assistant.generate_title("some text")
+
+    cached_assistant.model.invoke.assert_called_once()
+    cached_assistant.response_cache.set.assert_called_once_with(
+        model_id="together.ai:some-model:0.0",
+        prompt_name="generate_title",
+        prompt="Prompt Prompt ",
+        text="some text",
+        content="LLM result",
+    )
+    assert result.content == "LLM result"
+
+
+def test_analyze_text_cache_hit_seeds_history(cached_assistant, mocker):
+    cached_assistant.response_cache.get.return_value = "Cached analysis"
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_get_history = mocker.patch("mentor.assistant.agent.get_session_history")
+
+    session_id = uuid.uuid4()
+    result = cached_assistant.analyze_text(session_id=session_id, text="My text")
+
+    mock_prompt.assert_not_called()
+    mock_get_history.assert_called_once_with(str(session_id))
+    mock_get_history.return_value.add_messages.assert_called_once_with(
+        [HumanMessage(content="Prompt My text"), AIMessage(content="Cached analysis")]
+    )
+    assert result.content == "Cached analysis"
+
+
+def test_generate_analysis_cache_miss_stores_response(cached_assistant, mocker):
+    cached_assistant.response_cache.get.return_value = None
+    fake_chain = mocker.Mock()
+    fake_chain.invoke.return_value = AIMessage(content="Analysis Result")
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_prompt.return_value.__or__ = mocker.Mock(return_value=fake_chain)
+
+    result = cached_assistant.generate_analysis("My text")
+
+    fake_chain.invoke.assert_called_once()
+    assert cached_assistant.response_cache.set.call_args.kwargs["content"] == (
+        "Analysis Result"
+    )
+    assert result.content == "Analysis Result"
+
+
+def test_agenerate_analysis_cache_hit_skips_model(cached_assistant, mocker):
+    cached_assistant.response_cache.get.return_value = "Cached analysis"
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+
+    result = async_to_sync(cached_assistant.agenerate_analysis)("My text")
+
+    mock_prompt.assert_not_called()
+    assert result.content == "Cached analysis"
+
+
+def test_batch_generate_analysis_yields_cached_then_generated(cached_assistant, mocker):
+    cached_assistant.response_cache.get.side_effect = [None, "Cached", None]
+    fake_chain = mocker.Mock()
+    error = ValueError("Provider down")
+    fake_chain.batch_as_completed.return_value = iter(
+        [(1, error), (0, AIMessage(content="Analysis A"))]
+    )
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_prompt.return_value.__or__ = mocker.Mock(return_value=fake_chain)
+
+    results = list(
+        cached_assistant.batch_generate_analysis(["A", "B", "C"], max_concurrency=4)
+    )
+
+    assert results == [
+        (1, AIMessage(content="Cached")),
+        (2, error),
+        (0, AIMessage(content="Analysis A")),
+    ]
+    inputs = fake_chain.batch_as_completed.call_args[0][0]
+    assert [i["question"] for i in inputs] == ["Prompt A", "Prompt C"]
+    config = fake_chain.batch_as_completed.call_args.kwargs["config"]
+    assert config["max_concurrency"] == 4
+    cached_assistant.response_cache.set.assert_called_once()
+    assert cached_assistant.response_cache.set.call_args.kwargs["text"] == "A"
+
+
+def test_batch_generate_titles(cached_assistant):
+    cached_assistant.response_cache.get.side_effect = ["Cached", None, None]
+    error = ValueError("Provider down")
+    cached_assistant.model.batch.return_value = [AIMessage(content="Title B"), error]
+
+    results = cached_assistant.batch_generate_titles(["A", "B", "C"], max_concurrency=2)
+
+    assert results == [AIMessage(content="Cached"), AIMessage(content="Title B"), error]
+    messages = cached_assistant.model.batch.call_args[0][0]
+    assert [m[1][1] for m in messages] == ["Prompt B", "Prompt C"]
+    assert (
+        cached_assistant.model.batch.call_args.kwargs["config"]["max_concurrency"] == 2
+    )
+
+
+@pytest.fixture
+def chunked_assistant(cached_assistant, mocker):
+    cached_assistant.response_cache.get.return_value = None
+    cached_assistant.chunked_analysis_settings = agent.ChunkedAnalysisSettings(
+        chunked_analysis_threshold_tokens=5,
+        chunked_analysis_chunk_tokens=5,
+        chunked_analysis_max_concurrency=3,
+    )
+    fake_chain = mocker.Mock()
+    fake_chain.batch.return_value = [AIMessage(content="A1"), AIMessage(content="A2")]
+    fake_chain.abatch = mocker.AsyncMock(return_value=fake_chain.batch.return_value)
+    fake_chain.invoke.return_value = AIMessage(content="Merged")
+    fake_chain.ainvoke = mocker.AsyncMock(return_value=fake_chain.invoke.return_value)
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_prompt.return_value.__or__ = mocker.Mock(return_value=fake_chain)
+    return cached_assistant, fake_chain
+
+
+LONG_TEXT = "First paragraph.\n\nSecond paragraph."
+
+
+def test_generate_analysis_maps_and_reduces_long_text(chunked_assistant):
+    assistant, fake_chain = chunked_assistant
+
+    result = assistant.generate_analysis(LONG_TEXT)
+
+    assert result.content == "Merged"
+    inputs = fake_chain.batch.call_args[0][0]
+    assert [i["question"] for i in inputs] == [
+        "Prompt First paragraph.",
+        "Prompt Second paragraph.",
+    ]
+    assert fake_chain.batch.call_args.kwargs["config"]["max_concurrency"] == 3
+    merge_input = fake_chain.invoke.call_args[0][0]
+    assert merge_input["question"] == "Prompt TRECHO 1:\nA1\n\nTRECHO 2:\nA2"
+    cache_set = assistant.response_cache.set.call_args.kwargs
+    assert cache_set["prompt_name"] == "merge_analyses"
+    assert cache_set["text"] == LONG_TEXT
+
+
+def test_chunked_analysis_key_depends_on_the_chunk_prompt_and_size(
+    chunked_assistant, mocker
+):
+    assistant, _ = chunked_assistant
+    prompts = {"merge_analyses": "Merge prompt", "analyze_chunk": "Chunk prompt"}
+    mocker.patch(
+        "mentor.assistant.agent.get_prompt_contents",
+        side_effect=lambda prompt_name: prompts[prompt_name.value],
+    )
+    prompt = assistant.get_response_prompt(agent.PromptName.MERGE_ANALYSES)
+
+    prompts["analyze_chunk"] = "Other chunk prompt"
+    assert assistant.get_response_prompt(agent.PromptName.MERGE_ANALYSES) != prompt
+    prompts["analyze_chunk"] = "Chunk prompt"
+    assistant.chunked_analysis_settings = agent.ChunkedAnalysisSettings(
+        chunked_analysis_threshold_tokens=5, chunked_analysis_chunk_tokens=10
+    )
+    assert assistant.get_response_prompt(agent.PromptName.MERGE_ANALYSES) != prompt
+
+    assistant.generate_analysis(LONG_TEXT)
+    assert assistant.response_cache.get.call_args.kwargs["prompt"] == (
+        assistant.get_response_prompt(agent.PromptName.MERGE_ANALYSES)
+    )
+
+
+def test_agenerate_analysis_maps_and_reduces_long_text(chunked_assistant):
+    assistant, fake_chain = chunked_assistant
+
+    result = async_to_sync(assistant.agenerate_analysis)(LONG_TEXT)
+
+    assert result.content == "Merged"
+    assert len(fake_chain.abatch.call_args[0][0]) == 2
+    fake_chain.ainvoke.assert_awaited_once()
+    fake_chain.batch.assert_not_called()
+
+
+def test_generate_analysis_short_text_is_not_chunked(chunked_assistant):
+    assistant, fake_chain = chunked_assistant
+    fake_chain.invoke.return_value = AIMessage(content="Analysis")
+
+    result = assistant.generate_analysis("Short")
+
+    assert result.content == "Analysis"
+    fake_chain.batch.assert_not_called()
+
+
+def test_batch_generate_analysis_chunks_long_texts_last(chunked_assistant):
+    assistant, fake_chain = chunked_assistant
+    fake_chain.batch_as_completed.return_value = iter(
+        [(0, AIMessage(content="Analysis"))]
+    )
+    error = ValueError("Provider down")
+    fake_chain.invoke.side_effect = error
+
+    results = list(
+        assistant.batch_generate_analysis([LONG_TEXT, "Short"], max_concurrency=2)
+    )
+
+    assert results == [(1, AIMessage(content="Analysis")), (0, error)]
+
+
+@pytest.fixture
+def coalescing_assistant(cached_assistant):
+    cached_assistant.response_cache = None
+    cached_assistant.single_flight = SingleFlight(
+        client=fakeredis.FakeRedis(decode_responses=True),
+        lock_ttl_seconds=60,
+        result_ttl_seconds=60,
+        poll_interval_seconds=0.01,
+    )
+    return cached_assistant
+
+
+def test_identical_concurrent_titles_call_model_once(coalescing_assistant):
+    started = threading.Event()
+    release = threading.Event()
+
+    def invoke(*args, **kwargs):
+        started.set()
+        release.wait(timeout=5)
+        return AIMessage(content="A title")
+
+    coalescing_assistant.model.invoke.side_effect = invoke
+    results = []
+
+    def generate_title():
+        results.append(coalescing_assistant.generate_title("Same text"))
+
+    leader = threading.Thread(target=generate_title)
+    leader.start()
+    started.wait(timeout=5)
+    followers = [threading.Thread(target=generate_title) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(timeout=5)
+
+    coalescing_assistant.model.invoke.assert_called_once()
+    assert [result.content for result in results] == ["A title"] * 4
+
+
+def test_failed_coalesced_call_is_retried_by_next_caller(coalescing_assistant):
+    coalescing_assistant.model.invoke.side_effect = [
+        ValueError("Provider down"),
+        AIMessage(content="A title"),
+    ]
+
+    with pytest.raises(ValueError):
+        coalescing_assistant.generate_title("Same text")
+
+    assert coalescing_assistant.generate_title("Same text").content == "A title"
+
+
+def test_agenerate_analysis_coalesces(coalescing_assistant, mocker):
+    fake_chain = mocker.Mock()
+    fake_chain.ainvoke = mocker.AsyncMock(return_value=AIMessage(content="Analysis"))
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_prompt.return_value.__or__ = mocker.Mock(return_value=fake_chain)
+
+    first = async_to_sync(coalescing_assistant.agenerate_analysis)("Text")
+    second = async_to_sync(coalescing_assistant.agenerate_analysis)("Text")
+
+    fake_chain.ainvoke.assert_awaited_once()
+    assert first.content == second.content == "Analysis"
+
+
+@pytest.fixture
+def summarized_session(db):
+    user = User.objects.create_user(username="testuser", password="password")
+    return ChatSession.objects.create(user=user, title="Session")
+
+
+def get_session_messages(turns):
+    messages = [HumanMessage(content="Analyze"), AIMessage(content="Analysis")]
+    for i in range(turns):
+        messages += [HumanMessage(content=f"Q{i}"), AIMessage(content=f"A{i}")]
+    return messages
+
+
+def test_summarize_history_folds_turns_outside_window(
+    fake_assistant, summarized_session, mocker, monkeypatch
+):
+    monkeypatch.setenv("HISTORY_MAX_TURNS", "1")
+    mocker.patch("mentor.assistant.agent.get_prompt", return_value="Prompt ")
+    mock_get_history = mocker.patch("mentor.assistant.agent.get_session_history")
+    mock_get_history.return_value.messages = get_session_messages(3)
+    fake_assistant.model.invoke.return_value = AIMessage(content="New summary")
+
+    result = fake_assistant.summarize_history(summarized_session.id)
+
+    human_prompt = fake_assistant.model.invoke.call_args[0][0][1][1]
+    assert "Q0" in human_prompt and "A1" in human_prompt
+    assert "Q2" not in human_prompt
+    summarized_session.refresh_from_db()
+    assert summarized_session.history_summary == "New summary"
+    assert summarized_session.summarized_message_count == 4
+    assert result == "New summary"
+
+
+def test_summarize_history_skips_when_nothing_to_fold(
+    fake_assistant, summarized_session, mocker, monkeypatch
+):
+    monkeypatch.setenv("HISTORY_MAX_TURNS", "5")
+    mock_get_history = mocker.patch("mentor.assistant.agent.get_session_history")
+    mock_get_history.return_value.messages = get_session_messages(3)
+
+    result = fake_assistant.summarize_history(summarized_session.id)
+
+    fake_assistant.model.invoke.assert_not_called()
+    assert result is None
+
+
+def test_chain_with_history_bounds_session_history(mocker, monkeypatch):
+    monkeypatch.setenv("HISTORY_STRATEGY", "last_turns")
+    monkeypatch.setenv("HISTORY_MAX_TURNS", "1")
+    mocker.patch("mentor.assistant.agent.get_prompt", return_value="System")
+    model = mocker.Mock()
+    wrapped = mocker.Mock(messages=get_session_messages(3))
+
+    chain = agent.get_chain_with_history(
+        prompt_name=agent.PromptName.FOLLOW_UP_QUESTIONS,
+        model=model,
+        session_history_factory=lambda session_id: wrapped,
+    )
+    session_history = chain.get_session_history("session")
+
+    assert session_history.messages == get_session_messages(3)[:2] + [
+        HumanMessage(content="Q2"),
+        AIMessage(content="A2"),
+    ]
+
+
+def test_chain_registry_builds_each_chain_once(mocker):
+    registry = agent.ChainRegistry()
+    build = mocker.Mock(return_value="FAKE_CHAIN")
+
+    first = registry.get(("key",), build)
+    second = registry.get(("key",), build)
+
+    build.assert_called_once()
+    assert first == second == "FAKE_CHAIN"
+
+
+def test_chain_registry_keeps_the_last_chains(mocker):
+    registry = agent.ChainRegistry(max_chains=2)
+
+    for key in ("first", "second", "third"):
+        registry.get(key, mocker.Mock(return_value=key))
+
+    assert list(registry.chains) == ["second", "third"]
+
+
+def test_assistant_reuses_chains_between_calls(fake_assistant, mocker):
+    mock_get_chain = mocker.patch("mentor.assistant.agent.get_chain_with_history")
+
+    first = fake_assistant.get_chain_with_history(agent.PromptName.FOLLOW_UP_QUESTIONS)
+    second = fake_assistant.get_chain_with_history(agent.PromptName.FOLLOW_UP_QUESTIONS)
+
+    mock_get_chain.assert_called_once()
+    assert first is second
+
+
+def test_assistant_chains_depend_on_model_settings(fake_assistant, mocker):
+    mock_prompt = mocker.patch("mentor.assistant.agent.get_prompt_template")
+    mock_prompt.return_value.__or__ = mocker.Mock(side_effect=["CHAIN_A", "CHAIN_B"])
+
+    first = fake_assistant.get_chain(agent.PromptName.TEXT_ANALYSIS)
+    mocker.patch.object(
+        type(fake_assistant),
+        "model_settings",
+        agent.TogetherAiModelSettings(api_key="key", temperature=0.5),
+    )
+    second = type(fake_assistant)().get_chain(agent.PromptName.TEXT_ANALYSIS)
+
+    assert (first, second) == ("CHAIN_A", "CHAIN_B")
+
+
+def test_assistant_chains_depend_on_history_settings(
+    fake_assistant, mocker, monkeypatch
+):
+    mock_get_chain = mocker.patch("mentor.assistant.agent.get_chain_with_history")
+
+    fake_assistant.get_chain_with_history(agent.PromptName.FOLLOW_UP_QUESTIONS)
+    monkeypatch.setenv("HISTORY_MAX_TURNS", "2")
+    assistant = type(fake_assistant)()
+    assistant.get_chain_with_history(agent.PromptName.FOLLOW_UP_QUESTIONS)
+
+    assert mock_get_chain.call_count == 2
+    assert mock_get_chain.call_args.kwargs["history_settings"].history_max_turns == 2
+
+
+def test_build_chains_prebuilds_all_chains(fake_assistant, mocker):
+    mocker.patch("mentor.assistant.agent.get_prompt", return_value="System")
+
+    fake_assistant.build_chains()
+
+    assert len(agent.get_chain_registry().chains) == 6
+
+
+def test_get_session_history_requires_held_connection():
+    with pytest.raises(RuntimeError):
+        agent.get_session_history("session")
+
+
+def test_hold_history_connection_holds_one_connection(mocker):
+    mock_pool = mocker.patch("mentor.assistant.agent.get_connection_pool")
+    mock_history = mocker.patch("mentor.assistant.agent.PostgresChatMessageHistory")
+
+    # The module attribute is replaced by the held_connection fixture
+    with hold_history_connection() as conn, hold_history_connection() as nested:
+        agent.get_session_history("session")
+
+    mock_pool.return_value.connection.assert_called_once()
+    assert conn is nested
+    assert mock_history.call_args.kwargs["sync_connection"] is conn
+    assert agent.history_connection.get() is None
+
+
+def test_follow_up_question_holds_connection_during_invoke(
+    fake_assistant, held_connection, mocker
+):
+    fake_chain = mocker.Mock()
+    mocker.patch(
+        "mentor.assistant.agent.get_chain_with_history", return_value=fake_chain
+    )
+    fake_chain.invoke.side_effect = lambda *args, **kwargs: (
+        held_connection.return_value.__exit__.assert_not_called()
+    )
+
+    fake_assistant.follow_up_question(session_id=uuid.uuid4(), question="Question")
+
+    held_connection.return_value.__enter__.assert_called_once()
+    held_connection.return_value.__exit__.assert_called_once()
+
+
+def test_get_connection_pool_stats_only_reports_created_pools(mocker):
+    mocker.patch.object(agent, "get_connection_pool")
+    agent.get_connection_pool.cache_info.return_value.currsize = 1
+    agent.get_connection_pool.return_value.get_stats.return_value = {"pool_size": 2}
+    mocker.patch.object(
+        agent, "get_async_connection_pools", return_value=agent.PerLoop(mocker.Mock)
+    )
+
+    assert agent.get_connection_pool_stats() == {"sync": {"pool_size": 2}}
+
+
+def test_get_connection_pool_stats_adds_up_async_pools(mocker):
+    mocker.patch.object(agent.get_connection_pool, "cache_info")
+    agent.get_connection_pool.cache_info.return_value.currsize = 0
+    pools = agent.PerLoop(mocker.Mock)
+    mocker.patch.object(agent, "get_async_connection_pools", return_value=pools)
+
+    async def get_pool():
+        pool = agent.get_async_connection_pool()
+        pool.get_stats.return_value = {"pool_size": 2}
+        return pool
+
+    first = async_to_sync(get_pool)()
+    second = async_to_sync(get_pool)()
+
+    assert first is not second
+    assert agent.get_connection_pool_stats() == {"async": {"pool_size": 2}}
+
+
+def test_per_loop_drops_values_of_closed_loops(mocker):
+    values = agent.PerLoop(mocker.Mock)
+
+    async def get_value():
+        return values.get()
+
+    async_to_sync(get_value)()
+    async_to_sync(get_value)()
+
+    # Each loop of async_to_sync is closed after its call
+    assert len(values.values) == 1
+
+
+def test_settings_fingerprint_includes_secrets(fake_assistant, mocker):
+    fingerprint = fake_assistant.settings_fingerprint
+    mocker.patch.object(
+        type(fake_assistant),
+        "model_settings",
+        agent.TogetherAiModelSettings(api_key="other"),
+    )
+
+    assert type(fake_assistant)().settings_fingerprint != fingerprint
+
+
+def test_get_agent_reuses_assistant(mocker, monkeypatch):
+    monkeypatch.setenv("AI_PLATFORM", "together.ai")
+    monkeypatch.setenv("API_KEY", "key")
+    mocker.patch.object(agent, "get_agent_cache", return_value=agent.AgentCache())
+
+    first = agent.get_agent()
+    second = agent.get_agent()
+
+    assert first is second
+    assert first.model is second.model
+    assert first.model.http_client is first.http_client
+
+
+def test_get_agent_checks_settings_once_per_interval(mocker, monkeypatch):
+    monkeypatch.setenv("AI_PLATFORM", "together.ai")
+    monkeypatch.setenv("API_KEY", "key")
+    mocker.patch.object(agent, "get_agent_cache", return_value=agent.AgentCache())
+    build_agent = mocker.spy(agent, "build_agent")
+
+    first = agent.get_agent()
+    monkeypatch.setenv("AI_PLATFORM", "openai")
+
+    assert agent.get_agent() is first
+    build_agent.assert_called_once()
+
+
+def test_get_agent_rebuilds_assistant_when_settings_change(mocker, monkeypatch):
+    monkeypatch.setenv("AI_PLATFORM", "together.ai")
+    monkeypatch.setenv("API_KEY", "key")
+    mocker.patch.object(
+        agent,
+        "get_agent_cache",
+        return_value=agent.AgentCache(check_interval_seconds=0),
+    )
+
+    first = agent.get_agent()
+    http_client = first.model.http_client
+    monkeypatch.setenv("MODEL_HTTP_MAX_CONNECTIONS", "5")
+    second = agent.get_agent()
+    monkeypatch.setenv("AI_PLATFORM", "openai")
+    third = agent.get_agent()
+
+    assert first is not second
+    assert isinstance(third, agent.OpenAiAssistant)
+    # The clients of the replaced assistants are closed
+    assert http_client.is_closed
+
+
+def test_async_client_is_per_event_loop(monkeypatch):
+    monkeypatch.setenv("API_KEY", "key")
+    client = agent.TogetherAiAssistant().http_async_client
+
+    async def get_loop_client():
+        return client.get_client()
+
+    first = async_to_sync(get_loop_client)()
+    second = async_to_sync(get_loop_client)()
+
+    assert isinstance(first, httpx.AsyncClient)
+    assert first is not second
+
+
+def test_get_agent_unsupported_platform_is_cached(mocker, monkeypatch):
+    monkeypatch.setenv("AI_PLATFORM", "aws_bedrock")
+    mocker.patch.object(agent, "get_agent_cache", return_value=agent.AgentCache())
+
+    assert agent.get_agent() is agent.get_agent()
+
+
+def test_model_waits_on_rate_limiter(mocker, monkeypatch):
+    monkeypatch.setenv("API_KEY", "key")
+    monkeypatch.setenv("REQUESTS_PER_MINUTE", "60")
+    mocker.patch("mentor.assistant.rate_limit.get_redis_client")
+
+    assistant = agent.TogetherAiAssistant()
+
+    assert assistant.rate_limiter is not None
+    assert assistant.model.rate_limiter is assistant.rate_limiter
+    [handler] = assistant.model.callbacks
+    assert handler.rate_limiter is assistant.rate_limiter
@@ -0,0 +1,140 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth.models import User
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict
+from langchain_core.messages.utils import count_tokens_approximately
+
+from mentor.assistant import budget
+from mentor.assistant.agent import PromptName
+from mentor.assistant.models import ChatMessage, ChatSession
+from mentor.assistant.settings import ContextBudgetSettings, TokenCounter
+
+
+@pytest.fixture
+def settings():
+    return ContextBudgetSettings(
+        context_window_tokens=1000, context_reserved_output_tokens=200
+    )
+
+
+class FakeEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+def test_count_tokens_approximately(settings):
+    messages = [HumanMessage(content="a" * 40)]
+
+    assert budget.count_tokens(messages, settings) == count_tokens_approximately(
+        messages
+    )
+
+
+def test_count_tokens_with_tiktoken(settings):
+    settings.token_counter = TokenCounter.TIKTOKEN
+    messages = [HumanMessage(content="one two"), AIMessage(content="three")]
+
+    with mock.patch.object(budget, "get_encoding", return_value=FakeEncoding()):
+        tokens = budget.count_tokens(messages, settings)
+
+    assert tokens == budget.TOKENS_PER_PROMPT + 2 * budget.TOKENS_PER_MESSAGE + 3
+
+
+def test_count_tokens_falls_back_without_encoding(settings):
+    settings.token_counter = TokenCounter.TIKTOKEN
+    messages = [HumanMessage(content="a" * 40)]
+
+    with mock.patch.object(budget, "get_encoding", return_value=None):
+        tokens = budget.count_tokens(messages, settings)
+
+    assert tokens == count_tokens_approximately(messages)
+
+
+def test_get_encoding_unavailable(caplog):
+    budget.get_encoding.cache_clear()
+    with mock.patch.object(
+        budget.tiktoken, "get_encoding", side_effect=OSError("offline")
+    ):
+        assert budget.get_encoding("o200k_base") is None
+    budget.get_encoding.cache_clear()
+
+    assert "approximate token count" in caplog.text
+
+
+def test_estimate_prompt_tokens_grows_with_history(settings):
+    without_history = budget.estimate_prompt_tokens(
+        PromptName.FOLLOW_UP_QUESTIONS, "Why?", settings
+    )
+    with_history = budget.estimate_prompt_tokens(
+        PromptName.FOLLOW_UP_QUESTIONS,
+        "Why?",
+        settings,
+        history=[HumanMessage(content="a" * 400)],
+    )
+
+    assert with_history >= without_history + 100
+
+
+def test_estimate_analysis_with_title(settings):
+    without_title = budget.estimate_analysis("Some text.", settings)
+    with_title = budget.estimate_analysis("Some text.", settings, generate_title=True)
+
+    assert without_title.tokens == without_title.max_call_tokens
+    assert with_title.tokens > without_title.tokens
+    assert with_title.max_call_tokens < with_title.tokens
+
+
+def test_estimate_analysis_in_chunks(settings, monkeypatch):
+    monkeypatch.setenv("CHUNKED_ANALYSIS_THRESHOLD_TOKENS", "100")
+    monkeypatch.setenv("CHUNKED_ANALYSIS_CHUNK_TOKENS", "100")
+    text = "\n\n".join(["word " * 60] * 10)
+
+    estimate = budget.estimate_analysis(text, settings)
+
+    # Only a chunk must fit the context window
+    assert estimate.max_call_tokens < 1000 - 200
+    assert estimate.tokens > budget.count_tokens([HumanMessage(content=text)], settings)
+
+
+def test_check_context_budget(settings):
+    budget.check_context_budget(budget.PromptEstimate(900, 800), settings)
+
+    with pytest.raises(budget.ContextBudgetExceeded) as e:
+        budget.check_context_budget(budget.PromptEstimate(900, 801), settings)
+
+    assert e.value.budget == 800
+
+
+def test_check_context_budget_disabled(settings):
+    settings.context_window_tokens = 0
+
+    budget.check_context_budget(budget.PromptEstimate(10**6, 10**6), settings)
+
+
+@pytest.mark.django_db
+def test_estimate_follow_up_question_uses_bounded_history(settings, monkeypatch):
+    monkeypatch.setenv("HISTORY_STRATEGY", "last_turns")
+    monkeypatch.setenv("HISTORY_MAX_TURNS", "1")
+    user = User.objects.create_user(username="testuser", password="password")
+    session = ChatSession.objects.create(user=user, title="Session")
+    messages = [
+        HumanMessage(content="Analyze this."),
+        AIMessage(content="Analysis."),
+        HumanMessage(content="a" * 4000),
+        AIMessage(content="Answer."),
+        HumanMessage(content="Short question?"),
+        AIMessage(content="Answer."),
+    ]
+    ChatMessage.objects.bulk_create(
+        [
+            ChatMessage(session=session, message=message_to_dict(message))
+            for message in messages
+        ]
+    )
+
+    estimate = budget.estimate_follow_up_question(session, "Why?", settings)
+
+    # The long question was dropped from the history sent to the model
+    assert estimate.tokens < 1000
+    assert estimate.tokens == estimate.max_call_tokens
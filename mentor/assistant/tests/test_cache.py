@@ -0,0 +1,113 @@
+import fakeredis
+import pytest
+from redis import RedisError
+
+from mentor.assistant import cache
+
+MODEL_ID = "together.ai:some-model:0.0"
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def response_cache(redis_client):
+    return cache.ResponseCache(client=redis_client, ttl_seconds=60, max_entries=2)
+
+
+def test_normalize_text():
+    assert cache.normalize_text("  Some\n\ttext   here ") == "Some text here"
+    assert cache.normalize_text("cafe\u0301") == cache.normalize_text("caf\u00e9")
+
+
+def test_get_key_depends_on_model_prompt_and_normalized_text(response_cache):
+    key = response_cache.get_key(MODEL_ID, "text_analysis", "Prompt", "Some  text")
+
+    assert key.startswith("mentor:response_cache:text_analysis:")
+    assert key == response_cache.get_key(
+        MODEL_ID, "text_analysis", "Prompt", " Some text\n"
+    )
+    assert key != response_cache.get_key(
+        "openai:gpt-4o-mini:0.0", "text_analysis", "Prompt", "Some text"
+    )
+    assert key != response_cache.get_key(
+        MODEL_ID, "text_analysis", "Other prompt", "Some text"
+    )
+    assert key != response_cache.get_key(
+        MODEL_ID, "text_analysis", "Prompt", "Other text"
+    )
+
+
+def test_get_and_set(response_cache, redis_client):
+    assert response_cache.get(MODEL_ID, "generate_title", "Prompt", "Text") is None
+
+    response_cache.set(MODEL_ID, "generate_title", "Prompt", "Text", "A title")
+
+    assert response_cache.get(MODEL_ID, "generate_title", "Prompt", "Text") == "A title"
+    key = response_cache.get_key(MODEL_ID, "generate_title", "Prompt", "Text")
+    assert 0 < redis_client.ttl(key) <= 60
+    assert response_cache.get_stats() == {
+        "generate_title:hits": 1,
+        "generate_title:misses": 1,
+        "entries": 1,
+    }
+
+
+def test_get_hit_refreshes_the_ttl(response_cache, redis_client):
+    response_cache.set(MODEL_ID, "generate_title", "Prompt", "Text", "A title")
+    key = response_cache.get_key(MODEL_ID, "generate_title", "Prompt", "Text")
+    redis_client.expire(key, 5)
+
+    assert response_cache.get(MODEL_ID, "generate_title", "Prompt", "Text") == "A title"
+
+    assert redis_client.ttl(key) > 5
+
+
+def test_set_evicts_least_recently_used_entries(response_cache, mocker):
+    mock_time = mocker.patch("mentor.assistant.cache.time.time")
+
+    mock_time.return_value = 1000
+    response_cache.set(MODEL_ID, "generate_title", "Prompt", "First", "First title")
+    mock_time.return_value = 1001
+    response_cache.set(MODEL_ID, "generate_title", "Prompt", "Second", "Second title")
+    mock_time.return_value = 1002
+    # Using the first entry makes the second one the least recently used
+    response_cache.get(MODEL_ID, "generate_title", "Prompt", "First")
+    mock_time.return_value = 1003
+    response_cache.set(MODEL_ID, "generate_title", "Prompt", "Third", "Third title")
+
+    assert response_cache.get(MODEL_ID, "generate_title", "Prompt", "First")
+    assert response_cache.get(MODEL_ID, "generate_title", "Prompt", "Second") is None
+    assert response_cache.get(MODEL_ID, "generate_title", "Prompt", "Third")
+    assert response_cache.get_stats()["entries"] == 2
+
+
+def test_redis_errors_are_treated_as_misses(mocker):
+    client = mocker.Mock()
+    client.get.side_effect = RedisError
+    client.pipeline.side_effect = RedisError
+    response_cache = cache.ResponseCache(client=client, ttl_seconds=60, max_entries=2)
+
+    assert response_cache.get(MODEL_ID, "generate_title", "Prompt", "Text") is None
+    response_cache.set(MODEL_ID, "generate_title", "Prompt", "Text", "A title")
+
+
+def test_get_response_cache_disabled_by_default(mocker):
+    mocker.patch.dict("os.environ", {"RESPONSE_CACHE_ENABLED": "false"})
+
+    assert cache.get_response_cache() is None
+
+
+def test_get_response_cache_enabled(mocker):
+    mocker.patch.dict(
+        "os.environ",
+        {"RESPONSE_CACHE_ENABLED": "true", "RESPONSE_CACHE_MAX_ENTRIES": "5"},
+    )
+    mocker.patch("mentor.assistant.cache.get_redis_client")
+
+    response_cache = cache.get_response_cache()
+
+    assert response_cache is not None
+    assert response_cache.max_entries == 5
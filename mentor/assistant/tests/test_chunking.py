@@ -0,0 +1,54 @@
+from mentor.assistant import chunking
+from mentor.assistant.settings import ChunkedAnalysisSettings
+
+
+def test_count_text_tokens():
+    assert chunking.count_text_tokens("") == 0
+    assert chunking.count_text_tokens("a" * 9) == 3
+
+
+def test_needs_chunking():
+    settings = ChunkedAnalysisSettings(chunked_analysis_threshold_tokens=2)
+
+    assert chunking.needs_chunking("a" * 8, settings) is False
+    assert chunking.needs_chunking("a" * 9, settings) is True
+
+
+def test_needs_chunking_disabled():
+    settings = ChunkedAnalysisSettings(chunked_analysis_threshold_tokens=0)
+
+    assert chunking.needs_chunking("a" * 100_000, settings) is False
+
+
+def test_split_text_on_paragraphs():
+    paragraphs = ["word " * 30, "other " * 30, "last " * 30]
+
+    chunks = chunking.split_text("\n\n".join(paragraphs), chunk_tokens=50)
+
+    assert [chunk.strip() for chunk in chunks] == [p.strip() for p in paragraphs]
+
+
+def test_split_text_long_paragraph_on_words():
+    chunks = chunking.split_text("word " * 100, chunk_tokens=25)
+
+    assert len(chunks) == 5
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks) == ("word " * 100).strip()
+
+
+def test_get_merge_input():
+    assert chunking.get_merge_input(["A", "B"]) == "TRECHO 1:\nA\n\nTRECHO 2:\nB"
+
+
+def test_get_pinned_text_keeps_the_first_chunk_of_long_texts():
+    settings = ChunkedAnalysisSettings(
+        chunked_analysis_threshold_tokens=50, chunked_analysis_chunk_tokens=25
+    )
+    text = "word " * 100
+
+    assert chunking.get_pinned_text("Short text", settings) == "Short text"
+    pinned = chunking.get_pinned_text(text, settings)
+    assert pinned.startswith("word ")
+    note = chunking.TRUNCATED_TEXT_NOTE.format(count=5)
+    assert chunking.count_text_tokens(pinned) <= 25 + chunking.count_text_tokens(note)
+    assert pinned.endswith(note)
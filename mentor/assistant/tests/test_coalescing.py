@@ -0,0 +1,93 @@
+import threading
+
+import fakeredis
+import pytest
+from asgiref.sync import async_to_sync
+from redis import RedisError
+
+from mentor.assistant import coalescing
+
+KEY = "mentor:single_flight:generate_title:hash"
+
+
+@pytest.fixture
+def single_flight():
+    return coalescing.SingleFlight(
+        client=fakeredis.FakeRedis(decode_responses=True),
+        lock_ttl_seconds=60,
+        result_ttl_seconds=60,
+        poll_interval_seconds=0.01,
+    )
+
+
+def test_get_key_depends_on_model_prompt_and_normalized_text(single_flight):
+    key = single_flight.get_key("model", "generate_title", "Prompt", "Some  text")
+
+    assert key.startswith("mentor:single_flight:generate_title:")
+    assert key == single_flight.get_key(
+        "model", "generate_title", "Prompt", " Some text"
+    )
+    assert key != single_flight.get_key("other", "generate_title", "Prompt", "Text")
+
+
+def test_first_flight_leads_and_others_get_its_result(single_flight):
+    leader = single_flight.join(KEY)
+    followers = []
+    thread = threading.Thread(target=lambda: followers.append(single_flight.join(KEY)))
+    thread.start()
+
+    single_flight.finish(leader, "A title")
+    thread.join(timeout=5)
+
+    assert leader.leader is True
+    [follower] = followers
+    assert (follower.leader, follower.content) == (False, "A title")
+    # Late joiners get the result until it expires
+    assert single_flight.join(KEY).content == "A title"
+    assert 0 < single_flight.client.ttl(f"{KEY}:result") <= 60
+
+
+def test_failed_leader_hands_over_the_call(single_flight):
+    leader = single_flight.join(KEY)
+
+    single_flight.finish(leader, None)
+
+    assert single_flight.join(KEY).leader is True
+
+
+def test_expired_lock_hands_over_the_call(single_flight):
+    single_flight.lock_ttl_seconds = 0.05
+    leader = single_flight.join(KEY)
+
+    next_leader = single_flight.join(KEY)
+    single_flight.finish(leader, "Late title")
+
+    assert next_leader.leader is True
+    # The late leader doesn't release the lock of the new one
+    assert single_flight.client.get(f"{KEY}:lock") == next_leader.token
+
+
+def test_async_join(single_flight):
+    leader = async_to_sync(single_flight.ajoin)(KEY)
+    async_to_sync(single_flight.afinish)(leader, "A title")
+
+    assert leader.leader is True
+    assert async_to_sync(single_flight.ajoin)(KEY).content == "A title"
+
+
+def test_join_makes_the_call_on_redis_error(mocker):
+    client = mocker.Mock()
+    client.register_script.return_value.side_effect = RedisError
+    single_flight = coalescing.SingleFlight(
+        client=client, lock_ttl_seconds=60, result_ttl_seconds=60
+    )
+
+    flight = single_flight.join(KEY)
+    single_flight.finish(flight, "A title")
+
+    assert (flight.leader, flight.content) == (False, None)
+    assert client.register_script.return_value.call_count == 1
+
+
+def test_get_single_flight_disabled_by_default():
+    assert coalescing.get_single_flight() is None
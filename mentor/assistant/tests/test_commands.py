@@ -0,0 +1,239 @@
+import json
+import os
+import subprocess
+from io import StringIO
+
+import httpx
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from mentor.assistant import agent
+from mentor.assistant.management.commands import benchmark_load, benchmark_worker
+
+
+@pytest.fixture(autouse=True)
+def clear_chain_registry():
+    agent.get_chain_registry().clear()
+    yield
+    agent.get_chain_registry().clear()
+
+
+def test_benchmark_chains_reports_overhead():
+    out = StringIO()
+
+    call_command("benchmark_chains", iterations=5, stdout=out)
+
+    output = out.getvalue()
+    assert "Iterations: 5" in output
+    assert "Built per call:" in output
+    assert "Reused per call:" in output
+
+
+def get_api_transport(task_statuses, stream_events=None):
+    """
+    Fake API answering the requests of the load benchmark.
+    """
+    statuses = iter(task_statuses)
+
+    def handle(request):
+        path = request.url.path
+        if path == "/api/register/":
+            return httpx.Response(201, json={})
+        if path == "/api/token/":
+            return httpx.Response(200, json={"access": "token", "refresh": "token"})
+        if path.endswith("/stream/"):
+            return httpx.Response(
+                200,
+                headers={"Content-Type": "text/event-stream"},
+                content=stream_events,
+            )
+        if path in ("/api/analysis/", "/api/question/"):
+            return httpx.Response(201, json={"session_id": "s1", "task_id": "t1"})
+        status = next(statuses)
+        return httpx.Response(
+            200 if status == "SUCCESS" else 202,
+            json={"task_id": "t1", "status": status, "result": "Answer"},
+        )
+
+    return httpx.MockTransport(handle)
+
+
+def run_load_benchmark(transport, mode, conversations):
+    async def run():
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            benchmark = benchmark_load.LoadBenchmark(
+                client=client,
+                conversations=conversations,
+                concurrency=2,
+                mode=mode,
+                poll_interval=0,
+                timeout=5,
+            )
+            return await benchmark.run()
+
+    return async_to_sync(run)()
+
+
+def test_get_percentile():
+    values = [float(value) for value in range(1, 101)]
+
+    assert benchmark_load.get_percentile(values, 50) == pytest.approx(50.5)
+    assert benchmark_load.get_percentile(values, 99) == pytest.approx(99.01)
+    assert benchmark_load.get_percentile([], 50) is None
+
+
+def test_load_benchmark_polls_tasks():
+    transport = get_api_transport(
+        ["PENDING", "STARTED", "SUCCESS", "SUCCESS", "PENDING", "SUCCESS"]
+    )
+    conversation = {"titulo": "Title", "text": "Text", "questions": ["Q1", "Q2"]}
+
+    report = run_load_benchmark(
+        transport, benchmark_load.BenchmarkMode.POLL, [conversation]
+    )
+
+    analysis, question = report["requests"]["analysis"], report["requests"]["question"]
+    assert (analysis["count"], analysis["errors"]) == (1, 0)
+    assert (question["count"], question["errors"]) == (2, 0)
+    assert analysis["queue_wait_ms"]["p50"] <= analysis["completion_ms"]["p50"]
+    assert question["queue_wait_ms"]["p50"] is None
+    assert report["failed_conversations"] == 0
+    assert report["throughput_per_second"] > 0
+
+
+def test_load_benchmark_reads_streams():
+    events = (
+        b'event: session\ndata: {"session_id": "s1"}\n\n'
+        + b'event: token\ndata: {"content": "An"}\n\n'
+        + b'event: done\ndata: {"session_id": "s1", "content": "An"}\n\n'
+    )
+    transport = get_api_transport([], stream_events=events)
+    conversation = {"text": "Text", "questions": ["Q1"]}
+
+    report = run_load_benchmark(
+        transport, benchmark_load.BenchmarkMode.STREAM, [conversation]
+    )
+
+    analysis = report["requests"]["analysis"]
+    assert analysis["errors"] == 0
+    assert analysis["first_token_ms"]["p50"] <= analysis["completion_ms"]["p50"]
+    assert report["requests"]["question"]["count"] == 1
+
+
+def test_load_benchmark_skips_questions_of_failed_analysis():
+    transport = get_api_transport(
+        [], stream_events=b'event: error\ndata: {"error": "Down"}\n\n'
+    )
+    conversation = {"text": "Text", "questions": ["Q1"]}
+
+    report = run_load_benchmark(
+        transport, benchmark_load.BenchmarkMode.STREAM, [conversation]
+    )
+
+    assert report["requests"]["analysis"]["errors"] == 1
+    assert report["requests"]["question"]["count"] == 0
+    assert report["failed_conversations"] == 1
+    assert report["errors"] == ["Down"]
+
+
+def test_benchmark_load_saves_report(tmp_path, mocker):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([{"text": "A"}, {"text": "B"}]))
+    output = tmp_path / "report.json"
+    run = mocker.patch.object(
+        benchmark_load.LoadBenchmark, "run", autospec=True, return_value={}
+    )
+
+    async def fake_run(self):
+        self.timings.append(benchmark_load.RequestTiming("analysis", completion_ms=5.0))
+        return self.get_report(duration=1.0)
+
+    run.side_effect = fake_run
+    out = StringIO()
+
+    call_command(
+        "benchmark_load",
+        data=str(data),
+        conversations=3,
+        output=str(output),
+        stdout=out,
+    )
+
+    report = json.loads(output.read_text())
+    assert report["conversations"] == 3
+    assert report["requests"]["analysis"]["completion_ms"]["p50"] == 5.0
+    assert "Throughput:" in out.getvalue()
+    assert f"Results saved to {output}" in out.getvalue()
+
+
+def test_get_memory_mb_includes_children():
+    child = subprocess.Popen(["sleep", "5"])
+    try:
+        assert child.pid in benchmark_worker.get_child_pids(os.getpid())
+        assert benchmark_worker.get_memory_mb(os.getpid()) > (
+            benchmark_worker.get_pss_kb(os.getpid()) / 1024
+        )
+    finally:
+        child.kill()
+        child.wait()
+
+
+def test_benchmark_pool_runs_threads_pool(mocker):
+    mock_prepare = mocker.patch.object(benchmark_worker, "prepare_worker_process")
+    mock_shutdown = mocker.patch.object(benchmark_worker, "shutdown_worker_process")
+    work = mocker.Mock()
+
+    result = benchmark_worker.benchmark_pool("threads", 2, 5, work)
+
+    # One warm-up call per thread
+    assert work.call_count == 7
+    assert result["errors"] == 0
+    assert result["tasks_per_second"] > 0
+    assert result["peak_memory_mb"] > 0
+    mock_prepare.assert_called_once()
+    mock_shutdown.assert_called_once()
+
+
+def test_benchmark_worker_requires_fake_platform(monkeypatch):
+    monkeypatch.setenv("AI_PLATFORM", "together.ai")
+
+    with pytest.raises(CommandError):
+        call_command("benchmark_worker")
+
+
+def test_benchmark_worker_saves_results(tmp_path, mocker, monkeypatch):
+    monkeypatch.setenv("AI_PLATFORM", "fake")
+    output = tmp_path / "results.json"
+    mock_benchmark = mocker.patch.object(
+        benchmark_worker,
+        "benchmark_pool",
+        side_effect=lambda pool, concurrency, tasks, work: {
+            "pool": pool,
+            "concurrency": concurrency,
+            "tasks": tasks,
+            "errors": 0,
+            "duration_seconds": 1.0,
+            "tasks_per_second": 10.0,
+            "peak_memory_mb": 512.0,
+            "tasks_per_second_per_gb": 20.0,
+        },
+    )
+    out = StringIO()
+
+    call_command(
+        "benchmark_worker",
+        pools=["threads"],
+        concurrency=[4, 8],
+        tasks=10,
+        output=str(output),
+        stdout=out,
+    )
+
+    assert mock_benchmark.call_count == 2
+    results = json.loads(output.read_text())
+    assert [result["concurrency"] for result in results] == [4, 8]
+    assert "20.0 tasks/s/GB" in out.getvalue()
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import time
+import uuid
+from unittest import mock
+
+import fakeredis
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from redis import RedisError
+
+from mentor.assistant import events, tasks
+from mentor.assistant.models import ChatSession
+
+
+def parse_event(raw: bytes) -> tuple[str, dict]:
+    event_line, data_line = raw.decode().strip().split("\n")
+    return event_line.removeprefix("event: "), json.loads(
+        data_line.removeprefix("data: ")
+    )
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def client(server):
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+def test_publish_task_event(client):
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(events.get_user_channel(1))
+    pubsub.get_message()
+
+    events.publish_task_event(client, 1, {"task_id": "a", "status": "SUCCESS"})
+
+    message = pubsub.get_message(timeout=1)
+    assert json.loads(message["data"]) == {"task_id": "a", "status": "SUCCESS"}
+
+
+def test_publish_task_event_fails_open(mocker, caplog):
+    client = mocker.Mock()
+    client.publish.side_effect = RedisError("down")
+
+    events.publish_task_event(client, 1, {"task_id": "a"})
+
+    assert "Publishing the task event failed" in caplog.text
+
+
+def test_stream_task_events(server, client):
+    async def get_initial_events():
+        return [{"task_id": "a", "status": "FAILURE"}]
+
+    async def run():
+        stream = events.stream_task_events(
+            fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+            user_id=1,
+            get_initial_events=get_initial_events,
+            keepalive_seconds=0.01,
+        )
+        initial = await anext(stream)
+        events.publish_task_event(client, 2, {"task_id": "b", "status": "SUCCESS"})
+        events.publish_task_event(client, 1, {"task_id": "c", "status": "SUCCESS"})
+        received = [await anext(stream) for _ in range(5)]
+        await stream.aclose()
+        return initial, received
+
+    initial, received = async_to_sync(run)()
+
+    assert parse_event(initial) == ("task", {"task_id": "a", "status": "FAILURE"})
+    published = [raw for raw in received if raw != events.KEEPALIVE_COMMENT]
+    assert [parse_event(raw) for raw in published] == [
+        ("task", {"task_id": "c", "status": "SUCCESS"})
+    ]
+    assert events.KEEPALIVE_COMMENT in received
+
+
+def test_stream_task_events_reads_initial_events_once_subscribed(server, client):
+    async def get_initial_events():
+        # The task finishes after the view was called, but before its status is read
+        events.publish_task_event(client, 1, {"task_id": "a", "status": "SUCCESS"})
+        return []
+
+    async def run():
+        stream = events.stream_task_events(
+            fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+            user_id=1,
+            get_initial_events=get_initial_events,
+            keepalive_seconds=0.01,
+        )
+        received = [await anext(stream) for _ in range(5)]
+        await stream.aclose()
+        return received
+
+    received = async_to_sync(run)()
+
+    published = [raw for raw in received if raw != events.KEEPALIVE_COMMENT]
+    assert [parse_event(raw) for raw in published] == [
+        ("task", {"task_id": "a", "status": "SUCCESS"})
+    ]
+
+
+@pytest.mark.django_db
+def test_publish_task_completion_of_follow_up_question(mocker, client):
+    user = User.objects.create_user(username="testuser", password="password")
+    session = ChatSession.objects.create(user=user, title="Session")
+    mocker.patch.object(tasks, "get_redis_client", return_value=client)
+    publish = mocker.spy(tasks, "publish_task_event")
+    task_id = str(uuid.uuid4())
+
+    tasks.publish_task_completion(
+        task=tasks.follow_up_question,
+        task_id=task_id,
+        kwargs={"session_id": session.id, "question": "Why?"},
+        retval="The answer",
+        state="SUCCESS",
+    )
+
+    publish.assert_called_once_with(
+        client,
+        user.id,
+        {
+            "task_id": task_id,
+            "status": "SUCCESS",
+            "result": "The answer",
+            "error": None,
+            "session_id": str(session.id),
+        },
+    )
+
+
+def test_publish_task_completion_of_failed_analysis(mocker, client):
+    mocker.patch.object(tasks, "get_redis_client", return_value=client)
+    publish = mocker.spy(tasks, "publish_task_event")
+    session_id = uuid.uuid4()
+
+    tasks.publish_task_completion(
+        task=tasks.analyze_text,
+        task_id="task",
+        kwargs={"user_id": 7, "session_id": session_id, "text": "Text"},
+        retval=RuntimeError("Provider error"),
+        state="FAILURE",
+    )
+
+    assert publish.call_args.args[1] == 7
+    assert publish.call_args.args[2]["error"] == "Provider error"
+    assert publish.call_args.args[2]["result"] is None
+
+
+@pytest.mark.parametrize(
+    "task, state",
+    [(tasks.summarize_session_history, "SUCCESS"), (tasks.analyze_text, "RETRY")],
+)
+def test_publish_task_completion_ignores_other_tasks(mocker, task, state):
+    publish = mocker.patch.object(tasks, "publish_task_event")
+
+    tasks.publish_task_completion(
+        task=task, task_id="task", kwargs={"user_id": 1}, retval=None, state=state
+    )
+
+    publish.assert_not_called()
+
+
+def test_wait_for_task_until_finished(server, client):
+    async def run():
+        async def is_ready():
+            return False
+
+        waiting = asyncio.ensure_future(
+            events.wait_for_task(
+                fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+                "celery-task-meta-a",
+                timeout=5,
+                is_ready=is_ready,
+            )
+        )
+        await asyncio.sleep(0.05)
+        client.publish("celery-task-meta-a", json.dumps({"status": "STARTED"}))
+        await asyncio.sleep(0.05)
+        started_done = waiting.done()
+        client.publish("celery-task-meta-a", json.dumps({"status": "SUCCESS"}))
+        await asyncio.wait_for(waiting, timeout=1)
+        return started_done
+
+    assert async_to_sync(run)() is False
+
+
+def test_wait_for_task_already_finished(server):
+    is_ready = mock.AsyncMock(return_value=True)
+
+    async def run():
+        await asyncio.wait_for(
+            events.wait_for_task(
+                fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+                "celery-task-meta-a",
+                timeout=5,
+                is_ready=is_ready,
+            ),
+            timeout=1,
+        )
+
+    async_to_sync(run)()
+
+    is_ready.assert_awaited_once()
+
+
+def test_wait_for_task_times_out(server):
+    async def run():
+        started_at = time.monotonic()
+        await events.wait_for_task(
+            fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+            "celery-task-meta-a",
+            timeout=0.1,
+            is_ready=mock.AsyncMock(return_value=False),
+        )
+        return time.monotonic() - started_at
+
+    assert 0.1 <= async_to_sync(run)() < 1
@@ -0,0 +1,94 @@
+import pytest
+from asgiref.sync import async_to_sync
+
+from mentor.assistant import agent, fake_llm
+from mentor.assistant.settings import LatencyDistribution
+
+
+def get_model(**kwargs):
+    return fake_llm.FakeChatModel(
+        **{"latency_ms": 0, "tokens_per_second": 0, "response_tokens": 5, **kwargs}
+    )
+
+
+def test_answer_only_depends_on_the_prompt():
+    model = get_model()
+
+    first = model.invoke("Question")
+
+    assert first.content == get_model(seed=1).invoke("Question").content
+    assert first.content != model.invoke("Other question").content
+    assert len(first.content.split()) == 5
+    assert first.usage_metadata["output_tokens"] == 5
+    assert first.response_metadata["model_name"] == "fake-model"
+
+
+def test_stream_sends_one_chunk_per_token():
+    model = get_model()
+
+    chunks = list(model.stream("Question"))
+
+    assert len(chunks) == 5
+    assert (
+        "".join(chunk.content for chunk in chunks) == model.invoke("Question").content
+    )
+    assert chunks[-1].usage_metadata["output_tokens"] == 5
+
+
+def test_stream_waits_latency_then_tokens(mocker):
+    sleep = mocker.patch("mentor.assistant.fake_llm.time.sleep")
+    model = get_model(
+        latency_ms=200, latency_distribution="constant", tokens_per_second=10
+    )
+
+    list(model.stream("Question"))
+
+    assert [c.args[0] for c in sleep.call_args_list] == [0.2] + [0.1] * 4
+
+
+def test_async_invoke_sleeps_on_event_loop(mocker):
+    sleep = mocker.patch("mentor.assistant.fake_llm.asyncio.sleep")
+    model = get_model(
+        latency_ms=200, latency_distribution="constant", tokens_per_second=50
+    )
+
+    result = async_to_sync(model.ainvoke)("Question")
+
+    sleep.assert_awaited_once_with(pytest.approx(0.3))
+    assert result.content == model.invoke("Question").content
+
+
+@pytest.mark.parametrize("distribution", list(LatencyDistribution))
+def test_latencies_are_repeatable(distribution):
+    def sample(model):
+        return [model.sample_call()[0] for _ in range(20)]
+
+    model = get_model(latency_ms=500, latency_distribution=distribution)
+    latencies = sample(model)
+
+    assert latencies == sample(
+        get_model(latency_ms=500, latency_distribution=distribution)
+    )
+    assert all(latency >= 0 for latency in latencies)
+    assert sum(latencies) / len(latencies) == pytest.approx(0.5, rel=0.2)
+
+
+def test_error_injection():
+    model = get_model(error_rate=1.0)
+
+    with pytest.raises(fake_llm.FakeProviderError):
+        model.invoke("Question")
+
+
+def test_get_agent_selects_fake_platform(mocker, monkeypatch):
+    monkeypatch.setenv("AI_PLATFORM", "fake")
+    monkeypatch.setenv("FAKE_RESPONSE_TOKENS", "7")
+    monkeypatch.setenv("FAKE_ERROR_RATE", "0.1")
+    mocker.patch.object(agent, "get_agent_cache", return_value=agent.AgentCache())
+
+    assistant = agent.get_agent()
+
+    assert isinstance(assistant, agent.FakeAssistant)
+    assert assistant.model.response_tokens == 7
+    assert assistant.model.error_rate == 0.1
+    assert assistant.model_id == "fake:fake-model:0.0"
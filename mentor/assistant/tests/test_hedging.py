@@ -0,0 +1,204 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+from asgiref.sync import async_to_sync
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableConfig
+
+from mentor.assistant import agent, hedging
+
+
+class SlowChatModel(BaseChatModel):
+    """
+    Answers `response` after `delay` seconds, or fails if `error` is set.
+    """
+
+    response: str = "Slow"
+    delay: float = 0.0
+    error: str = ""
+    cancelled: bool = False
+
+    @property
+    def _llm_type(self):
+        return "slow"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(self.error)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.response))]
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise RuntimeError(self.error)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.response))]
+        )
+
+
+@pytest.fixture
+def stats():
+    return hedging.HedgingStats(fakeredis.FakeRedis(decode_responses=True))
+
+
+def get_model(primary, hedge, stats, **kwargs):
+    return hedging.HedgingChatModel(
+        primary=primary,
+        hedge=hedge,
+        primary_name="together.ai",
+        hedge_name="openai",
+        **{"min_samples": 3, "default_delay_seconds": 0.05, "stats": stats, **kwargs},
+    )
+
+
+def test_fast_primary_is_not_hedged(stats):
+    hedge = SlowChatModel(response="Hedge")
+    model = get_model(SlowChatModel(response="Primary"), hedge, stats)
+
+    result = model.invoke("Question")
+
+    assert result.content == "Primary"
+    assert stats.get_stats() == {"calls": 1, "hedges": 0, "hedge_wins": 0}
+
+
+def test_slow_primary_is_hedged(stats):
+    model = get_model(
+        SlowChatModel(response="Primary", delay=0.5),
+        SlowChatModel(response="Hedge"),
+        stats,
+    )
+
+    result = model.invoke("Question")
+
+    assert result.content == "Hedge"
+    assert stats.get_stats() == {"calls": 1, "hedges": 1, "hedge_wins": 1}
+
+
+def test_failed_hedge_waits_for_primary(stats):
+    model = get_model(
+        SlowChatModel(response="Primary", delay=0.2),
+        SlowChatModel(error="Hedge down"),
+        stats,
+    )
+
+    result = model.invoke("Question")
+
+    assert result.content == "Primary"
+    assert stats.get_stats() == {"calls": 1, "hedges": 1, "hedge_wins": 0}
+
+
+def test_both_failing_raise(stats):
+    model = get_model(
+        SlowChatModel(error="Primary down", delay=0.2),
+        SlowChatModel(error="Hedge down"),
+        stats,
+    )
+
+    with pytest.raises(RuntimeError):
+        model.invoke("Question")
+
+
+def test_async_hedge_cancels_loser(stats):
+    primary = SlowChatModel(response="Primary", delay=5)
+    model = get_model(primary, SlowChatModel(response="Hedge"), stats)
+
+    result = async_to_sync(model.ainvoke)("Question")
+
+    assert result.content == "Hedge"
+    assert primary.cancelled is True
+    assert stats.get_stats() == {"calls": 1, "hedges": 1, "hedge_wins": 1}
+
+
+def test_hedge_delay_follows_recent_latencies(stats):
+    model = get_model(SlowChatModel(), SlowChatModel(), stats, percentile=50)
+    assert model.get_hedge_delay() == 0.05
+
+    for latency in (1.0, 2.0, 3.0):
+        model.get_health("analysis").record(latency)
+    model.get_health("analysis").record(100.0, failed=True)
+
+    assert model.get_hedge_delay("analysis") == 2.0
+    # The other prompts have latencies of their own
+    assert model.get_hedge_delay("title") == 0.05
+
+
+def test_latency_is_recorded_per_prompt(stats):
+    model = get_model(SlowChatModel(), SlowChatModel(), stats)
+
+    model.invoke("Question", RunnableConfig(metadata={"prompt_name": "title"}))
+
+    assert len(model.get_health("title").get_recent_samples()) == 1
+    assert model.get_health("analysis").get_recent_samples() == []
+
+
+def test_primary_latency_is_recorded_after_it_loses(stats):
+    model = get_model(SlowChatModel(delay=0.2), SlowChatModel(response="Hedge"), stats)
+    model.invoke("Question")
+
+    health = model.get_health("")
+    deadline = time.monotonic() + 5
+    while not health.get_recent_samples() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    [(_, latency, failed)] = health.get_recent_samples()
+    assert latency >= 0.2
+    assert failed is False
+
+
+def test_cancelled_primary_latency_is_not_recorded(stats):
+    primary = SlowChatModel(response="Primary", delay=5)
+    model = get_model(primary, SlowChatModel(response="Hedge"), stats)
+
+    async_to_sync(model.ainvoke)("Question")
+
+    assert primary.cancelled is True
+    assert model.get_health("").get_recent_samples() == []
+
+
+def test_stream_goes_to_primary(stats):
+    model = get_model(FakeListChatModel(responses=["Primary"]), SlowChatModel(), stats)
+
+    chunks = list(model.stream("Question"))
+
+    assert "".join(chunk.content for chunk in chunks) == "Primary"
+    assert stats.get_stats()["calls"] == 0
+
+
+def test_hedging_executor_size_is_configurable(monkeypatch):
+    monkeypatch.setenv("HEDGING_MAX_WORKERS", "7")
+    hedging.get_hedging_executor.cache_clear()
+    try:
+        assert hedging.get_hedging_executor()._max_workers == 7
+    finally:
+        hedging.get_hedging_executor().shutdown()
+        hedging.get_hedging_executor.cache_clear()
+
+
+def test_get_agent_wraps_assistant_with_hedging(stats, mocker, monkeypatch):
+    monkeypatch.setenv("AI_PLATFORM", "fake")
+    monkeypatch.setenv("HEDGING_ENABLED", "true")
+    monkeypatch.setenv("HEDGING_PLATFORM", "openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    mocker.patch.object(agent, "get_agent_cache", return_value=agent.AgentCache())
+    mocker.patch("mentor.assistant.agent.get_hedging_stats", return_value=stats)
+
+    assistant = agent.get_agent()
+
+    assert isinstance(assistant, agent.HedgingAssistant)
+    assert assistant.platform == agent.AiPlatform.FAKE
+    assert assistant.model_id == "fake:fake-model:0.0|openai:gpt-4o-mini:0.0"
+    assert assistant.model.primary is assistant.assistant.model
+    assert assistant.model.hedge_name == "openai"
+    assert agent.get_agent() is assistant
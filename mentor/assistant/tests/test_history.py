@@ -0,0 +1,153 @@
+import uuid
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from mentor.assistant import history
+from mentor.assistant.models import ChatSession
+from mentor.assistant.settings import HistorySettings, HistoryStrategy
+
+pytestmark = pytest.mark.django_db
+
+PINNED = [HumanMessage(content="Analyze: the text"), AIMessage(content="Analysis")]
+
+
+def get_turns(count):
+    turns = []
+    for i in range(count):
+        turns += [
+            HumanMessage(content=f"Question {i}"),
+            AIMessage(content=f"Answer {i}"),
+        ]
+    return turns
+
+
+def get_settings(strategy, **kwargs):
+    return HistorySettings(history_strategy=strategy, **kwargs)
+
+
+def test_select_history_full_keeps_everything():
+    messages = PINNED + get_turns(20)
+
+    result = history.select_history(messages, get_settings(HistoryStrategy.FULL))
+
+    assert result == messages
+
+
+def test_full_history_is_the_default():
+    assert HistorySettings().history_strategy == HistoryStrategy.FULL
+
+
+def test_select_history_last_turns_keeps_pinned_messages():
+    messages = PINNED + get_turns(5)
+    settings = get_settings(HistoryStrategy.LAST_TURNS, history_max_turns=2)
+
+    result = history.select_history(messages, settings)
+
+    assert result == PINNED + get_turns(5)[-4:]
+
+
+def test_select_history_last_turns_zero_keeps_only_pinned_messages():
+    settings = get_settings(HistoryStrategy.LAST_TURNS, history_max_turns=0)
+
+    result = history.select_history(PINNED + get_turns(3), settings)
+
+    assert result == PINNED
+
+
+def test_select_history_token_budget_drops_oldest_turns():
+    turns = get_turns(50)
+    settings = get_settings(HistoryStrategy.TOKEN_BUDGET, history_max_tokens=40)
+
+    result = history.select_history(PINNED + turns, settings)
+
+    assert result[:2] == PINNED
+    assert 2 < len(result) < len(turns)
+    assert result[-1] == turns[-1]
+    # The window always starts with a question
+    assert isinstance(result[2], HumanMessage)
+
+
+def test_select_history_size_does_not_grow_with_the_session():
+    settings = get_settings(HistoryStrategy.TOKEN_BUDGET, history_max_tokens=40)
+
+    short = history.select_history(PINNED + get_turns(20), settings)
+    long = history.select_history(PINNED + get_turns(200), settings)
+
+    assert len(short) == len(long)
+
+
+def test_select_history_summary_replaces_summarized_turns():
+    turns = get_turns(4)
+    settings = get_settings(HistoryStrategy.SUMMARY, history_max_turns=1)
+
+    result = history.select_history(
+        PINNED + turns, settings, summary="The summary", summarized_message_count=4
+    )
+
+    assert result[:2] == PINNED
+    assert result[2] == SystemMessage(
+        content=history.SUMMARY_MESSAGE_PREFIX + "The summary"
+    )
+    assert result[3:] == turns[-2:]
+
+
+def test_select_history_summary_without_summary_keeps_last_turns():
+    settings = get_settings(HistoryStrategy.SUMMARY, history_max_turns=1)
+
+    result = history.select_history(PINNED + get_turns(3), settings)
+
+    assert result == PINNED + get_turns(3)[-2:]
+
+
+def test_get_summary_input_formats_messages():
+    result = history.get_summary_input("", get_turns(1))
+
+    assert "RESUMO ATUAL:\n-" in result
+    assert "Aluno: Question 0\nAssistente: Answer 0" in result
+
+
+@pytest.fixture
+def chat_session():
+    user = User.objects.create_user(username="testuser", password="password")
+    return ChatSession.objects.create(
+        user=user,
+        title="Session",
+        history_summary="The summary",
+        summarized_message_count=2,
+    )
+
+
+def test_bounded_history_reads_summary_of_session(chat_session):
+    messages = PINNED + get_turns(3)
+    bounded = history.BoundedChatMessageHistory(
+        session_id=str(chat_session.id),
+        history=InMemoryChatMessageHistory(messages=messages),
+        settings=get_settings(HistoryStrategy.SUMMARY, history_max_turns=5),
+    )
+
+    result = bounded.messages
+
+    assert result[2].content.endswith("The summary")
+    assert result[3:] == get_turns(3)[2:]
+    assert async_to_sync(bounded.aget_messages)() == result
+
+
+def test_bounded_history_stores_messages_in_wrapped_history():
+    wrapped = InMemoryChatMessageHistory(messages=PINNED + get_turns(3))
+    bounded = history.BoundedChatMessageHistory(
+        session_id=str(uuid.uuid4()),
+        history=wrapped,
+        settings=get_settings(HistoryStrategy.LAST_TURNS, history_max_turns=1),
+    )
+
+    bounded.add_messages([HumanMessage(content="New"), AIMessage(content="Reply")])
+
+    assert len(wrapped.messages) == 10
+    assert bounded.messages[2:] == [
+        HumanMessage(content="New"),
+        AIMessage(content="Reply"),
+    ]
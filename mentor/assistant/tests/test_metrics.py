@@ -0,0 +1,231 @@
+import asyncio
+import uuid
+
+import pytest
+from asgiref.sync import async_to_sync
+from langchain_core.language_models.fake_chat_models import (
+    FakeListChatModel,
+    GenericFakeChatModel,
+)
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from mentor.assistant import metrics
+from mentor.assistant.hedging import HedgingChatModel
+from mentor.assistant.models import LlmCall
+from mentor.assistant.routing import RoutingChatModel
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics_handler():
+    metrics.get_llm_metrics_handler.cache_clear()
+    yield
+    metrics.get_llm_metrics_handler.cache_clear()
+
+
+@pytest.fixture
+def handler():
+    return metrics.LlmCallMetricsHandler([metrics.DatabaseSink()])
+
+
+def get_config(handler, **metadata):
+    return {"callbacks": [handler], "metadata": {"prompt_name": "test", **metadata}}
+
+
+def test_handler_records_call(handler):
+    session_id = uuid.uuid4()
+    model = GenericFakeChatModel(
+        messages=iter(
+            [
+                AIMessage(
+                    content="Answer",
+                    usage_metadata={
+                        "input_tokens": 12,
+                        "output_tokens": 3,
+                        "total_tokens": 15,
+                    },
+                )
+            ]
+        )
+    )
+
+    model.invoke(
+        "Question",
+        config=get_config(handler, session_id=str(session_id), queue_wait_ms=5.0),
+    )
+
+    call = LlmCall.objects.get()
+    assert call.prompt_name == "test"
+    assert call.provider == "genericfakechatmodel"
+    assert call.session_id == session_id
+    assert call.queue_wait_ms == 5.0
+    assert call.time_to_first_token_ms is None
+    assert call.latency_ms > 0
+    assert (call.prompt_tokens, call.completion_tokens) == (12, 3)
+    assert call.error == ""
+    assert handler.runs == {}
+
+
+def test_handler_records_time_to_first_token(handler):
+    model = FakeListChatModel(responses=["Answer"])
+
+    list(model.stream("Question", config=get_config(handler)))
+
+    call = LlmCall.objects.get()
+    assert 0 < call.time_to_first_token_ms <= call.latency_ms
+
+
+def test_handler_records_failed_call(handler, mocker):
+    model = FakeListChatModel(responses=["Answer"])
+    mocker.patch.object(
+        FakeListChatModel, "_call", side_effect=ValueError("Provider down")
+    )
+
+    with pytest.raises(ValueError):
+        model.invoke("Question", config=get_config(handler))
+
+    call = LlmCall.objects.get()
+    assert "Provider down" in call.error
+
+
+def test_handler_records_routed_provider(handler):
+    model = RoutingChatModel(models={"openai": FakeListChatModel(responses=["A"])})
+
+    model.invoke("Question", config=get_config(handler))
+
+    assert LlmCall.objects.get().provider == "openai"
+
+
+def get_wrapped_models():
+    return {
+        "routed": RoutingChatModel(
+            models={"openai": FakeListChatModel(responses=["A"])}
+        ),
+        "hedged": HedgingChatModel(
+            primary=FakeListChatModel(responses=["A"]),
+            hedge=FakeListChatModel(responses=["A"]),
+            primary_name="openai",
+            hedge_name="openai",
+        ),
+    }
+
+
+@pytest.mark.parametrize("kind", ["routed", "hedged"])
+def test_handler_records_wrapped_chain_call_once(handler, kind):
+    chain = (
+        ChatPromptTemplate.from_messages([("human", "{question}")])
+        | (get_wrapped_models()[kind])
+    )
+
+    chain.invoke({"question": "Question"}, config=get_config(handler))
+
+    call = LlmCall.objects.get()
+    assert call.provider == "openai"
+
+
+@pytest.mark.parametrize("kind", ["routed", "hedged"])
+def test_handler_records_wrapped_async_chain_call_once(mocker, kind):
+    sink = mocker.Mock(spec=metrics.LlmCallSink)
+    handler = metrics.LlmCallMetricsHandler([sink])
+    chain = (
+        ChatPromptTemplate.from_messages([("human", "{question}")])
+        | (get_wrapped_models()[kind])
+    )
+
+    async def invoke():
+        await chain.ainvoke({"question": "Question"}, config=get_config(handler))
+        await asyncio.gather(*handler.writes)
+
+    async_to_sync(invoke)()
+
+    sink.record.assert_called_once()
+
+
+def test_handler_records_async_calls_off_the_event_loop(mocker):
+    sink = mocker.Mock(spec=metrics.LlmCallSink)
+    handler = metrics.LlmCallMetricsHandler([sink])
+    model = FakeListChatModel(responses=["Answer"])
+
+    async def invoke():
+        await model.ainvoke("Question", config=get_config(handler))
+        await asyncio.gather(*handler.writes)
+
+    async_to_sync(invoke)()
+
+    sink.record.assert_called_once()
+    assert sink.record.call_args[0][0].prompt_name == "test"
+    assert not handler.writes
+
+
+@pytest.mark.parametrize("connected", [False, True])
+def test_database_sink_closes_the_connections_it_opens(mocker, connected):
+    mock_connection = mocker.patch("mentor.assistant.metrics.connection")
+    mock_connection.connection = mocker.Mock() if connected else None
+    call = LlmCall(prompt_name="test", provider="fake", model="fake", latency_ms=1.0)
+
+    metrics.DatabaseSink().record(call)
+
+    assert LlmCall.objects.filter(prompt_name="test").exists()
+    # Only the connection of a thread that didn't have one is closed
+    assert mock_connection.close.called is not connected
+
+
+def test_handler_keeps_going_when_a_sink_fails(mocker):
+    failing_sink = mocker.Mock(spec=metrics.LlmCallSink)
+    failing_sink.record.side_effect = OSError
+    sink = mocker.Mock(spec=metrics.LlmCallSink)
+    handler = metrics.LlmCallMetricsHandler([failing_sink, sink])
+
+    FakeListChatModel(responses=["Answer"]).invoke(
+        "Question", config=get_config(handler)
+    )
+
+    sink.record.assert_called_once()
+
+
+def test_statsd_sink_lines():
+    sink = metrics.StatsdSink(host="localhost", port=8125, prefix="mentor.llm")
+    call = LlmCall(
+        prompt_name="follow_up",
+        provider="openai",
+        model="gpt-4o-mini",
+        latency_ms=120.0,
+        prompt_tokens=50,
+    )
+
+    lines = sink.get_lines(call)
+
+    tags = "#prompt:follow_up,provider:openai,model:gpt-4o-mini"
+    assert lines == [
+        f"mentor.llm.calls:1|c|{tags}",
+        f"mentor.llm.errors:0|c|{tags}",
+        f"mentor.llm.latency_ms:120.0|ms|{tags}",
+        f"mentor.llm.prompt_tokens:50|h|{tags}",
+    ]
+
+
+def test_get_run_config_includes_queue_wait():
+    session_id = uuid.uuid4()
+    token = metrics.queue_wait_ms.set(250.0)
+    try:
+        config = metrics.get_run_config("follow_up", session_id)
+    finally:
+        metrics.queue_wait_ms.reset(token)
+
+    assert config["metadata"] == {
+        "prompt_name": "follow_up",
+        "session_id": str(session_id),
+        "queue_wait_ms": 250.0,
+    }
+    assert config["callbacks"] == [metrics.get_llm_metrics_handler()]
+
+
+def test_get_run_config_without_sinks(monkeypatch):
+    monkeypatch.setenv("LLM_METRICS_SINKS", "[]")
+
+    config = metrics.get_run_config("text_analysis")
+
+    assert config["callbacks"] == []
+    assert config["metadata"] == {"prompt_name": "text_analysis"}
@@ -0,0 +1,114 @@
+import fakeredis
+import pytest
+from asgiref.sync import async_to_sync
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from redis import RedisError
+
+from mentor.assistant import rate_limit
+from mentor.assistant.settings import RateLimitSettings, TogetherAiModelSettings
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def get_limiter(redis_client, requests_per_minute=60, tokens_per_minute=0):
+    return rate_limit.RedisRateLimiter(
+        client=redis_client,
+        name="together.ai:some-model",
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        burst_seconds=2,
+    )
+
+
+def test_limiter_allows_burst_then_waits(redis_client):
+    limiter = get_limiter(redis_client)
+
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == 0
+    assert 0 < limiter.try_acquire() <= 1
+    assert limiter.acquire(blocking=False) is False
+
+
+def test_limiter_is_shared_between_instances(redis_client):
+    get_limiter(redis_client).try_acquire()
+    get_limiter(redis_client).try_acquire()
+
+    assert get_limiter(redis_client).try_acquire() > 0
+
+
+def test_limiter_waits_for_the_bucket_to_refill(redis_client, mocker):
+    limiter = get_limiter(redis_client, requests_per_minute=6000)
+    limiter.burst_seconds = 0
+    sleep = mocker.spy(rate_limit.time, "sleep")
+
+    assert limiter.acquire() is True
+    assert limiter.acquire() is True
+
+    sleep.assert_called_once()
+    assert sleep.call_args[0][0] <= 0.01
+
+
+def test_limiter_async_acquire(redis_client):
+    limiter = get_limiter(redis_client)
+
+    assert async_to_sync(limiter.aacquire)() is True
+    assert async_to_sync(limiter.aacquire)() is True
+    assert async_to_sync(limiter.aacquire)(blocking=False) is False
+
+
+def test_charged_tokens_delay_next_request(redis_client):
+    limiter = get_limiter(redis_client, requests_per_minute=0, tokens_per_minute=60)
+    assert limiter.try_acquire() == 0
+
+    limiter.charge(10)
+
+    # The bucket holds 2 tokens and refills 1 per second
+    assert limiter.try_acquire() == pytest.approx(9, abs=0.1)
+
+
+def test_limiter_lets_calls_through_on_redis_error(mocker):
+    client = mocker.Mock()
+    client.register_script.return_value.side_effect = RedisError
+    limiter = get_limiter(client)
+
+    assert limiter.acquire(blocking=False) is True
+
+
+def test_usage_handler_charges_tokens(redis_client, mocker):
+    limiter = get_limiter(redis_client, tokens_per_minute=600)
+    charge = mocker.spy(limiter, "charge")
+    usage = {"input_tokens": 30, "output_tokens": 5, "total_tokens": 35}
+    model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="Answer", usage_metadata=usage)]),
+        rate_limiter=limiter,
+        callbacks=[rate_limit.RateLimitUsageHandler(limiter)],
+    )
+
+    model.invoke("Question")
+
+    charge.assert_called_once_with(35)
+
+
+def test_get_rate_limiter_without_limits():
+    settings = TogetherAiModelSettings(api_key="key")
+
+    assert (
+        rate_limit.get_rate_limiter("together.ai", settings, RateLimitSettings())
+        is None
+    )
+
+
+def test_get_rate_limiter_per_provider_and_model(mocker):
+    mocker.patch("mentor.assistant.rate_limit.get_redis_client")
+    settings = TogetherAiModelSettings(
+        api_key="key", model="some-model", requests_per_minute=60
+    )
+
+    limiter = rate_limit.get_rate_limiter("together.ai", settings, RateLimitSettings())
+
+    assert limiter is not None
+    assert limiter.keys[0] == "mentor:rate_limit:together.ai:some-model:requests"
@@ -0,0 +1,132 @@
+import pytest
+from asgiref.sync import async_to_sync
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import (
+    FakeListChatModel,
+    FakeListChatModelError,
+)
+
+from mentor.assistant import agent
+from mentor.assistant.routing import ProviderHealth, RoutingChatModel
+
+
+class FailingChatModel(BaseChatModel):
+    @property
+    def _llm_type(self):
+        return "failing"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise RuntimeError("Provider is down")
+
+
+def get_router(**models):
+    return RoutingChatModel(models=models, window_seconds=60, max_error_rate=0.5)
+
+
+def test_provider_health_stats():
+    health = ProviderHealth(window_seconds=60)
+    health.record(1.0)
+    health.record(3.0)
+    health.record(10.0, failed=True)
+
+    stats = health.get_stats()
+
+    assert stats["calls"] == 3
+    assert stats["error_rate"] == pytest.approx(1 / 3)
+    assert stats["latency"] == 2.0
+
+
+def test_provider_health_forgets_old_calls(mocker):
+    health = ProviderHealth(window_seconds=60)
+    mock_time = mocker.patch("mentor.assistant.routing.time.monotonic")
+    mock_time.return_value = 0
+    health.record(1.0, failed=True)
+    mock_time.return_value = 61
+
+    assert health.get_stats() == {"calls": 0, "error_rate": 0.0, "latency": 0.0}
+
+
+def test_router_prefers_lowest_latency():
+    router = get_router(
+        slow=FakeListChatModel(responses=["slow"]),
+        fast=FakeListChatModel(responses=["fast"]),
+    )
+    router.health["slow"].record(5.0)
+    router.health["fast"].record(1.0)
+
+    assert router.invoke("Hello").content == "fast"
+
+
+def test_router_avoids_failing_provider():
+    router = get_router(
+        flaky=FakeListChatModel(responses=["flaky"]),
+        slow=FakeListChatModel(responses=["slow"]),
+    )
+    router.health["flaky"].record(0.1, failed=True)
+    router.health["slow"].record(5.0)
+
+    assert router.invoke("Hello").content == "slow"
+
+
+def test_router_falls_back_on_error():
+    router = get_router(
+        down=FailingChatModel(), up=FakeListChatModel(responses=["fallback"])
+    )
+
+    assert router.invoke("Hello").content == "fallback"
+    assert router.get_stats()["down"]["error_rate"] == 1.0
+    assert router.get_stats()["up"]["calls"] == 1
+
+
+def test_router_raises_when_all_providers_fail():
+    router = get_router(first=FailingChatModel(), second=FailingChatModel())
+
+    with pytest.raises(RuntimeError):
+        router.invoke("Hello")
+
+
+def test_router_falls_back_before_first_chunk():
+    router = get_router(
+        down=FakeListChatModel(responses=["down"], error_on_chunk_number=0),
+        up=FakeListChatModel(responses=["up"]),
+    )
+
+    async def collect():
+        return "".join([chunk.text() async for chunk in router.astream("Hello")])
+
+    assert async_to_sync(collect)() == "up"
+
+
+def test_router_does_not_fall_back_after_first_chunk():
+    router = get_router(
+        down=FakeListChatModel(responses=["down"], error_on_chunk_number=2),
+        up=FakeListChatModel(responses=["up"]),
+    )
+
+    with pytest.raises(FakeListChatModelError):
+        list(router.stream("Hello"))
+    assert router.get_stats()["up"]["calls"] == 0
+
+
+def test_routing_assistant_reads_prefixed_settings(monkeypatch):
+    monkeypatch.setenv("ROUTING_PLATFORMS", '["together.ai", "openai"]')
+    monkeypatch.setenv("TOGETHER_API_KEY", "together-key")
+    monkeypatch.setenv("OPENAI_API_KEY", "openai-key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o")
+
+    assistant = agent.create_agent(agent.AiPlatform.ROUTING)
+
+    together, openai = assistant.assistants
+    assert together.model_settings.api_key.get_secret_value() == "together-key"
+    assert openai.model_settings.model == "gpt-4o"
+    assert set(assistant.model.models) == {"together.ai", "openai"}
+    assert "gpt-4o" in assistant.model_id
+
+
+def test_routing_assistant_cannot_route_to_itself(monkeypatch):
+    monkeypatch.setenv("ROUTING_PLATFORMS", '["routing"]')
+
+    assistant = agent.create_agent(agent.AiPlatform.ROUTING)
+
+    with pytest.raises(ValueError):
+        assistant.build_chains()
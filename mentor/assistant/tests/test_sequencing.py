@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+from asgiref.sync import async_to_sync
+from redis import RedisError
+
+from mentor.assistant import sequencing
+
+SESSION_ID = "3f1c2b9e-0000-4000-8000-000000000000"
+KEY = f"mentor:session_sequence:{SESSION_ID}"
+
+
+@pytest.fixture
+def sequencer():
+    return sequencing.SessionSequencer(
+        client=fakeredis.FakeRedis(decode_responses=True),
+        turn_timeout_seconds=5,
+        ttl_seconds=60,
+    )
+
+
+def test_take_ticket_numbers_the_questions_of_each_session(sequencer):
+    assert [sequencer.take_ticket(SESSION_ID) for _ in range(3)] == [1, 2, 3]
+    assert sequencer.take_ticket("other-session") == 1
+    assert 0 < sequencer.client.ttl(KEY) <= 60
+
+
+def test_turns_follow_ticket_order(sequencer):
+    tickets = [sequencer.take_ticket(SESSION_ID) for _ in range(3)]
+    now = time.time()
+
+    assert [sequencer.is_turn(SESSION_ID, ticket, now) for ticket in tickets] == [
+        True,
+        False,
+        False,
+    ]
+
+    sequencer.finish(SESSION_ID, 1)
+
+    assert sequencer.is_turn(SESSION_ID, 2, now)
+    assert not sequencer.is_turn(SESSION_ID, 3, now)
+
+
+def test_failed_turn_lets_the_next_one_run(sequencer):
+    with pytest.raises(ValueError):
+        try:
+            raise ValueError
+        finally:
+            sequencer.finish(SESSION_ID, 1)
+
+    assert sequencer.get_done(SESSION_ID) == 1
+
+
+def test_is_turn_gives_up_without_progress(sequencer):
+    sequencer.turn_timeout_seconds = 0.05
+
+    # Ticket 1 was never answered
+    assert not sequencer.is_turn(SESSION_ID, 2, time.time())
+    assert sequencer.is_turn(SESSION_ID, 2, time.time() - 1)
+
+    sequencer.finish(SESSION_ID, 2)
+    # The lost ticket doesn't move the session back when it finishes late
+    sequencer.finish(SESSION_ID, 1)
+    assert sequencer.get_done(SESSION_ID) == 2
+
+
+def test_progress_restarts_the_wait(sequencer):
+    sequencer.turn_timeout_seconds = 0.5
+    waiting_since = time.time() - 1
+
+    sequencer.finish(SESSION_ID, 1)
+
+    assert not sequencer.is_turn(SESSION_ID, 3, waiting_since)
+
+
+def test_released_ticket_is_skipped_after_the_previous_ones(sequencer):
+    tickets = [sequencer.take_ticket(SESSION_ID) for _ in range(3)]
+
+    # The task of the second question couldn't be queued
+    sequencer.release(SESSION_ID, tickets[1])
+    assert sequencer.get_done(SESSION_ID) == 0
+
+    sequencer.finish(SESSION_ID, tickets[0])
+    assert sequencer.get_done(SESSION_ID) == 2
+    assert sequencer.is_turn(SESSION_ID, tickets[2], time.time())
+    assert sequencer.client.hkeys(KEY) == ["next", "done", "done_at"]
+
+
+def test_session_turn_releases_the_ticket_of_an_interrupted_wait(mocker):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    mocker.patch("mentor.assistant.sequencing.get_redis_client", return_value=client)
+    sequencer = sequencing.get_session_sequencer()
+    first = sequencer.take_ticket(SESSION_ID)
+
+    async def wait_for_turn():
+        async with sequencing.session_turn(SESSION_ID):
+            pass
+
+    async def interrupt_wait():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(wait_for_turn(), timeout=0.1)
+
+    async_to_sync(interrupt_wait)()
+    # The interrupted ticket is skipped once the first one is done
+    assert sequencer.get_done(SESSION_ID) == 0
+    sequencer.finish(SESSION_ID, first)
+    assert sequencer.get_done(SESSION_ID) == 2
+
+
+def test_turn_runs_on_redis_error(mocker):
+    client = mocker.Mock()
+    client.pipeline.return_value.execute.side_effect = RedisError
+    client.hmget.side_effect = RedisError
+    client.register_script.return_value.side_effect = RedisError
+    sequencer = sequencing.SessionSequencer(
+        client=client, turn_timeout_seconds=5, ttl_seconds=60
+    )
+
+    assert sequencer.take_ticket(SESSION_ID) is None
+    assert sequencer.is_turn(SESSION_ID, 2, time.time())
+    sequencer.finish(SESSION_ID, 2)
+
+
+def test_get_session_sequencer_can_be_disabled(monkeypatch):
+    assert sequencing.get_session_sequencer() is not None
+
+    monkeypatch.setenv("SESSION_ORDERING_ENABLED", "false")
+
+    assert sequencing.get_session_sequencer() is None
@@ -0,0 +1,107 @@
+import json
+import uuid
+
+from asgiref.sync import async_to_sync
+from langchain_core.messages import AIMessageChunk
+
+from mentor.assistant.streaming import (
+    ServerSentEventRenderer,
+    StreamEvent,
+    format_event,
+    get_event_stream_response,
+    stream_answer_events,
+)
+
+
+async def fake_chunks(*contents):
+    for content in contents:
+        yield AIMessageChunk(content=content)
+
+
+async def failing_chunks():
+    yield AIMessageChunk(content="Partial")
+    raise RuntimeError("Provider error")
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+def parse_event(raw: bytes) -> tuple[str, dict]:
+    event_line, data_line = raw.decode().strip().split("\n")
+    return event_line.removeprefix("event: "), json.loads(
+        data_line.removeprefix("data: ")
+    )
+
+
+def test_format_event():
+    session_id = uuid.uuid4()
+
+    raw = format_event(StreamEvent.SESSION, {"session_id": session_id})
+
+    assert raw == (
+        f'event: session\ndata: {{"session_id": "{session_id}"}}\n\n'.encode()
+    )
+
+
+def test_stream_answer_events():
+    session_id = uuid.uuid4()
+
+    events = async_to_sync(collect)(
+        stream_answer_events(session_id, fake_chunks("Hello", "", " world"))
+    )
+
+    assert [parse_event(event) for event in events] == [
+        ("session", {"session_id": str(session_id)}),
+        ("token", {"content": "Hello"}),
+        ("token", {"content": " world"}),
+        ("done", {"session_id": str(session_id), "content": "Hello world"}),
+    ]
+
+
+def test_stream_answer_events_reports_errors():
+    events = async_to_sync(collect)(
+        stream_answer_events(uuid.uuid4(), failing_chunks())
+    )
+
+    assert [parse_event(event)[0] for event in events] == ["session", "token", "error"]
+    assert parse_event(events[-1])[1] == {"error": "Provider error"}
+
+
+def test_stream_answer_events_reports_incomplete_answers():
+    incomplete = []
+
+    async def on_incomplete():
+        incomplete.append(True)
+
+    async def disconnect():
+        events = stream_answer_events(
+            uuid.uuid4(), fake_chunks("Hello", " world"), on_incomplete
+        )
+        await anext(events)
+        await events.aclose()
+
+    async_to_sync(collect)(
+        stream_answer_events(uuid.uuid4(), fake_chunks("Hello"), on_incomplete)
+    )
+    assert incomplete == []
+
+    async_to_sync(collect)(
+        stream_answer_events(uuid.uuid4(), failing_chunks(), on_incomplete)
+    )
+    async_to_sync(disconnect)()
+    assert incomplete == [True, True]
+
+
+def test_server_sent_event_renderer_renders_errors():
+    rendered = ServerSentEventRenderer().render({"text": ["Required."]})
+
+    assert parse_event(rendered) == ("error", {"text": ["Required."]})
+
+
+def test_get_event_stream_response_headers():
+    response = get_event_stream_response(fake_chunks())
+
+    assert response["Content-Type"] == "text/event-stream"
+    assert response["Cache-Control"] == "no-cache"
+    assert response.is_async
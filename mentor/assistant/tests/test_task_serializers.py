@@ -4,6 +4,7 @@ import pytest
 
 from mentor.assistant.serializers.task import (
     TaskCreatedResponseSerializer,
+    TaskStatusBatchRequestSerializer,
     TaskStatusResponseSerializer,
 )
 
@@ -84,3 +85,31 @@ def test_task_status_response_missing_required_fields_should_fail():
     assert not serializer.is_valid()
     assert "task_id" in serializer.errors
     assert "status" in serializer.errors
+
+
+# ---------------------------
+# TaskStatusBatchRequestSerializer
+# ---------------------------
+
+
+def test_task_status_batch_request_valid():
+    task_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    serializer = TaskStatusBatchRequestSerializer(data={"task_ids": task_ids})
+    assert serializer.is_valid(), serializer.errors
+    assert [str(task_id) for task_id in serializer.validated_data["task_ids"]] == (
+        task_ids
+    )
+
+
+def test_task_status_batch_request_empty_should_fail():
+    serializer = TaskStatusBatchRequestSerializer(data={"task_ids": []})
+    assert not serializer.is_valid()
+    assert "task_ids" in serializer.errors
+
+
+def test_task_status_batch_request_too_many_should_fail(monkeypatch):
+    monkeypatch.setenv("TASK_STATUS_BATCH_MAX_IDS", "1")
+    task_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    serializer = TaskStatusBatchRequestSerializer(data={"task_ids": task_ids})
+    assert not serializer.is_valid()
+    assert "task_ids" in serializer.errors
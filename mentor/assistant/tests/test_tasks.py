@@ -1,11 +1,27 @@
 # tests/test_tasks.py
 
+import threading
 import uuid
 
+import fakeredis
 import pytest
+from celery.backends.redis import RedisBackend
+from celery.exceptions import Retry
 from django.contrib.auth.models import User
-
-from mentor.assistant import tasks
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict
+from psycopg_pool import PoolTimeout
+
+from mentor.assistant import metrics, tasks
+from mentor.assistant.fake_llm import FakeProviderError
+from mentor.assistant.models import (
+    AnalysisBatch,
+    AnalysisBatchItem,
+    ChatMessage,
+    ChatSession,
+)
+from mentor.assistant.sequencing import SessionSequencer
+from mentor.assistant.settings import TaskRetrySettings
+from mentor.core.celery import TASK_QUEUES, app
 
 pytestmark = pytest.mark.django_db
 
@@ -19,6 +35,7 @@ def fake_agent(mocker):
     agent_mock = mocker.Mock()
     agent_mock.generate_title.return_value = mocker.Mock(content="Generated Title")
     agent_mock.analyze_text.return_value = mocker.Mock(content="Analysis Result")
+    agent_mock.generate_analysis.return_value = mocker.Mock(content="Analysis Result")
     agent_mock.follow_up_question.return_value = mocker.Mock(
         content="The follow-up answer"
     )
@@ -52,7 +69,13 @@ def test_analyze_text_with_provided_title(mocker, fake_agent):
         user=mock_user,
         title=title,
     )
-    fake_agent.analyze_text.assert_called_once_with(session_id=session_id, text=text)
+    fake_agent.generate_title.assert_not_called()
+    fake_agent.generate_analysis.assert_called_once_with(text)
+    fake_agent.save_analysis.assert_called_once_with(
+        session_id=session_id,
+        text=text,
+        analysis=fake_agent.generate_analysis.return_value,
+    )
     assert result == "Analysis Result"
 
 
@@ -60,7 +83,7 @@ def test_analyze_text_without_title_generates_title(mocker, fake_agent):
     mock_user = User.objects.create_user(username="tester", password="pw")
 
     fake_agent.generate_title.return_value = mocker.Mock(content="Generated Title")
-    fake_agent.analyze_text.return_value = mocker.Mock(content="Analysis Result")
+    fake_agent.generate_analysis.return_value = mocker.Mock(content="Analysis Result")
 
     mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
     mock_create_session = mocker.patch(
@@ -83,21 +106,87 @@ def test_analyze_text_without_title_generates_title(mocker, fake_agent):
         user=mock_user,
         title="Generated Title",
     )
-    fake_agent.analyze_text.assert_called_once_with(session_id=session_id, text=text)
+    fake_agent.generate_analysis.assert_called_once_with(text)
+    fake_agent.save_analysis.assert_called_once_with(
+        session_id=session_id,
+        text=text,
+        analysis=fake_agent.generate_analysis.return_value,
+    )
+    assert result == "Analysis Result"
+
+
+def test_analyze_text_generates_title_and_analysis_concurrently(mocker, fake_agent):
+    mock_user = User.objects.create_user(username="tester", password="pw")
+    # Each call waits for the other one to start, so this test would time out
+    # if the title and the analysis were generated one after the other.
+    barrier = threading.Barrier(2, timeout=5)
+    session_created = threading.Event()
+
+    def generate_title(text):
+        barrier.wait()
+        return mocker.Mock(content="Generated Title")
+
+    def generate_analysis(text):
+        barrier.wait()
+        # The session is created as soon as the title is available,
+        # without waiting for the analysis to finish.
+        assert session_created.wait(timeout=5)
+        return mocker.Mock(content="Analysis Result")
+
+    fake_agent.generate_title.side_effect = generate_title
+    fake_agent.generate_analysis.side_effect = generate_analysis
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mock_create_session = mocker.patch(
+        "mentor.assistant.tasks.ChatSession.objects.create",
+        side_effect=lambda **kwargs: session_created.set(),
+    )
+
+    result = tasks.analyze_text.run(
+        user_id=mock_user.id,
+        session_id=uuid.uuid4(),
+        text="Some educational text",
+        title=None,
+    )
+
+    mock_create_session.assert_called_once()
+    fake_agent.save_analysis.assert_called_once()
     assert result == "Analysis Result"
 
 
+def test_analyze_text_returns_none_if_analysis_fails(mocker, fake_agent):
+    mock_user = User.objects.create_user(username="tester", password="pw")
+    fake_agent.generate_analysis.return_value = None
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mocker.patch("mentor.assistant.tasks.ChatSession.objects.create")
+
+    result = tasks.analyze_text.run(
+        user_id=mock_user.id,
+        session_id=uuid.uuid4(),
+        text="Some text",
+        title="Title",
+    )
+
+    fake_agent.save_analysis.assert_not_called()
+    assert result is None
+
+
 def test_analyze_text_returns_none_if_title_generation_fails(mocker, fake_agent):
+    mock_user = User.objects.create_user(username="tester", password="pw")
     fake_agent.generate_title.return_value = None
     mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mock_create_session = mocker.patch(
+        "mentor.assistant.tasks.ChatSession.objects.create"
+    )
 
     result = tasks.analyze_text.run(
-        user_id=123,
+        user_id=mock_user.id,
         session_id=uuid.uuid4(),
         text="Some text",
         title=None,
     )
 
+    mock_create_session.assert_not_called()
+    fake_agent.save_analysis.assert_not_called()
     assert result is None
 
 
@@ -135,6 +224,39 @@ def test_follow_up_question_returns_content(mocker, fake_agent):
     assert result == "The follow-up answer"
 
 
+def test_follow_up_question_waits_for_its_turn(mocker, fake_agent):
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    sequencer = SessionSequencer(
+        client=fakeredis.FakeRedis(decode_responses=True),
+        turn_timeout_seconds=5,
+        ttl_seconds=60,
+        retry_seconds=0.5,
+    )
+    mocker.patch.object(tasks, "get_session_sequencer", return_value=sequencer)
+    retry = mocker.patch.object(
+        tasks.follow_up_question, "retry", side_effect=Retry("Not its turn")
+    )
+    session_id = uuid.uuid4()
+    first, second = sequencer.take_ticket(session_id), sequencer.take_ticket(session_id)
+
+    with pytest.raises(Retry):
+        tasks.follow_up_question.run(
+            session_id=session_id, question="Second", ticket=second
+        )
+
+    fake_agent.follow_up_question.assert_not_called()
+    retry_kwargs = retry.call_args.kwargs
+    assert retry_kwargs["countdown"] == 0.5
+    assert retry_kwargs["kwargs"]["ticket"] == second
+
+    tasks.follow_up_question.run(session_id=session_id, question="First", ticket=first)
+    tasks.follow_up_question.run(**retry_kwargs["kwargs"])
+
+    calls = fake_agent.follow_up_question.mock_calls
+    assert [call.kwargs["question"] for call in calls] == ["First", "Second"]
+    assert sequencer.get_done(session_id) == second
+
+
 def test_follow_up_question_returns_none_if_response_is_none(mocker, fake_agent):
     fake_agent.follow_up_question.return_value = None
 
@@ -151,6 +273,40 @@ def test_follow_up_question_returns_none_if_response_is_none(mocker, fake_agent)
     assert result is None
 
 
+def test_follow_up_question_schedules_history_summary(mocker, fake_agent, monkeypatch):
+    monkeypatch.setenv("HISTORY_STRATEGY", "summary")
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mock_delay = mocker.patch("mentor.assistant.tasks.summarize_session_history.delay")
+
+    session_id = uuid.uuid4()
+    tasks.follow_up_question.run(session_id=session_id, question="A question")
+
+    mock_delay.assert_called_once_with(session_id=session_id)
+
+
+def test_follow_up_question_does_not_summarize_with_other_strategies(
+    mocker, fake_agent, monkeypatch
+):
+    monkeypatch.setenv("HISTORY_STRATEGY", "last_turns")
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mock_delay = mocker.patch("mentor.assistant.tasks.summarize_session_history.delay")
+
+    tasks.follow_up_question.run(session_id=uuid.uuid4(), question="A question")
+
+    mock_delay.assert_not_called()
+
+
+def test_summarize_session_history_calls_agent(mocker, fake_agent):
+    fake_agent.summarize_history.return_value = "The summary"
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+
+    session_id = uuid.uuid4()
+    result = tasks.summarize_session_history.run(session_id=session_id)
+
+    fake_agent.summarize_history.assert_called_once_with(session_id=session_id)
+    assert result == "The summary"
+
+
 def test_get_task_status_success(mocker):
     task_id = str(uuid.uuid4())
     mock_async = mocker.patch("mentor.assistant.tasks.AsyncResult")
@@ -185,3 +341,334 @@ def test_get_task_status_failure(mocker):
         "result": None,
         "error": "Something went wrong",
     }
+
+
+def test_generate_session_title_updates_session(mocker, fake_agent):
+    user = User.objects.create_user(username="tester", password="pw")
+    session = ChatSession.objects.create(user=user, title="")
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+
+    result = tasks.generate_session_title.run(session_id=session.id, text="Some text")
+
+    fake_agent.generate_title.assert_called_once_with("Some text")
+    session.refresh_from_db()
+    assert session.title == "Generated Title"
+    assert result == "Generated Title"
+
+
+def test_generate_session_title_returns_none_if_generation_fails(mocker, fake_agent):
+    fake_agent.generate_title.return_value = None
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+
+    result = tasks.generate_session_title.run(session_id=uuid.uuid4(), text="Text")
+
+    assert result is None
+
+
+@pytest.fixture
+def eager_analysis(mocker, fake_agent):
+    """
+    Runs analyze_text eagerly, retries included, with the fake agent.
+    """
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mocker.patch.object(tasks, "get_redis_client", return_value=fakeredis.FakeRedis())
+    user = User.objects.create_user(username="tester", password="pw")
+
+    def run(**kwargs):
+        return tasks.analyze_text.apply(
+            kwargs={"user_id": user.id, "text": "Some text", **kwargs}
+        )
+
+    run.user = user
+    return run
+
+
+def test_analyze_text_retry_keeps_the_analysis(mocker, fake_agent, eager_analysis):
+    fake_agent.generate_title.side_effect = [
+        FakeProviderError("Down"),
+        mocker.Mock(content="Generated Title"),
+    ]
+    session_id = uuid.uuid4()
+
+    result = eager_analysis(session_id=session_id)
+
+    assert result.get() == "Analysis Result"
+    assert fake_agent.generate_title.call_count == 2
+    fake_agent.generate_analysis.assert_called_once_with("Some text")
+    assert ChatSession.objects.get(id=session_id).title == "Generated Title"
+    saved = fake_agent.save_analysis.call_args.kwargs["analysis"]
+    assert saved.content == "Analysis Result"
+
+
+def test_analyze_text_retry_reuses_the_session(fake_agent, eager_analysis):
+    fake_agent.generate_analysis.side_effect = [
+        FakeProviderError("Down"),
+        fake_agent.generate_analysis.return_value,
+    ]
+    session_id = uuid.uuid4()
+
+    result = eager_analysis(session_id=session_id)
+
+    assert result.get() == "Analysis Result"
+    fake_agent.generate_title.assert_called_once()
+    assert fake_agent.generate_analysis.call_count == 2
+    assert ChatSession.objects.filter(id=session_id).count() == 1
+
+
+def test_analyze_text_returns_the_saved_analysis(fake_agent, eager_analysis):
+    session = ChatSession.objects.create(user=eager_analysis.user, title="Title")
+    for message in (HumanMessage(content="Analyze"), AIMessage(content="Saved")):
+        ChatMessage.objects.create(session=session, message=message_to_dict(message))
+
+    result = eager_analysis(session_id=session.id)
+
+    assert result.get() == "Saved"
+    fake_agent.generate_title.assert_not_called()
+    fake_agent.generate_analysis.assert_not_called()
+    fake_agent.save_analysis.assert_not_called()
+
+
+def test_analyze_text_fails_after_max_retries(monkeypatch, fake_agent, eager_analysis):
+    monkeypatch.setenv("TASK_RETRY_MAX_RETRIES", "2")
+    fake_agent.generate_analysis.side_effect = FakeProviderError("Down")
+
+    result = eager_analysis(session_id=uuid.uuid4(), title="Title")
+
+    assert isinstance(result.result, FakeProviderError)
+    assert fake_agent.generate_analysis.call_count == 3
+
+
+def test_analyze_text_does_not_retry_other_errors(fake_agent, eager_analysis):
+    fake_agent.generate_analysis.side_effect = ValueError("Bad prompt")
+
+    result = eager_analysis(session_id=uuid.uuid4(), title="Title")
+
+    assert isinstance(result.result, ValueError)
+    fake_agent.generate_analysis.assert_called_once()
+
+
+@pytest.mark.parametrize("retries, expected", [(0, 2.0), (3, 16.0), (10, 60.0)])
+def test_get_retry_countdown_is_capped(mocker, retries, expected):
+    mock_uniform = mocker.patch(
+        "mentor.assistant.tasks.random.uniform", side_effect=lambda low, high: high
+    )
+
+    countdown = tasks.get_retry_countdown(retries, TaskRetrySettings())
+
+    assert countdown == expected
+    assert mock_uniform.call_args.args[0] == 0
+
+
+def test_prepare_worker_process_builds_chains_and_opens_pool(mocker, fake_agent):
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mock_open = mocker.patch("mentor.assistant.tasks.open_connection_pool")
+
+    tasks.prepare_worker_process()
+
+    fake_agent.build_chains.assert_called_once()
+    mock_open.assert_called_once()
+
+
+def test_prepare_worker_process_ignores_unsupported_platform(mocker, fake_agent):
+    fake_agent.build_chains.side_effect = NotImplementedError
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mock_open = mocker.patch("mentor.assistant.tasks.open_connection_pool")
+
+    tasks.prepare_worker_process()
+
+    mock_open.assert_called_once()
+
+
+def test_prepare_worker_process_ignores_pool_timeout(mocker, fake_agent):
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+    mocker.patch("mentor.assistant.tasks.open_connection_pool", side_effect=PoolTimeout)
+
+    tasks.prepare_worker_process()
+
+
+@pytest.mark.parametrize(
+    "pool_cls, expected",
+    [("threads", True), ("prefork", False), ("solo", False)],
+)
+def test_uses_thread_pool(mocker, pool_cls, expected):
+    worker = mocker.Mock(pool_cls=pool_cls)
+
+    assert tasks.uses_thread_pool(worker) is expected
+
+
+def test_prepare_thread_pool_worker_prepares_process(mocker, monkeypatch, caplog):
+    monkeypatch.setenv("PG_POOL_MAX_SIZE", "4")
+    mock_prepare = mocker.patch("mentor.assistant.tasks.prepare_worker_process")
+    worker = mocker.Mock(pool_cls="threads", concurrency=16)
+
+    tasks.prepare_thread_pool_worker(sender=worker)
+
+    mock_prepare.assert_called_once()
+    assert "lower than the worker concurrency" in caplog.text
+
+
+def test_prepare_thread_pool_worker_warns_of_small_hedging_executor(
+    mocker, monkeypatch, caplog
+):
+    monkeypatch.setenv("HEDGING_ENABLED", "true")
+    monkeypatch.setenv("HEDGING_MAX_WORKERS", "16")
+    monkeypatch.setenv("PG_POOL_MAX_SIZE", "16")
+    mocker.patch("mentor.assistant.tasks.prepare_worker_process")
+
+    tasks.prepare_thread_pool_worker(
+        sender=mocker.Mock(pool_cls="threads", concurrency=8)
+    )
+    assert "HEDGING_MAX_WORKERS" not in caplog.text
+
+    tasks.prepare_thread_pool_worker(
+        sender=mocker.Mock(pool_cls="threads", concurrency=16)
+    )
+    assert "HEDGING_MAX_WORKERS (16) is lower" in caplog.text
+
+
+def test_prepare_thread_pool_worker_ignores_prefork(mocker):
+    mock_prepare = mocker.patch("mentor.assistant.tasks.prepare_worker_process")
+    worker = mocker.Mock(pool_cls="prefork", concurrency=4)
+
+    tasks.prepare_thread_pool_worker(sender=worker)
+
+    mock_prepare.assert_not_called()
+
+
+def test_shutdown_thread_pool_worker_closes_pool(mocker):
+    mock_shutdown = mocker.patch("mentor.assistant.tasks.shutdown_worker_process")
+
+    tasks.shutdown_thread_pool_worker(sender=mocker.Mock(pool_cls="threads"))
+    tasks.shutdown_thread_pool_worker(sender=mocker.Mock(pool_cls="prefork"))
+
+    mock_shutdown.assert_called_once()
+
+
+def test_stamp_enqueued_at_adds_header(mocker):
+    mocker.patch("mentor.assistant.tasks.time.time", return_value=100.0)
+    headers = {}
+
+    tasks.stamp_enqueued_at(headers=headers)
+
+    assert headers == {"enqueued_at": 100.0}
+
+
+def test_task_metrics_track_queue_wait(mocker):
+    mocker.patch("mentor.assistant.tasks.time.time", return_value=102.5)
+    task = mocker.Mock()
+    task.request.enqueued_at = 100.0
+
+    tasks.start_task_metrics(task=task)
+    assert metrics.queue_wait_ms.get() == 2500.0
+
+    tasks.finish_task_metrics()
+    assert metrics.queue_wait_ms.get() is None
+
+
+def create_batch(titles):
+    user = User.objects.create_user(username="tester", password="pw")
+    batch = AnalysisBatch.objects.create(user=user)
+    for position, title in enumerate(titles):
+        session = ChatSession.objects.create(user=user, title=title)
+        AnalysisBatchItem.objects.create(
+            batch=batch, session=session, position=position
+        )
+    return batch
+
+
+def test_analyze_batch_updates_each_item(mocker, fake_agent):
+    batch = create_batch(["Given title", ""])
+    analysis = mocker.Mock(content="Analysis A")
+    fake_agent.batch_generate_analysis.return_value = iter(
+        [(1, ValueError("Provider down")), (0, analysis)]
+    )
+    fake_agent.batch_generate_titles.return_value = [
+        mocker.Mock(content="Generated Title")
+    ]
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+
+    result = tasks.analyze_batch.run(batch_id=batch.id, texts=["Text A", "Text B"])
+
+    first, second = batch.items.select_related("session")
+    assert first.status == AnalysisBatchItem.Status.COMPLETED
+    assert first.session.title == "Given title"
+    assert second.status == AnalysisBatchItem.Status.FAILED
+    assert "Provider down" in second.error
+    assert second.session.title == "Generated Title"
+    fake_agent.batch_generate_titles.assert_called_once_with(["Text B"], 8)
+    fake_agent.save_analysis.assert_called_once_with(
+        session_id=first.session_id, text="Text A", analysis=analysis
+    )
+    assert result == {"pending": 0, "completed": 1, "failed": 1}
+
+
+def test_analyze_batch_keeps_empty_title_when_generation_fails(mocker, fake_agent):
+    batch = create_batch([""])
+    fake_agent.batch_generate_analysis.return_value = iter(
+        [(0, mocker.Mock(content="Analysis"))]
+    )
+    fake_agent.batch_generate_titles.return_value = [ValueError("Provider down")]
+    mocker.patch("mentor.assistant.tasks.get_agent", return_value=fake_agent)
+
+    tasks.analyze_batch.run(batch_id=batch.id, texts=["Text"])
+
+    item = batch.items.select_related("session").get()
+    assert item.status == AnalysisBatchItem.Status.COMPLETED
+    assert item.session.title == ""
+
+
+def test_failed_analyze_batch_fails_pending_items(mocker):
+    batch = create_batch(["First", "Second"])
+    batch.items.filter(position=0).update(status=AnalysisBatchItem.Status.COMPLETED)
+    mocker.patch("mentor.assistant.tasks.get_agent", side_effect=RuntimeError("Down"))
+
+    tasks.analyze_batch.apply(kwargs={"batch_id": batch.id, "texts": ["A", "B"]})
+
+    first, second = batch.items.order_by("position")
+    assert first.status == AnalysisBatchItem.Status.COMPLETED
+    assert second.status == AnalysisBatchItem.Status.FAILED
+    assert "Down" in second.error
+
+
+@pytest.mark.parametrize(
+    "task, queue, priority",
+    [
+        (tasks.follow_up_question, "questions", 0),
+        (tasks.analyze_text, "analysis", 3),
+        (tasks.generate_session_title, "background", 6),
+        (tasks.summarize_session_history, "background", 6),
+        (tasks.analyze_batch, "batch", 9),
+    ],
+)
+def test_task_routes(task, queue, priority):
+    route = app.amqp.router.route({}, task.name)
+
+    assert route["queue"].name == queue
+    assert route["priority"] == priority
+    assert queue in TASK_QUEUES
+
+
+def test_get_task_statuses_in_one_round_trip(mocker):
+    client = fakeredis.FakeRedis()
+    backend = RedisBackend(app=app, url="redis://localhost:6379/0")
+    backend.client = client
+    mocker.patch.object(tasks, "get_result_backend", return_value=backend)
+    backend.store_result("done", "An answer", "SUCCESS")
+    backend.store_result("failed", RuntimeError("Provider error"), "FAILURE")
+    backend.store_result("running", None, "STARTED")
+    mget = mocker.spy(client, "mget")
+
+    statuses = tasks.get_task_statuses(["done", "failed", "running", "unknown"])
+
+    mget.assert_called_once()
+    assert statuses == [
+        {"task_id": "done", "status": "SUCCESS", "result": "An answer", "error": None},
+        {
+            "task_id": "failed",
+            "status": "FAILURE",
+            "result": None,
+            "error": "Provider error",
+        },
+        {"task_id": "running", "status": "STARTED", "result": None, "error": None},
+        {"task_id": "unknown", "status": "PENDING", "result": None, "error": None},
+    ]
@@ -1,12 +1,32 @@
+import threading
 import uuid
+from datetime import timedelta
 from unittest import mock
 
+import fakeredis
 import pytest
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
+from django.utils import timezone
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    message_to_dict,
+)
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from mentor.assistant.models import ChatSession
+from mentor.assistant.agent import get_analysis_messages
+from mentor.assistant.models import (
+    AnalysisBatch,
+    AnalysisBatchItem,
+    ChatMessage,
+    ChatSession,
+    LlmCall,
+)
+from mentor.assistant.sequencing import get_session_sequencer
+from mentor.assistant.settings import ChunkedAnalysisSettings
 
 pytestmark = pytest.mark.django_db
 
@@ -33,6 +53,15 @@ def session(user):
     return ChatSession.objects.create(user=user, title="Sample Session")
 
 
+async def fake_chunks(*contents):
+    for content in contents:
+        yield AIMessageChunk(content=content)
+
+
+async def collect(streaming_content):
+    return b"".join([part async for part in streaming_content])
+
+
 # ---------------------------
 # User Registration
 # ---------------------------
@@ -61,11 +90,11 @@ def test_user_registration_missing_fields(client):
 # ---------------------------
 
 
-@mock.patch("mentor.assistant.views.analyze_text.delay")
-def test_text_analysis_post_success(mock_delay, auth_client):
+@mock.patch("mentor.assistant.views.analyze_text.apply_async")
+def test_text_analysis_post_success(mock_apply_async, auth_client):
     mock_task = mock.Mock()
     mock_task.id = str(uuid.uuid4())
-    mock_delay.return_value = mock_task
+    mock_apply_async.return_value = mock_task
 
     url = "/api/analysis/"
     data = {"title": "New Text", "text": "Some educational content."}
@@ -74,7 +103,26 @@ def test_text_analysis_post_success(mock_delay, auth_client):
     assert response.status_code == status.HTTP_201_CREATED
     assert "session_id" in response.data
     assert "task_id" in response.data
-    mock_delay.assert_called_once()
+    assert response.data["estimated_tokens"] > 0
+    mock_apply_async.assert_called_once()
+    assert mock_apply_async.call_args.kwargs["headers"] == {
+        "estimated_tokens": response.data["estimated_tokens"]
+    }
+
+
+@mock.patch("mentor.assistant.views.analyze_text.apply_async")
+def test_text_analysis_post_too_long(mock_apply_async, auth_client, monkeypatch):
+    monkeypatch.setenv("CONTEXT_WINDOW_TOKENS", "1000")
+    monkeypatch.setenv("CONTEXT_RESERVED_OUTPUT_TOKENS", "500")
+    monkeypatch.setenv("CHUNKED_ANALYSIS_THRESHOLD_TOKENS", "0")
+
+    url = "/api/analysis/"
+    data = {"title": "Long Text", "text": "word " * 1000}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "at most 500" in response.data["error"]
+    mock_apply_async.assert_not_called()
 
 
 def test_text_analysis_post_invalid(auth_client):
@@ -92,6 +140,170 @@ def test_text_analysis_get_sessions(auth_client, session):
     assert any(s["session_id"] == str(session.id) for s in response.data)
 
 
+# ---------------------------
+# TextAnalysisStreamView
+# ---------------------------
+
+
+@mock.patch("mentor.assistant.views.generate_session_title.delay")
+@mock.patch("mentor.assistant.views.get_agent")
+def test_text_analysis_stream_success(mock_get_agent, mock_delay, auth_client, user):
+    mock_get_agent.return_value.astream_analyze_text.return_value = fake_chunks(
+        "Hello", " world"
+    )
+
+    url = "/api/analysis/stream/"
+    data = {"title": "New Text", "text": "Some educational content."}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == "text/event-stream"
+    body = async_to_sync(collect)(response.streaming_content).decode()
+    assert "event: token" in body
+    assert '"content": "Hello world"' in body
+
+    chat_session = ChatSession.objects.get(user=user)
+    assert chat_session.title == "New Text"
+    mock_get_agent.return_value.astream_analyze_text.assert_called_once_with(
+        session_id=chat_session.id, text="Some educational content."
+    )
+    mock_delay.assert_not_called()
+
+
+@mock.patch("mentor.assistant.views.generate_session_title.delay")
+@mock.patch("mentor.assistant.views.get_agent")
+def test_text_analysis_stream_without_title_generates_title(
+    mock_get_agent, mock_delay, auth_client, user
+):
+    mock_get_agent.return_value.astream_analyze_text.return_value = fake_chunks()
+
+    url = "/api/analysis/stream/"
+    data = {"text": "Some educational content."}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    chat_session = ChatSession.objects.get(user=user)
+    assert chat_session.title == ""
+    mock_delay.assert_called_once_with(
+        session_id=chat_session.id, text="Some educational content."
+    )
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_text_analysis_stream_failure_deletes_session(
+    mock_get_agent, auth_client, user
+):
+    async def failing_chunks():
+        yield AIMessageChunk(content="Partial")
+        raise RuntimeError("Provider error")
+
+    mock_get_agent.return_value.astream_analyze_text.return_value = failing_chunks()
+
+    url = "/api/analysis/stream/"
+    data = {"title": "New Text", "text": "Some educational content."}
+    response = auth_client.post(url, data=data, format="json")
+    body = async_to_sync(collect)(response.streaming_content).decode()
+
+    assert "event: error" in body
+    assert not ChatSession.objects.filter(user=user).exists()
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_text_analysis_stream_rejects_texts_that_need_chunking(
+    mock_get_agent, auth_client, monkeypatch
+):
+    monkeypatch.setenv("CHUNKED_ANALYSIS_THRESHOLD_TOKENS", "10")
+
+    url = "/api/analysis/stream/"
+    data = {"text": "word " * 100, "title": "Sample Title"}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "analyzes long texts in chunks" in response.data["detail"]
+    assert not ChatSession.objects.exists()
+    mock_get_agent.return_value.astream_analyze_text.assert_not_called()
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_text_analysis_stream_text_too_long(mock_get_agent, auth_client, monkeypatch):
+    monkeypatch.setenv("CONTEXT_WINDOW_TOKENS", "100")
+    monkeypatch.setenv("CONTEXT_RESERVED_OUTPUT_TOKENS", "0")
+
+    url = "/api/analysis/stream/"
+    data = {"text": "word " * 1000, "title": "Sample Title"}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Estimated prompt tokens" in response.data["detail"]
+    assert not ChatSession.objects.exists()
+    mock_get_agent.return_value.astream_analyze_text.assert_not_called()
+
+
+def test_text_analysis_stream_invalid(auth_client):
+    url = "/api/analysis/stream/"
+    response = auth_client.post(
+        url,
+        data={"title": "Only title"},
+        format="json",
+        HTTP_ACCEPT="text/event-stream",
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.content.startswith(b"event: error\n")
+
+
+# ---------------------------
+# TextAnalysisDirectView
+# ---------------------------
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_text_analysis_direct_success(mock_get_agent, auth_client, user):
+    agent = mock_get_agent.return_value
+    agent.agenerate_analysis = mock.AsyncMock(return_value=AIMessage(content="Nice"))
+    agent.agenerate_title = mock.AsyncMock()
+    agent.asave_analysis = mock.AsyncMock()
+
+    url = "/api/analysis/direct/"
+    data = {"title": "New Text", "text": "Some educational content."}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_201_CREATED
+    chat_session = ChatSession.objects.get(user=user)
+    assert response.data == {
+        "session_id": str(chat_session.id),
+        "title": "New Text",
+        "content": "Nice",
+    }
+    agent.agenerate_title.assert_not_called()
+    agent.asave_analysis.assert_awaited_once_with(
+        session_id=chat_session.id,
+        text="Some educational content.",
+        analysis=AIMessage(content="Nice"),
+    )
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_text_analysis_direct_generates_title(mock_get_agent, auth_client, user):
+    agent = mock_get_agent.return_value
+    agent.agenerate_analysis = mock.AsyncMock(return_value=AIMessage(content="Nice"))
+    agent.agenerate_title = mock.AsyncMock(return_value=AIMessage(content="A Title"))
+    agent.asave_analysis = mock.AsyncMock()
+
+    url = "/api/analysis/direct/"
+    response = auth_client.post(url, data={"text": "Some text."}, format="json")
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["title"] == "A Title"
+    assert ChatSession.objects.get(user=user).title == "A Title"
+    agent.agenerate_title.assert_awaited_once_with("Some text.")
+
+
+def test_text_analysis_direct_invalid(auth_client):
+    url = "/api/analysis/direct/"
+    response = auth_client.post(url, data={"title": "Only title"}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 # ---------------------------
 # SessionManagementView
 # ---------------------------
@@ -128,18 +340,98 @@ def test_session_management_delete_not_found(auth_client):
 # ---------------------------
 
 
-@mock.patch("mentor.assistant.views.follow_up_question.delay")
-def test_follow_up_question_success(mock_delay, auth_client, session):
+@mock.patch("mentor.assistant.views.follow_up_question.apply_async")
+def test_follow_up_question_success(mock_apply_async, auth_client, session):
     mock_task = mock.Mock()
     mock_task.id = str(uuid.uuid4())
-    mock_delay.return_value = mock_task
+    mock_apply_async.return_value = mock_task
 
     url = "/api/question/"
     data = {"session_id": str(session.id), "question": "What is photosynthesis?"}
     response = auth_client.post(url, data=data, format="json")
     assert response.status_code == status.HTTP_201_CREATED
     assert "task_id" in response.data
-    mock_delay.assert_called_once()
+    assert response.data["estimated_tokens"] > 0
+    mock_apply_async.assert_called_once()
+
+
+@mock.patch("mentor.assistant.views.follow_up_question.apply_async")
+def test_follow_up_question_takes_a_session_ticket(
+    mock_apply_async, auth_client, session, mocker
+):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    mocker.patch("mentor.assistant.sequencing.get_redis_client", return_value=client)
+    mock_apply_async.return_value.id = str(uuid.uuid4())
+
+    url = "/api/question/"
+    for question in ("First?", "Second?"):
+        data = {"session_id": str(session.id), "question": question}
+        response = auth_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+
+    tickets = [call.kwargs["kwargs"]["ticket"] for call in mock_apply_async.mock_calls]
+    assert tickets == [1, 2]
+
+
+@mock.patch("mentor.assistant.views.follow_up_question.apply_async")
+def test_follow_up_question_releases_its_ticket_if_not_queued(
+    mock_apply_async, auth_client, session, mocker
+):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    mocker.patch("mentor.assistant.sequencing.get_redis_client", return_value=client)
+    mock_apply_async.side_effect = ConnectionError("Broker down")
+    data = {"session_id": str(session.id), "question": "First?"}
+
+    with pytest.raises(ConnectionError):
+        auth_client.post("/api/question/", data=data, format="json")
+
+    sequencer = get_session_sequencer()
+    assert sequencer.get_done(session.id) == 1
+    assert sequencer.is_turn(session.id, sequencer.take_ticket(session.id), 0)
+
+
+@mock.patch("mentor.assistant.views.follow_up_question.apply_async")
+def test_follow_up_question_history_too_long(
+    mock_apply_async, auth_client, session, monkeypatch
+):
+    monkeypatch.setenv("CONTEXT_WINDOW_TOKENS", "1000")
+    monkeypatch.setenv("CONTEXT_RESERVED_OUTPUT_TOKENS", "0")
+    ChatMessage.objects.create(
+        session=session,
+        message=message_to_dict(HumanMessage(content="word " * 1000)),
+    )
+
+    url = "/api/question/"
+    data = {"session_id": str(session.id), "question": "What is photosynthesis?"}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_apply_async.assert_not_called()
+
+
+@mock.patch("mentor.assistant.views.follow_up_question.apply_async")
+def test_follow_up_question_on_chunked_session(
+    mock_apply_async, auth_client, session, monkeypatch
+):
+    monkeypatch.setenv("CONTEXT_WINDOW_TOKENS", "1000")
+    monkeypatch.setenv("CONTEXT_RESERVED_OUTPUT_TOKENS", "0")
+    monkeypatch.setenv("CHUNKED_ANALYSIS_THRESHOLD_TOKENS", "500")
+    monkeypatch.setenv("CHUNKED_ANALYSIS_CHUNK_TOKENS", "200")
+    mock_apply_async.return_value.id = str(uuid.uuid4())
+    # The history saved after the chunked analysis of a text too long for a call
+    for message in get_analysis_messages(
+        text="word " * 2000,
+        analysis=AIMessage(content="Merged analysis"),
+        settings=ChunkedAnalysisSettings(),
+    ):
+        ChatMessage.objects.create(session=session, message=message_to_dict(message))
+
+    url = "/api/question/"
+    data = {"session_id": str(session.id), "question": "What is photosynthesis?"}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_201_CREATED
+    mock_apply_async.assert_called_once()
 
 
 def test_follow_up_question_invalid_session(auth_client):
@@ -149,6 +441,123 @@ def test_follow_up_question_invalid_session(auth_client):
     assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
+# ---------------------------
+# FollowUpQuestionStreamView
+# ---------------------------
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_follow_up_question_stream_success(mock_get_agent, auth_client, session):
+    mock_get_agent.return_value.astream_follow_up_question.return_value = fake_chunks(
+        "An answer"
+    )
+
+    url = "/api/question/stream/"
+    data = {"session_id": str(session.id), "question": "What is photosynthesis?"}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    body = async_to_sync(collect)(response.streaming_content).decode()
+    assert f'"session_id": "{session.id}", "content": "An answer"' in body
+    mock_get_agent.return_value.astream_follow_up_question.assert_called_once_with(
+        session_id=session.id, question="What is photosynthesis?"
+    )
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_follow_up_question_stream_waits_for_the_previous_questions(
+    mock_get_agent, auth_client, session, mocker, monkeypatch
+):
+    monkeypatch.setenv("SESSION_ORDERING_RETRY_SECONDS", "0.01")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    mocker.patch("mentor.assistant.sequencing.get_redis_client", return_value=client)
+    sequencer = get_session_sequencer()
+    # A queued question of the session is being answered
+    ticket = sequencer.take_ticket(session.id)
+    done_when_answered = []
+
+    def answer(session_id, question):
+        done_when_answered.append(sequencer.get_done(session_id))
+        return fake_chunks("An answer")
+
+    mock_get_agent.return_value.astream_follow_up_question.side_effect = answer
+
+    url = "/api/question/stream/"
+    data = {"session_id": str(session.id), "question": "What is photosynthesis?"}
+    response = auth_client.post(url, data=data, format="json")
+    threading.Timer(0.1, sequencer.finish, args=(session.id, ticket)).start()
+    body = async_to_sync(collect)(response.streaming_content).decode()
+
+    assert '"content": "An answer"' in body
+    assert done_when_answered == [1]
+    assert sequencer.get_done(session.id) == 2
+
+
+def test_follow_up_question_stream_invalid_session(auth_client):
+    url = "/api/question/stream/"
+    data = {"session_id": str(uuid.uuid4()), "question": "Invalid question."}
+    response = auth_client.post(url, data=data, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# ---------------------------
+# FollowUpQuestionDirectView
+# ---------------------------
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_follow_up_question_direct_success(mock_get_agent, auth_client, session):
+    agent = mock_get_agent.return_value
+    agent.afollow_up_question = mock.AsyncMock(
+        return_value=AIMessage(content="An answer")
+    )
+
+    url = "/api/question/direct/"
+    data = {"session_id": str(session.id), "question": "What is photosynthesis?"}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {"session_id": str(session.id), "content": "An answer"}
+    agent.afollow_up_question.assert_awaited_once_with(
+        session_id=session.id, question="What is photosynthesis?"
+    )
+
+
+@mock.patch("mentor.assistant.views.get_agent")
+def test_follow_up_question_direct_waits_for_the_previous_questions(
+    mock_get_agent, auth_client, session, mocker, monkeypatch
+):
+    monkeypatch.setenv("SESSION_ORDERING_RETRY_SECONDS", "0.01")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    mocker.patch("mentor.assistant.sequencing.get_redis_client", return_value=client)
+    sequencer = get_session_sequencer()
+    # A queued question of the session is being answered
+    ticket = sequencer.take_ticket(session.id)
+    done_when_answered = []
+
+    async def answer(session_id, question):
+        done_when_answered.append(sequencer.get_done(session_id))
+        return AIMessage(content="An answer")
+
+    mock_get_agent.return_value.afollow_up_question = mock.AsyncMock(side_effect=answer)
+    threading.Timer(0.1, sequencer.finish, args=(session.id, ticket)).start()
+
+    url = "/api/question/direct/"
+    data = {"session_id": str(session.id), "question": "What is photosynthesis?"}
+    response = auth_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert done_when_answered == [1]
+    assert sequencer.get_done(session.id) == 2
+
+
+def test_follow_up_question_direct_invalid_session(auth_client):
+    url = "/api/question/direct/"
+    data = {"session_id": str(uuid.uuid4()), "question": "Invalid question."}
+    response = auth_client.post(url, data=data, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
 # ---------------------------
 # TaskStatusView
 # ---------------------------
@@ -187,3 +596,295 @@ def test_task_status_failure(mock_async, auth_client):
     assert response.status_code == 500
     assert response.data["status"] == "FAILURE"
     assert response.data["error"] == "Something went wrong"
+
+
+@mock.patch("mentor.assistant.views.wait_for_task")
+@mock.patch("mentor.assistant.views.get_async_redis_client")
+@mock.patch("mentor.assistant.views.AsyncResult")
+def test_task_status_waits_for_task(
+    mock_async, mock_client, mock_wait, auth_client, monkeypatch
+):
+    monkeypatch.setenv("TASK_STATUS_MAX_WAIT_SECONDS", "10")
+    mock_async.return_value.status = "SUCCESS"
+    mock_async.return_value.result = "An answer"
+    task_id = str(uuid.uuid4())
+
+    response = auth_client.get(f"/api/task/{task_id}/?wait=60")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["result"] == "An answer"
+    mock_wait.assert_awaited_once()
+    assert mock_wait.call_args.kwargs["timeout"] == 10
+    assert mock_wait.call_args.kwargs["channel"] == f"celery-task-meta-{task_id}"
+
+
+@mock.patch("mentor.assistant.views.wait_for_task")
+@mock.patch("mentor.assistant.views.AsyncResult")
+def test_task_status_without_wait(mock_async, mock_wait, auth_client):
+    mock_async.return_value.status = "STARTED"
+
+    response = auth_client.get(f"/api/task/{uuid.uuid4()}/")
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    mock_wait.assert_not_called()
+
+
+@pytest.mark.parametrize("wait", ["-1", "soon", "nan", "inf"])
+def test_task_status_invalid_wait(auth_client, wait):
+    response = auth_client.get(f"/api/task/{uuid.uuid4()}/?wait={wait}")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# ---------------------------
+# TaskStatusBatchView
+# ---------------------------
+
+
+@mock.patch("mentor.assistant.views.get_task_statuses")
+def test_task_status_batch(mock_statuses, auth_client):
+    task_ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    mock_statuses.return_value = [
+        {"task_id": task_ids[0], "status": "SUCCESS", "result": "A", "error": None},
+        {"task_id": task_ids[1], "status": "PENDING", "result": None, "error": None},
+    ]
+
+    response = auth_client.post(
+        "/api/task/batch/", data={"task_ids": task_ids}, format="json"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["status"] for item in response.data] == ["SUCCESS", "PENDING"]
+    assert response.data[0]["task_id"] == task_ids[0]
+    mock_statuses.assert_called_once_with(task_ids)
+
+
+def test_task_status_batch_invalid(auth_client):
+    response = auth_client.post(
+        "/api/task/batch/", data={"task_ids": ["not-a-uuid"]}, format="json"
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# ---------------------------
+# TaskEventsView
+# ---------------------------
+
+
+@mock.patch("mentor.assistant.views.get_task_status")
+@mock.patch("mentor.assistant.views.get_async_redis_client")
+def test_task_events_sends_finished_tasks_first(
+    mock_client, mock_get_task_status, auth_client
+):
+    mock_client.return_value = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    mock_get_task_status.side_effect = lambda task_id: {
+        "task_id": task_id,
+        "status": "SUCCESS" if task_id == "done" else "PENDING",
+        "result": "An answer" if task_id == "done" else None,
+        "error": None,
+    }
+
+    response = auth_client.get("/api/task/events/?task_id=done&task_id=pending")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == "text/event-stream"
+
+    async def read_first_event():
+        events = aiter(response.streaming_content)
+        first = await anext(events)
+        await events.aclose()
+        return first
+
+    event = async_to_sync(read_first_event)().decode()
+    assert event.startswith("event: task\n")
+    assert '"task_id": "done"' in event
+    assert '"result": "An answer"' in event
+
+
+# ---------------------------
+# ConnectionPoolStatsView
+# ---------------------------
+
+
+@mock.patch("mentor.assistant.views.get_connection_pool_stats")
+def test_connection_pool_stats_admin(mock_stats, user):
+    mock_stats.return_value = {"sync": {"pool_size": 2}}
+    user.is_staff = True
+    user.save()
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.get("/api/stats/connection-pools/")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {"sync": {"pool_size": 2}}
+
+
+def test_connection_pool_stats_requires_admin(auth_client):
+    response = auth_client.get("/api/stats/connection-pools/")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@mock.patch("mentor.assistant.views.get_hedging_stats")
+def test_hedging_stats_admin(mock_stats, user):
+    mock_stats.return_value.get_stats.return_value = {"calls": 10, "hedges": 2}
+    user.is_staff = True
+    user.save()
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.get("/api/stats/hedging/")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {"calls": 10, "hedges": 2}
+
+
+def test_llm_call_stats_admin(user):
+    LlmCall.objects.create(
+        prompt_name="follow_up", provider="openai", model="gpt", latency_ms=100.0
+    )
+    LlmCall.objects.create(
+        prompt_name="follow_up",
+        provider="openai",
+        model="gpt",
+        latency_ms=300.0,
+        error="TimeoutError()",
+    )
+    user.is_staff = True
+    user.save()
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.get("/api/stats/llm-calls/", {"hours": 1})
+
+    assert response.status_code == status.HTTP_200_OK
+    [stats] = response.data
+    assert stats["prompt_name"] == "follow_up"
+    assert stats["calls"] == 2
+    assert stats["errors"] == 1
+    assert stats["avg_latency_ms"] == 200.0
+
+
+def test_llm_call_stats_rejects_invalid_hours(user):
+    user.is_staff = True
+    user.save()
+    client = APIClient()
+    client.force_authenticate(user=user)
+
+    response = client.get("/api/stats/llm-calls/", {"hours": "abc"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_llm_call_stats_requires_admin(auth_client):
+    response = auth_client.get("/api/stats/llm-calls/")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+# ---------------------------
+# Bulk Text Analysis
+# ---------------------------
+
+
+@mock.patch("mentor.assistant.views.analyze_batch.delay")
+def test_bulk_analysis_creates_sessions_and_task(mock_delay, auth_client, user):
+    mock_delay.return_value.id = str(uuid.uuid4())
+    items = [{"title": "First", "text": "Text A"}, {"text": "Text B"}]
+
+    response = auth_client.post("/api/analysis/bulk/", {"items": items}, format="json")
+
+    assert response.status_code == status.HTTP_201_CREATED
+    batch = AnalysisBatch.objects.get(id=response.data["batch_id"])
+    assert batch.user == user
+    batch_items = list(batch.items.select_related("session"))
+    assert [str(item.session_id) for item in batch_items] == [
+        str(session_id) for session_id in response.data["session_ids"]
+    ]
+    assert [item.session.title for item in batch_items] == ["First", ""]
+    mock_delay.assert_called_once_with(batch_id=batch.id, texts=["Text A", "Text B"])
+
+
+@mock.patch("mentor.assistant.views.analyze_batch.delay")
+def test_bulk_analysis_rejects_too_many_items(mock_delay, auth_client, monkeypatch):
+    monkeypatch.setenv("BULK_ANALYSIS_MAX_ITEMS", "1")
+    items = [{"text": "Text A"}, {"text": "Text B"}]
+
+    response = auth_client.post("/api/analysis/bulk/", {"items": items}, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_delay.assert_not_called()
+    assert not AnalysisBatch.objects.exists()
+
+
+def test_analysis_batch_progress(auth_client, user, session):
+    batch = AnalysisBatch.objects.create(user=user)
+    AnalysisBatchItem.objects.create(
+        batch=batch,
+        session=session,
+        position=0,
+        status=AnalysisBatchItem.Status.COMPLETED,
+    )
+    other_session = ChatSession.objects.create(user=user, title="")
+    AnalysisBatchItem.objects.create(batch=batch, session=other_session, position=1)
+
+    response = auth_client.get(f"/api/analysis/bulk/{batch.id}/")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["total"] == 2
+    assert response.data["completed"] == 1
+    assert response.data["pending"] == 1
+    assert response.data["failed"] == 0
+    assert [item["status"] for item in response.data["items"]] == [
+        "completed",
+        "pending",
+    ]
+    assert response.data["items"][0]["title"] == "Sample Session"
+
+
+def test_analysis_batch_fails_items_after_timeout(auth_client, user, monkeypatch):
+    monkeypatch.setenv("BULK_ANALYSIS_TIMEOUT_SECONDS", "60")
+    batch = AnalysisBatch.objects.create(user=user)
+    session = ChatSession.objects.create(user=user, title="")
+    AnalysisBatchItem.objects.create(batch=batch, session=session, position=0)
+
+    response = auth_client.get(f"/api/analysis/bulk/{batch.id}/")
+    assert response.data["pending"] == 1
+
+    AnalysisBatch.objects.filter(id=batch.id).update(
+        created_at=timezone.now() - timedelta(minutes=2)
+    )
+    response = auth_client.get(f"/api/analysis/bulk/{batch.id}/")
+    assert response.data["pending"] == 0
+    assert response.data["failed"] == 1
+
+
+@mock.patch("mentor.assistant.views.follow_up_question.apply_async")
+def test_bulk_sessions_are_hidden_until_analyzed(
+    mock_apply_async, auth_client, user, session
+):
+    mock_apply_async.return_value.id = str(uuid.uuid4())
+    batch = AnalysisBatch.objects.create(user=user)
+    item = AnalysisBatchItem.objects.create(batch=batch, session=session, position=0)
+    data = {"session_id": str(session.id), "question": "Why?"}
+
+    assert auth_client.get("/api/analysis/").data == []
+    response = auth_client.post("/api/question/", data=data, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_apply_async.assert_not_called()
+
+    item.status = AnalysisBatchItem.Status.COMPLETED
+    item.save()
+
+    assert len(auth_client.get("/api/analysis/").data) == 1
+    response = auth_client.post("/api/question/", data=data, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+def test_analysis_batch_of_other_user_is_invalid(auth_client):
+    other_user = User.objects.create_user(username="other", password="password")
+    batch = AnalysisBatch.objects.create(user=other_user)
+
+    response = auth_client.get(f"/api/analysis/bulk/{batch.id}/")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -1,17 +1,39 @@
 from django.urls import path
 
 from mentor.assistant.views import (
+    AnalysisBatchView,
+    ConnectionPoolStatsView,
+    FollowUpQuestionDirectView,
+    FollowUpQuestionStreamView,
     FollowUpQuestionView,
+    HedgingStatsView,
+    LlmCallStatsView,
     SessionManagementView,
+    TaskEventsView,
+    TaskStatusBatchView,
     TaskStatusView,
+    TextAnalysisBulkView,
+    TextAnalysisDirectView,
+    TextAnalysisStreamView,
     TextAnalysisView,
     UserRegistrationView,
 )
 
 urlpatterns = [
     path("analysis/", TextAnalysisView.as_view()),
+    path("analysis/stream/", TextAnalysisStreamView.as_view()),
+    path("analysis/direct/", TextAnalysisDirectView.as_view()),
+    path("analysis/bulk/", TextAnalysisBulkView.as_view()),
+    path("analysis/bulk/<str:batch_id>/", AnalysisBatchView.as_view()),
     path("analysis/<str:session_id>/", SessionManagementView.as_view()),
     path("question/", FollowUpQuestionView.as_view()),
+    path("question/stream/", FollowUpQuestionStreamView.as_view()),
+    path("question/direct/", FollowUpQuestionDirectView.as_view()),
+    path("task/events/", TaskEventsView.as_view()),
+    path("task/batch/", TaskStatusBatchView.as_view()),
     path("task/<str:task_id>/", TaskStatusView.as_view()),
     path("register/", UserRegistrationView.as_view()),
+    path("stats/connection-pools/", ConnectionPoolStatsView.as_view()),
+    path("stats/llm-calls/", LlmCallStatsView.as_view()),
+    path("stats/hedging/", HedgingStatsView.as_view()),
 ]
@@ -1,15 +1,46 @@
+import asyncio
+import inspect
+import math
+from collections.abc import AsyncIterator
+from datetime import timedelta
 from uuid import UUID, uuid4
 
+from asgiref.sync import sync_to_async
 from celery.result import AsyncResult
 from django.contrib.auth.models import User
-from drf_spectacular.utils import OpenApiResponse, extend_schema
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
+from langchain_core.messages import BaseMessageChunk
 from rest_framework import generics, status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from mentor.assistant.models import ChatSession
+from mentor.assistant.agent import get_agent, get_connection_pool_stats
+from mentor.assistant.budget import (
+    ContextBudgetExceeded,
+    check_context_budget,
+    estimate_analysis,
+    estimate_follow_up_question,
+)
+from mentor.assistant.chunking import needs_chunking
+from mentor.assistant.events import (
+    get_async_redis_client,
+    stream_task_events,
+    wait_for_task,
+)
+from mentor.assistant.hedging import get_hedging_stats
+from mentor.assistant.metrics import get_llm_call_stats
+from mentor.assistant.models import AnalysisBatch, AnalysisBatchItem, ChatSession
+from mentor.assistant.sequencing import get_session_sequencer, session_turn
 from mentor.assistant.serializers.chat import (
+    AnalysisBatchResponseSerializer,
+    AnalysisResponseSerializer,
+    AnswerResponseSerializer,
+    BulkTextAnalysisRequestSerializer,
     QuestionRequestSerializer,
     SessionDetailsResponseSerializer,
     SessionResponseSerializer,
@@ -20,10 +51,34 @@ from mentor.assistant.serializers.manage import (
     UserRegistrationSerializer,
 )
 from mentor.assistant.serializers.task import (
+    BatchTaskCreatedResponseSerializer,
     TaskCreatedResponseSerializer,
+    TaskEventSerializer,
+    TaskStatusBatchRequestSerializer,
     TaskStatusResponseSerializer,
 )
-from mentor.assistant.tasks import analyze_text, follow_up_question
+from mentor.assistant.settings import (
+    BulkAnalysisSettings,
+    ChunkedAnalysisSettings,
+    ContextBudgetSettings,
+    TaskStatusSettings,
+)
+from mentor.assistant.streaming import (
+    ServerSentEventRenderer,
+    get_event_stream_response,
+    stream_answer_events,
+)
+from mentor.assistant.tasks import (
+    analyze_batch,
+    analyze_text,
+    fail_pending_batch_items,
+    follow_up_question,
+    generate_session_title,
+    get_task_channel,
+    get_task_status,
+    get_task_statuses,
+    schedule_history_summary,
+)
 
 
 def get_invalid_session_response(user: User) -> Response:
@@ -36,18 +91,86 @@ def get_invalid_session_response(user: User) -> Response:
     return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
 
 
-def get_task_created_response(session_id: UUID | str, task_id: UUID | str) -> Response:
+def get_context_budget_response(error: ContextBudgetExceeded) -> Response:
+    data = ErrorResponseSerializer().to_representation(
+        {
+            "error": str(error),
+            "detail": f"Estimated prompt tokens: {error.estimate.max_call_tokens}.",
+            "code": status.HTTP_400_BAD_REQUEST,
+        }
+    )
+    return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+
+def get_chunked_text_stream_response() -> Response:
+    data = ErrorResponseSerializer().to_representation(
+        {
+            "error": "The text is too long to be analyzed in a single call, so its "
+            + "analysis can't be streamed.",
+            "detail": "Send it to the text analysis route, which analyzes long texts "
+            + "in chunks.",
+            "code": status.HTTP_400_BAD_REQUEST,
+        }
+    )
+    return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+
+def get_task_created_response(
+    session_id: UUID | str, task_id: UUID | str, estimated_tokens: int | None = None
+) -> Response:
     return Response(
         data=TaskCreatedResponseSerializer().to_representation(
             {
                 "session_id": session_id,
                 "task_id": task_id,
+                "estimated_tokens": estimated_tokens,
             }
         ),
         status=status.HTTP_201_CREATED,
     )
 
 
+class AsyncAPIView(APIView):
+    """
+    APIView with coroutine handlers (e.g. `async def post`). Under ASGI, requests
+    are served on the event loop, so waiting on the language model does not hold
+    a worker thread. Authentication, permissions and throttling may query the
+    database, so they run in a thread.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+async def is_user_session(user: User, session_id: UUID) -> bool:
+    return (
+        await ChatSession.objects.analyzed().filter(user=user, id=session_id).aexists()
+    )
+
+
 @extend_schema(
     summary="Register a new user",
     description="Register a new user with a username, email (optional), and password.",
@@ -70,7 +193,7 @@ class TextAnalysisView(APIView):
         operation_id="analysis_list",
     )
     def get(self, request):
-        user_sessions = ChatSession.objects.filter(user=request.user)
+        user_sessions = ChatSession.objects.analyzed().filter(user=request.user)
         serializer = SessionResponseSerializer(user_sessions, many=True)
 
         return Response(
@@ -85,29 +208,260 @@ class TextAnalysisView(APIView):
                 response=TaskCreatedResponseSerializer,
                 description="Task created successfully.",
             ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorResponseSerializer,
+                description="Text too long for the context window of the model.",
+            ),
         },
         summary="Analyze a text",
         description="Analyze the provided text using a language model. "
         + "Optionally, you can provide a title for the text. If no title is provided, "
         + "one will be automatically generated by the language model."
         + "An async task will be created to process the text, and the task ID "
-        + "will be returned. To consult on the task status, use the task route.",
+        + "will be returned, with the estimated prompt tokens of the task. "
+        + "To consult on the task status, use the task route.",
     )
     def post(self, request):
         serializer = TextAnalysisRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
+        text = serializer.validated_data.get("text")
+        title = serializer.validated_data.get("title")
+        budget_settings = ContextBudgetSettings()
+        estimate = estimate_analysis(text, budget_settings, generate_title=not title)
+        try:
+            check_context_budget(estimate, budget_settings)
+        except ContextBudgetExceeded as e:
+            return get_context_budget_response(e)
+
         # Text analysis is always the start of a conversation,
         # so we generate a new session ID here
         session_id = uuid4()
+        result = analyze_text.apply_async(
+            kwargs={
+                "user_id": request.user.id,
+                "session_id": session_id,
+                "text": text,
+                "title": title,
+            },
+            headers={"estimated_tokens": estimate.tokens},
+        )
+        return get_task_created_response(
+            session_id=session_id, task_id=result.id, estimated_tokens=estimate.tokens
+        )
+
+
+class TextAnalysisStreamView(APIView):
+    renderer_classes = [JSONRenderer, ServerSentEventRenderer]
+
+    @extend_schema(
+        request=TextAnalysisRequestSerializer,
+        responses={
+            (status.HTTP_200_OK, "text/event-stream"): OpenApiResponse(
+                description="Stream of Server-Sent Events: a `session` event with "
+                + "the session ID, one `token` event per generated chunk, and a "
+                + "final `done` event with the full analysis (or an `error` event).",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorResponseSerializer,
+                description="Text too long to be analyzed in a single call, or for "
+                + "the context window of the model.",
+            ),
+        },
+        summary="Analyze a text (streaming)",
+        description="Analyze the provided text using a language model and stream "
+        + "the analysis back as it is generated, using Server-Sent Events. "
+        + "If no title is provided, one is generated in the background and stored "
+        + "in the session once ready. Only the complete analysis is stored in the "
+        + "session history, and the session is deleted if the analysis fails or "
+        + "the client disconnects before it completes. Texts long enough to be "
+        + "analyzed in chunks can't be streamed. Streaming requires the API "
+        + "to be served through ASGI.",
+    )
+    def post(self, request):
+        serializer = TextAnalysisRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        text = serializer.validated_data.get("text")
         title = serializer.validated_data.get("title")
-        result = analyze_text.delay(
-            user_id=request.user.id,
-            session_id=session_id,
-            text=serializer.validated_data.get("text"),
-            title=title,
+        if needs_chunking(text, ChunkedAnalysisSettings()):
+            return get_chunked_text_stream_response()
+        budget_settings = ContextBudgetSettings()
+        estimate = estimate_analysis(text, budget_settings, generate_title=not title)
+        try:
+            check_context_budget(estimate, budget_settings)
+        except ContextBudgetExceeded as e:
+            return get_context_budget_response(e)
+
+        chat_session = ChatSession.objects.create(user=request.user, title=title or "")
+        if not title:
+            # The title is not needed to stream the analysis, so it is generated
+            # in the background instead of delaying the first token.
+            generate_session_title.delay(session_id=chat_session.id, text=text)
+
+        chunks = get_agent().astream_analyze_text(session_id=chat_session.id, text=text)
+
+        async def delete_session() -> None:
+            # The analysis wasn't saved, so the session would stay empty
+            await ChatSession.objects.filter(id=chat_session.id).adelete()
+
+        return get_event_stream_response(
+            stream_answer_events(
+                session_id=chat_session.id, chunks=chunks, on_incomplete=delete_session
+            )
+        )
+
+
+class TextAnalysisDirectView(AsyncAPIView):
+    @extend_schema(
+        request=TextAnalysisRequestSerializer,
+        responses={
+            status.HTTP_201_CREATED: OpenApiResponse(
+                response=AnalysisResponseSerializer,
+                description="Text analyzed successfully.",
+            ),
+        },
+        summary="Analyze a text (direct)",
+        description="Analyze the provided text using a language model and return "
+        + "the analysis in the response, without creating an async task. "
+        + "If no title is provided, it is generated concurrently with the analysis. "
+        + "Requires the API to be served through ASGI to handle many concurrent "
+        + "requests.",
+    )
+    async def post(self, request):
+        serializer = TextAnalysisRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        text = serializer.validated_data.get("text")
+        title = serializer.validated_data.get("title")
+        agent = get_agent()
+        if title:
+            analysis = await agent.agenerate_analysis(text)
+        else:
+            analysis, generated_title = await asyncio.gather(
+                agent.agenerate_analysis(text), agent.agenerate_title(text)
+            )
+            title = generated_title.content
+
+        chat_session = await ChatSession.objects.acreate(user=request.user, title=title)
+        await agent.asave_analysis(
+            session_id=chat_session.id, text=text, analysis=analysis
+        )
+        return Response(
+            data=AnalysisResponseSerializer().to_representation(
+                {
+                    "session_id": chat_session.id,
+                    "title": title,
+                    "content": analysis.content,
+                }
+            ),
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class TextAnalysisBulkView(APIView):
+    @extend_schema(
+        request=BulkTextAnalysisRequestSerializer,
+        responses={
+            status.HTTP_201_CREATED: OpenApiResponse(
+                response=BatchTaskCreatedResponseSerializer,
+                description="Task created successfully.",
+            ),
+        },
+        summary="Analyze many texts",
+        description="Analyze a list of texts, each with an optional title, in a "
+        + "single async task. A session is created for each text right away, and "
+        + "the model calls of all the texts run concurrently. The batch ID "
+        + "returned can be used to check the progress of each text with the bulk "
+        + "analysis route. The session of a text is only listed and open to "
+        + "follow-up questions once its analysis completed.",
+    )
+    def post(self, request):
+        serializer = BulkTextAnalysisRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = serializer.validated_data["items"]
+        with transaction.atomic():
+            batch = AnalysisBatch.objects.create(user=request.user)
+            sessions = ChatSession.objects.bulk_create(
+                [
+                    ChatSession(user=request.user, title=item.get("title") or "")
+                    for item in items
+                ]
+            )
+            AnalysisBatchItem.objects.bulk_create(
+                [
+                    AnalysisBatchItem(batch=batch, session=session, position=position)
+                    for position, session in enumerate(sessions)
+                ]
+            )
+
+        result = analyze_batch.delay(
+            batch_id=batch.id, texts=[item["text"] for item in items]
+        )
+        return Response(
+            data=BatchTaskCreatedResponseSerializer().to_representation(
+                {
+                    "batch_id": batch.id,
+                    "task_id": result.id,
+                    "session_ids": [session.id for session in sessions],
+                }
+            ),
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class AnalysisBatchView(APIView):
+    @extend_schema(
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=AnalysisBatchResponseSerializer,
+                description="Progress of the bulk text analysis.",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorResponseSerializer,
+                description="Invalid batch ID or batch does not belong to user.",
+            ),
+        },
+        summary="Check a bulk text analysis",
+        description="Check the progress of a bulk text analysis: the number of "
+        + "texts pending, completed and failed, and the status and session of "
+        + "each text.",
+    )
+    def get(self, request, batch_id):
+        try:
+            batch = AnalysisBatch.objects.get(user=request.user, id=batch_id)
+        except (AnalysisBatch.DoesNotExist, ValidationError):
+            data = ErrorResponseSerializer().to_representation(
+                {
+                    "error": f"Invalid batch for user {request.user.username} "
+                    + f"(user id: {request.user.id}).",
+                    "code": status.HTTP_400_BAD_REQUEST,
+                }
+            )
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        timeout = BulkAnalysisSettings().bulk_analysis_timeout_seconds
+        if batch.created_at < timezone.now() - timedelta(seconds=timeout):
+            # The batch task was lost (e.g. its worker died)
+            fail_pending_batch_items(batch.id, "The analysis timed out.")
+        items = list(batch.items.select_related("session"))
+        statuses = [item.status for item in items]
+        return Response(
+            data=AnalysisBatchResponseSerializer().to_representation(
+                {
+                    "batch_id": batch.id,
+                    "created_at": batch.created_at,
+                    "total": len(items),
+                    **{
+                        item_status.value: statuses.count(item_status)
+                        for item_status in AnalysisBatchItem.Status
+                    },
+                    "items": items,
+                }
+            ),
+            status=status.HTTP_200_OK,
         )
-        return get_task_created_response(session_id=session_id, task_id=result.id)
 
 
 class SessionManagementView(APIView):
@@ -133,7 +487,9 @@ class SessionManagementView(APIView):
     )
     def get(self, request, session_id):
         try:
-            chat_session = ChatSession.objects.get(user=request.user, id=session_id)
+            chat_session = ChatSession.objects.analyzed().get(
+                user=request.user, id=session_id
+            )
             serializer = SessionDetailsResponseSerializer(chat_session)
             return Response(
                 data=serializer.data,
@@ -157,7 +513,9 @@ class SessionManagementView(APIView):
     )
     def delete(self, request, session_id):
         try:
-            chat_session = ChatSession.objects.get(user=request.user, id=session_id)
+            chat_session = ChatSession.objects.analyzed().get(
+                user=request.user, id=session_id
+            )
             chat_session.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
         except ChatSession.DoesNotExist:
@@ -174,13 +532,82 @@ class FollowUpQuestionView(APIView):
             ),
             status.HTTP_400_BAD_REQUEST: OpenApiResponse(
                 response=ErrorResponseSerializer,
-                description="Invalid session ID or session does not belong to user.",
+                description="Invalid session ID or session does not belong to user, "
+                + "or question and history too long for the context window of "
+                + "the model.",
             ),
         },
         summary="Ask a follow-up question",
         description="Ask a follow-up question based on the session history. "
         + "An async task will be created to process the question, and the task ID "
-        + "will be returned. To consult on the task status, use the task route.",
+        + "will be returned, with the estimated prompt tokens of the task. "
+        + "To consult on the task status, use the task route.",
+    )
+    def post(self, request):
+        serializer = QuestionRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        session_id = serializer.validated_data.get("session_id")
+        try:
+            # Validate that the session belongs to the user
+            chat_session = ChatSession.objects.analyzed().get(
+                user=request.user, id=session_id
+            )
+        except ChatSession.DoesNotExist:
+            return get_invalid_session_response(user=request.user)
+
+        question = serializer.validated_data.get("question")
+        budget_settings = ContextBudgetSettings()
+        estimate = estimate_follow_up_question(chat_session, question, budget_settings)
+        try:
+            check_context_budget(estimate, budget_settings)
+        except ContextBudgetExceeded as e:
+            return get_context_budget_response(e)
+
+        # Questions of the session are answered in the order they were asked
+        sequencer = get_session_sequencer()
+        ticket = sequencer.take_ticket(session_id) if sequencer else None
+        try:
+            result = follow_up_question.apply_async(
+                kwargs={
+                    "session_id": session_id,
+                    "question": question,
+                    "ticket": ticket,
+                },
+                headers={"estimated_tokens": estimate.tokens},
+            )
+        except Exception:
+            # Otherwise the next questions of the session would wait for this one
+            if sequencer is not None and ticket is not None:
+                sequencer.release(session_id, ticket)
+            raise
+        return get_task_created_response(
+            session_id=session_id, task_id=result.id, estimated_tokens=estimate.tokens
+        )
+
+
+class FollowUpQuestionStreamView(APIView):
+    renderer_classes = [JSONRenderer, ServerSentEventRenderer]
+
+    @extend_schema(
+        request=QuestionRequestSerializer,
+        responses={
+            (status.HTTP_200_OK, "text/event-stream"): OpenApiResponse(
+                description="Stream of Server-Sent Events: a `session` event with "
+                + "the session ID, one `token` event per generated chunk, and a "
+                + "final `done` event with the full answer (or an `error` event).",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorResponseSerializer,
+                description="Invalid session ID or session does not belong to user.",
+            ),
+        },
+        summary="Ask a follow-up question (streaming)",
+        description="Ask a follow-up question based on the session history and "
+        + "stream the answer back as it is generated, using Server-Sent Events. "
+        + "The answer starts once the previous questions of the session are "
+        + "answered. Only the complete answer is stored in the session history. "
+        + "Streaming requires the API to be served through ASGI.",
     )
     def post(self, request):
         serializer = QuestionRequestSerializer(data=request.data)
@@ -189,18 +616,128 @@ class FollowUpQuestionView(APIView):
         session_id = serializer.validated_data.get("session_id")
         try:
             # Validate that the session belongs to the user
-            ChatSession.objects.get(user=request.user, id=session_id)
+            ChatSession.objects.analyzed().get(user=request.user, id=session_id)
         except ChatSession.DoesNotExist:
             return get_invalid_session_response(user=request.user)
 
-        result = follow_up_question.delay(
-            session_id=session_id, question=serializer.validated_data.get("question")
+        # The summary is updated concurrently with the answer, so it does not
+        # include this turn yet. It is folded in by the next update.
+        schedule_history_summary(session_id)
+        question = serializer.validated_data.get("question")
+
+        async def answer_in_turn() -> AsyncIterator[BaseMessageChunk]:
+            # Questions of the session are answered in the order they were asked
+            async with session_turn(session_id):
+                async for chunk in get_agent().astream_follow_up_question(
+                    session_id=session_id, question=question
+                ):
+                    yield chunk
+
+        return get_event_stream_response(
+            stream_answer_events(session_id=session_id, chunks=answer_in_turn())
+        )
+
+
+class FollowUpQuestionDirectView(AsyncAPIView):
+    @extend_schema(
+        request=QuestionRequestSerializer,
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=AnswerResponseSerializer,
+                description="Question answered successfully.",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorResponseSerializer,
+                description="Invalid session ID or session does not belong to user.",
+            ),
+        },
+        summary="Ask a follow-up question (direct)",
+        description="Ask a follow-up question based on the session history and "
+        + "return the answer in the response, without creating an async task. "
+        + "The answer starts once the previous questions of the session are "
+        + "answered. Requires the API to be served through ASGI to handle many "
+        + "concurrent requests.",
+    )
+    async def post(self, request):
+        serializer = QuestionRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        session_id = serializer.validated_data.get("session_id")
+        if not await is_user_session(user=request.user, session_id=session_id):
+            return get_invalid_session_response(user=request.user)
+
+        # Questions of the session are answered in the order they were asked
+        async with session_turn(session_id):
+            answer = await get_agent().afollow_up_question(
+                session_id=session_id,
+                question=serializer.validated_data.get("question"),
+            )
+        await sync_to_async(schedule_history_summary)(session_id)
+        return Response(
+            data=AnswerResponseSerializer().to_representation(
+                {"session_id": session_id, "content": answer.content}
+            ),
+            status=status.HTTP_200_OK,
+        )
+
+
+def get_task_status_response(task_id: str, res: AsyncResult) -> Response:
+    if res.status == "PENDING":
+        return Response(
+            data=TaskStatusResponseSerializer().to_representation(
+                {
+                    "task_id": task_id,
+                    "status": res.status,
+                    "result": None,
+                }
+            ),
+            status=status.HTTP_202_ACCEPTED,
+        )
+    elif res.status == "SUCCESS":
+        return Response(
+            data=TaskStatusResponseSerializer().to_representation(
+                {
+                    "task_id": task_id,
+                    "status": res.status,
+                    "result": res.result,
+                }
+            ),
+            status=status.HTTP_200_OK,
+        )
+    elif res.status == "FAILURE":
+        return Response(
+            data=TaskStatusResponseSerializer().to_representation(
+                {
+                    "task_id": task_id,
+                    "status": res.status,
+                    "error": str(res.result),
+                }
+            ),
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    else:
+        return Response(
+            data=TaskStatusResponseSerializer().to_representation(
+                {
+                    "task_id": task_id,
+                    "status": res.status,
+                }
+            ),
+            status=status.HTTP_202_ACCEPTED,
         )
-        return get_task_created_response(session_id=session_id, task_id=result.id)
 
 
-class TaskStatusView(APIView):
+class TaskStatusView(AsyncAPIView):
     @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="wait",
+                type=float,
+                default=0,
+                description="Seconds to wait for the task to finish before "
+                + "answering (long polling), up to TASK_STATUS_MAX_WAIT_SECONDS.",
+            ),
+        ],
         responses={
             status.HTTP_200_OK: OpenApiResponse(
                 response=TaskStatusResponseSerializer,
@@ -211,56 +748,198 @@ class TaskStatusView(APIView):
                 description="Task still pending or running. "
                 + "Both result and error will be empty.",
             ),
+            status.HTTP_400_BAD_REQUEST: ErrorResponseSerializer,
             status.HTTP_500_INTERNAL_SERVER_ERROR: OpenApiResponse(
                 response=TaskStatusResponseSerializer,
                 description="Task failed with an error. Result will be empty.",
             ),
         },
         summary="Check task status",
-        description="Check the status of an initialized task.",
+        description="Check the status of an initialized task. With `wait`, the "
+        + "request only answers once the task finished or after `wait` seconds, "
+        + "so clients learn about the completion right away with few requests.",
     )
-    def get(self, request, task_id):
-        res = AsyncResult(task_id)
-        if res.status == "PENDING":
-            return Response(
-                data=TaskStatusResponseSerializer().to_representation(
-                    {
-                        "task_id": task_id,
-                        "status": res.status,
-                        "result": None,
-                    }
-                ),
-                status=status.HTTP_202_ACCEPTED,
+    async def get(self, request, task_id):
+        try:
+            wait = float(request.query_params.get("wait", 0))
+        except ValueError:
+            wait = -1.0
+        if not 0 <= wait < math.inf:
+            data = ErrorResponseSerializer().to_representation(
+                {
+                    "error": "The wait parameter must be a non-negative number.",
+                    "code": status.HTTP_400_BAD_REQUEST,
+                }
             )
-        elif res.status == "SUCCESS":
-            return Response(
-                data=TaskStatusResponseSerializer().to_representation(
-                    {
-                        "task_id": task_id,
-                        "status": res.status,
-                        "result": res.result,
-                    }
-                ),
-                status=status.HTTP_200_OK,
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        res = AsyncResult(task_id)
+        wait = min(wait, TaskStatusSettings().task_status_max_wait_seconds)
+        if wait > 0:
+            await wait_for_task(
+                get_async_redis_client(),
+                channel=get_task_channel(task_id),
+                timeout=wait,
+                is_ready=sync_to_async(res.ready, thread_sensitive=False),
             )
-        elif res.status == "FAILURE":
-            return Response(
-                data=TaskStatusResponseSerializer().to_representation(
-                    {
-                        "task_id": task_id,
-                        "status": res.status,
-                        "error": str(res.result),
-                    }
+        return await sync_to_async(get_task_status_response, thread_sensitive=False)(
+            task_id, res
+        )
+
+
+class TaskStatusBatchView(APIView):
+    @extend_schema(
+        request=TaskStatusBatchRequestSerializer,
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=TaskStatusResponseSerializer(many=True),
+                description="Status of each task, in the requested order.",
+            ),
+        },
+        summary="Check many task statuses",
+        description="Check the status of many tasks at once (up to "
+        + "TASK_STATUS_BATCH_MAX_IDS), with the same fields as the task route. "
+        + "All the statuses are read from the result backend in a single round "
+        + "trip.",
+    )
+    def post(self, request):
+        serializer = TaskStatusBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        task_ids = [str(task_id) for task_id in serializer.validated_data["task_ids"]]
+        return Response(
+            data=TaskStatusResponseSerializer(
+                get_task_statuses(task_ids), many=True
+            ).data,
+            status=status.HTTP_200_OK,
+        )
+
+
+class TaskEventsView(APIView):
+    renderer_classes = [JSONRenderer, ServerSentEventRenderer]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="task_id",
+                type=str,
+                many=True,
+                description="Tasks submitted before connecting. Those that already "
+                + "finished are sent right away.",
+            ),
+        ],
+        responses={
+            (status.HTTP_200_OK, "text/event-stream"): OpenApiResponse(
+                response=TaskEventSerializer,
+                description="Stream of Server-Sent Events: one `task` event with "
+                + "the status, result or error and session ID of each text analysis "
+                + "or follow-up question task of the user that finishes.",
+            ),
+        },
+        summary="Stream task completions",
+        description="Stream the completion of the text analysis and follow-up "
+        + "question tasks of the user as they happen, using Server-Sent Events, "
+        + "instead of polling the task route. Keep one stream open and submit the "
+        + "tasks while it is connected. Streaming requires the API to be served "
+        + "through ASGI.",
+    )
+    def get(self, request):
+        task_ids = request.query_params.getlist("task_id")
+
+        def get_finished_task_events() -> list[dict]:
+            return [
+                TaskEventSerializer().to_representation(task_status)
+                for task_id in task_ids
+                if (task_status := get_task_status(task_id))["status"]
+                in ("SUCCESS", "FAILURE")
+            ]
+
+        return get_event_stream_response(
+            stream_task_events(
+                get_async_redis_client(),
+                user_id=request.user.id,
+                get_initial_events=sync_to_async(
+                    get_finished_task_events, thread_sensitive=False
                 ),
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                keepalive_seconds=TaskStatusSettings().task_events_keepalive_seconds,
             )
-        else:
-            return Response(
-                data=TaskStatusResponseSerializer().to_representation(
-                    {
-                        "task_id": task_id,
-                        "status": res.status,
-                    }
-                ),
-                status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class ConnectionPoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                description="Statistics of each history connection pool (`sync` "
+                + "and `async`) created by the API process that served the request.",
+            ),
+        },
+        summary="Check connection pool stats",
+        description="Check the statistics of the connection pools used to read and "
+        + "write the session history (e.g. `pool_size`, `pool_available`, "
+        + "`requests_waiting`). Each process has its own pools. Admin only.",
+    )
+    def get(self, request):
+        return Response(data=get_connection_pool_stats(), status=status.HTTP_200_OK)
+
+
+class HedgingStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                description="Number of hedged model calls (`calls`), of calls that "
+                + "sent a hedge request (`hedges`) and of hedges that answered first "
+                + "(`hedge_wins`), across all the processes.",
+            ),
+        },
+        summary="Check hedging stats",
+        description="Check how often hedge requests are sent and win, to weigh "
+        + "their extra token usage against the latency they save. Admin only.",
+    )
+    def get(self, request):
+        return Response(data=get_hedging_stats().get_stats(), status=status.HTTP_200_OK)
+
+
+class LlmCallStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="hours",
+                type=int,
+                default=24,
+                description="Only include the calls of the last `hours` hours.",
+            ),
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                description="Number of calls, errors, average timings and token "
+                + "usage of each prompt, provider and model.",
+            ),
+            status.HTTP_400_BAD_REQUEST: ErrorResponseSerializer,
+        },
+        summary="Check model call stats",
+        description="Aggregate the model calls recorded in the `llm_call` table "
+        + "(queue wait, time to first token, latency and token usage). Admin only.",
+    )
+    def get(self, request):
+        try:
+            hours = int(request.query_params.get("hours", 24))
+        except ValueError:
+            hours = 0
+        if hours <= 0:
+            data = ErrorResponseSerializer().to_representation(
+                {
+                    "error": "The hours parameter must be a positive integer.",
+                    "code": status.HTTP_400_BAD_REQUEST,
+                }
             )
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+
+        since = timezone.now() - timedelta(hours=hours)
+        return Response(data=get_llm_call_stats(since), status=status.HTTP_200_OK)
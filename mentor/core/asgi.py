@@ -3,14 +3,23 @@ ASGI config for mentor project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+This is the entry point used to serve the API, since streaming responses
+(Server-Sent Events) are only delivered incrementally under ASGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mentor.core.settings")
 
 application = get_asgi_application()
+
+if settings.DEBUG:
+    # Serve static files (e.g. the admin) like `runserver` does in development
+    application = ASGIStaticFilesHandler(application)
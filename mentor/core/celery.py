@@ -4,7 +4,36 @@ from celery import Celery
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mentor.core.settings")
 
+# Each task type has its own queue, so that long and bulk analyses don't delay
+# the follow-up questions users are waiting on. Each queue is served by its own
+# workers (see deploy/compose.yml). A worker serving several queues takes the
+# tasks with the lowest priority number first.
+QUESTIONS_QUEUE = "questions"
+ANALYSIS_QUEUE = "analysis"
+BATCH_QUEUE = "batch"
+# Short calls users are not waiting on (titles and history summaries)
+BACKGROUND_QUEUE = "background"
+TASK_QUEUES = [QUESTIONS_QUEUE, ANALYSIS_QUEUE, BATCH_QUEUE, BACKGROUND_QUEUE]
+
+TASK_ROUTES = {
+    "mentor.assistant.tasks.follow_up_question": {
+        "queue": QUESTIONS_QUEUE,
+        "priority": 0,
+    },
+    "mentor.assistant.tasks.analyze_text": {"queue": ANALYSIS_QUEUE, "priority": 3},
+    "mentor.assistant.tasks.generate_session_title": {
+        "queue": BACKGROUND_QUEUE,
+        "priority": 6,
+    },
+    "mentor.assistant.tasks.summarize_session_history": {
+        "queue": BACKGROUND_QUEUE,
+        "priority": 6,
+    },
+    "mentor.assistant.tasks.analyze_batch": {"queue": BATCH_QUEUE, "priority": 9},
+}
+
 app = Celery("mentor")
 app.config_from_object("django.conf:settings", namespace="CELERY")
+app.conf.task_routes = TASK_ROUTES
 print("CELERY_BROKER_URL in celery.py:", app.conf.broker_url)
 app.autodiscover_tasks()
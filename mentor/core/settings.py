@@ -153,6 +153,18 @@ REST_FRAMEWORK = {
 global_settings = Settings()
 CELERY_BROKER_URL = global_settings.redis_url
 CELERY_RESULT_BACKEND = global_settings.redis_url
+# Lets clients (e.g. the benchmark_load command) tell queued and running tasks apart
+CELERY_TASK_TRACK_STARTED = True
+# Makes Redis honor the task priorities (see mentor/core/celery.py), 0 being the
+# highest
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "queue_order_strategy": "priority",
+    "priority_steps": list(range(10)),
+    "sep": ":",
+}
+# Worker processes reserve as few tasks as possible, so the tasks waiting behind a
+# long analysis can be taken by other workers
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(